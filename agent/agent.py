@@ -1,25 +1,34 @@
+import asyncio
 import logging
+import time
 
 from collections.abc import AsyncIterable
 from typing import Any, Literal
 
 import httpx
 
-from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.runnables.config import (
     RunnableConfig,
 )
 from langchain_core.tools import tool  # type: ignore
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langgraph.prebuilt import create_react_agent  # type: ignore
 from pydantic import BaseModel
-from langchain_mcp_adapters.client import MultiServerMCPClient
 import os
 from mcp import ClientSession
 from mcp.client.stdio import stdio_client
 from langchain_mcp_adapters.tools import load_mcp_tools
 from dotenv import load_dotenv
+from graph_cache import GraphCache
+from checkpointer import BoundedMemorySaver
+from shared_backend import open_backend, shared_backend
+from tool_cache import ToolResultCache
+from answer_cache import AnswerCache
+from router import FastPathRouter
+from context import ContextManager
+from tool_selection import ToolSelectingChatOpenAI, ToolSelector, request_more_tools
+from metrics import MetricsCallbackHandler, metrics
 
 load_dotenv() 
 
@@ -27,7 +36,13 @@ ChatOpenAI.api_key = os.getenv("OPENAI_API_KEY")
 
 logger = logging.getLogger(__name__)
 
-memory = MemorySaver()
+memory = BoundedMemorySaver(
+    max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "1000")),
+    max_checkpoints_per_thread=int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "10")),
+    idle_ttl=float(os.getenv("CHECKPOINT_IDLE_TTL_SECONDS", "3600")),
+    backend=shared_backend() or open_backend(os.getenv("CHECKPOINT_SQLITE_PATH")),
+    shared=shared_backend() is not None,
+)
 
 
 
@@ -58,42 +73,270 @@ class OrangeTheoryAgent:
 
     SUPPORTED_CONTENT_TYPES = ['text', 'text/plain']
 
-    def __init__(self):
-        self.model = ChatOpenAI(model="gpt-4.1-mini", temperature=0.8)
-        self.graph = None
+    # Minimum spacing between streamed token batches; a batch after a pause
+    # goes out immediately.
+    STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "0.05"))
 
-    async def invoke(self, query: str, sessionId: str) -> dict[str, Any]:
-        client = MultiServerMCPClient(
-            {
-                "OrangeTheory": {
-                    "url": "http://localhost:8000/sse",
-                    "transport": "sse",
-                }
-            }
+    MCP_CONNECTIONS = {
+        "OrangeTheory": {
+            "url": os.getenv("MCP_SERVER_URL", "http://localhost:8000/sse"),
+            "transport": "sse",
+        }
+    }
+
+    def __init__(self):
+        self.model = ToolSelectingChatOpenAI(model="gpt-4.1-mini", temperature=0.8)
+        self.tool_cache = ToolResultCache(
+            ttl=float(os.getenv("TOOL_CACHE_TTL_SECONDS", "300")),
         )
-        tools = await client.get_tools()
-        for i, tool in enumerate(tools):
-            print(f"Tool {i}: {tool.name}")
-            print(f"Input schema: {getattr(tool, 'input_schema', None)}")
-        self.graph = create_react_agent(
+        self.context = ContextManager(
+            self.model,
+            budget_tokens=int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000")),
+        )
+        if os.getenv("TOOL_SELECTION_ENABLED", "true").lower() == "true":
+            self.model.tool_selector = ToolSelector(self.context.count_text)
+        self.router = (
+            FastPathRouter() if os.getenv("FAST_PATH_ENABLED", "true").lower() == "true" else None
+        )
+        self.answer_cache = None
+        if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true":
+            embedding_model = os.getenv("ANSWER_CACHE_EMBEDDING_MODEL")
+            self.answer_cache = AnswerCache(
+                ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+                maxsize=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+                embed=(
+                    OpenAIEmbeddings(model=embedding_model).aembed_query
+                    if embedding_model
+                    else None
+                ),
+                similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92")),
+            )
+        self.metrics_handler = MetricsCallbackHandler(metrics)
+        # Moving average of full graph runs, the baseline for fast-path savings.
+        self.graph_latency = 0.0
+        self.graph_cache = GraphCache(
+            self.MCP_CONNECTIONS,
+            self._build_graph,
+            refresh_interval=float(os.getenv("MCP_TOOLS_REFRESH_SECONDS", "60")),
+            max_concurrency=int(os.getenv("MCP_TOOL_CONCURRENCY", "8")),
+            tool_timeout=float(os.getenv("MCP_TOOL_TIMEOUT_SECONDS", "60")),
+        )
+
+    @property
+    def graph(self):
+        snapshot = self.graph_cache.snapshot
+        return None if snapshot is None else snapshot.graph
+
+    def _build_graph(self, tools):
+        if self.model.tool_selector is not None:
+            self.model.tool_selector.index(tools)
+            tools = [*tools, request_more_tools]
+        return create_react_agent(
             self.model,
-            tools=tools,
+            tools=self.tool_cache.wrap_tools(tools),
             checkpointer=memory,
             prompt=self.SYSTEM_INSTRUCTION,
+            pre_model_hook=self.context,
             response_format=(self.RESPONSE_FORMAT_INSTRUCTION, ResponseFormat),
-            debug=True
+            debug=os.getenv("AGENT_GRAPH_DEBUG", "false").lower() == "true",
         )
-        config: RunnableConfig = {'configurable': {'thread_id': sessionId}}
-        await self.graph.ainvoke({'messages': [('user', query)]}, config)
-        return self.get_agent_response(config)
+
+    async def warm_up(self):
+        """Loads the MCP tools and compiles the graph before the first request."""
+        await self.graph_cache.warm_up()
+
+    async def close(self):
+        await asyncio.to_thread(memory.close)
+        await self.graph_cache.close()
+
+    def get_cache_stats(self) -> dict[str, Any]:
+        return self.graph_cache.stats.as_dict()
+
+    def get_mcp_session_stats(self) -> dict[str, Any]:
+        return {name: session.stats() for name, session in self.graph_cache.sessions.items()}
+
+    def get_checkpointer_stats(self) -> dict[str, Any]:
+        return memory.stats()
+
+    def get_tool_cache_stats(self) -> dict[str, Any]:
+        return self.tool_cache.stats()
+
+    def get_context_stats(self) -> dict[str, Any]:
+        return self.context.get_stats()
+
+    def get_tool_selection_stats(self) -> dict[str, Any]:
+        selector = self.model.tool_selector
+        return {} if selector is None else selector.get_stats()
+
+    def get_router_stats(self) -> dict[str, Any]:
+        return {} if self.router is None else self.router.get_stats()
+
+    def get_answer_cache_stats(self) -> dict[str, Any]:
+        return {} if self.answer_cache is None else self.answer_cache.get_stats()
+
+    async def invoke(
+        self, query: str, sessionId: str, use_cache: bool = True, member: str | None = None
+    ) -> dict[str, Any]:
+        config = self._config(sessionId, member)
+        # The thread stays resident in the checkpointer while the turn runs.
+        with memory.running(config['configurable']['thread_id']):
+            return await self._invoke(query, config, use_cache)
+
+    async def _invoke(self, query: str, config: RunnableConfig, use_cache: bool) -> dict[str, Any]:
+        snapshot = await self.graph_cache.get()
+        graph = snapshot.graph
+        if await self._fast_path(snapshot, query, config):
+            return await self.get_agent_response(graph, config)
+        if await self._cached_answer(snapshot, query, config, use_cache):
+            return await self.get_agent_response(graph, config)
+
+        start = time.perf_counter()
+        with metrics.span('graph_run'):
+            await graph.ainvoke({'messages': [('user', query)]}, config)
+        self._record_graph_latency(time.perf_counter() - start)
+        response = await self.get_agent_response(graph, config)
+        await self._store_answer(graph, query, config, response)
+        return response
+
+    def _config(self, session_id: str, member: str | None = None) -> RunnableConfig:
+        configurable = {'thread_id': session_id}
+        if member:
+            # Tool calls act on this member's OTF account, and their threads
+            # stay apart even if two clients pick the same session id.
+            configurable = {'thread_id': f'{member}:{session_id}', 'otf_member': member}
+        return {
+            'configurable': configurable,
+            'callbacks': [self.metrics_handler],
+        }
+
+    async def _fast_path(self, snapshot, query: str, config: RunnableConfig) -> bool:
+        """Answers simple intents without the LLM and records the turn in the thread."""
+        if self.router is None:
+            return False
+
+        def get_tool(name):
+            match = next((t for t in snapshot.tools if t.name == name), None)
+            return None if match is None else self.tool_cache.wrap(match)
+
+        with metrics.span('fast_path'):
+            answer = await self.router.answer(query, get_tool, config, self.graph_latency)
+        if answer is None:
+            return False
+        await self._record_turn(snapshot, query, answer, config)
+        return True
+
+    async def _cached_answer(
+        self, snapshot, query: str, config: RunnableConfig, use_cache: bool
+    ) -> bool:
+        """Replays a shared answer to a non-personal question into the thread."""
+        if self.answer_cache is None:
+            return False
+        if not use_cache:
+            self.answer_cache.bypass()
+            return False
+        # Only a thread's first question can be self-contained; later ones
+        # may lean on the conversation so far.
+        state = await snapshot.graph.aget_state(config)
+        if state.values.get('messages'):
+            return False
+        answer = await self.answer_cache.lookup(query)
+        if answer is None:
+            return False
+        await self._record_turn(snapshot, query, answer, config)
+        return True
+
+    async def _store_answer(self, graph, query: str, config: RunnableConfig, response: dict[str, Any]):
+        # A bypassed request still refreshes the entry with its fresh answer.
+        if self.answer_cache is None or not response['is_task_complete']:
+            return
+        state = await graph.aget_state(config)
+        await self.answer_cache.store(query, response['content'], state.values.get('messages', []))
+
+    async def _record_turn(self, snapshot, query: str, answer: str, config: RunnableConfig):
+        # Written as the structured-response node's output so the thread
+        # reads exactly like a normal completed turn.
+        await snapshot.graph.aupdate_state(
+            config,
+            {
+                'messages': [HumanMessage(content=query), AIMessage(content=answer)],
+                'structured_response': ResponseFormat(status='completed', message=answer),
+            },
+            as_node='generate_structured_response',
+        )
+
+    def _record_graph_latency(self, elapsed: float):
+        if self.graph_latency == 0.0:
+            self.graph_latency = elapsed
+        else:
+            self.graph_latency = 0.9 * self.graph_latency + 0.1 * elapsed
 
     async def stream(
-        self, query: str, sessionId: str
+        self, query: str, sessionId: str, use_cache: bool = True, member: str | None = None
+    ) -> AsyncIterable[dict[str, Any]]:
+        config = self._config(sessionId, member)
+        with memory.running(config['configurable']['thread_id']):
+            async for item in self._stream(query, config, use_cache):
+                yield item
+
+    async def _stream(
+        self, query: str, config: RunnableConfig, use_cache: bool
     ) -> AsyncIterable[dict[str, Any]]:
-        pass
+        snapshot = await self.graph_cache.get()
+        graph = snapshot.graph
+        if await self._fast_path(snapshot, query, config) or await self._cached_answer(
+            snapshot, query, config, use_cache
+        ):
+            yield await self.get_agent_response(graph, config)
+            return
+
+        inputs = {'messages': [('user', query)]}
+        start = time.perf_counter()
+
+        buffer: list[str] = []
+        flushed_at = 0.0
+        async for event in graph.astream_events(inputs, config, version='v2'):
+            kind = event['event']
+            if kind == 'on_chat_model_stream':
+                # Only the ReAct "agent" node talks to the user; the structured
+                # response pass would otherwise stream raw JSON.
+                if event['metadata'].get('langgraph_node') != 'agent':
+                    continue
+                chunk = event['data']['chunk']
+                if isinstance(chunk.content, str) and chunk.content:
+                    buffer.append(chunk.content)
+                now = time.monotonic()
+                if buffer and now - flushed_at >= self.STREAM_FLUSH_SECONDS:
+                    flushed_at = now
+                    yield self._working(''.join(buffer), partial=True)
+                    buffer.clear()
+            elif kind == 'on_tool_start':
+                if buffer:
+                    yield self._working(''.join(buffer), partial=True)
+                    buffer.clear()
+                yield self._working(f"Calling {event['name']}...")
+            elif kind == 'on_tool_end':
+                yield self._working(f"Finished {event['name']}.")
+
+        if buffer:
+            yield self._working(''.join(buffer), partial=True)
+        elapsed = time.perf_counter() - start
+        metrics.observe('stage_seconds', elapsed, stage='graph_run')
+        self._record_graph_latency(elapsed)
+        response = await self.get_agent_response(graph, config)
+        await self._store_answer(graph, query, config, response)
+        yield response
+
+    def _working(self, content: str, partial: bool = False) -> dict[str, Any]:
+        return {
+            'is_task_complete': False,
+            'require_user_input': False,
+            'is_partial': partial,
+            'content': content,
+        }
 
-    def get_agent_response(self, config: RunnableConfig) -> dict[str, Any]:
-        current_state = self.graph.get_state(config)
+    async def get_agent_response(self, graph, config: RunnableConfig) -> dict[str, Any]:
+        with metrics.span('get_state'):
+            current_state = await graph.aget_state(config)
 
         structured_response = current_state.values.get('structured_response')
         if structured_response and isinstance(
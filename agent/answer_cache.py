@@ -0,0 +1,193 @@
+import logging
+import math
+import re
+import threading
+
+from typing import Any, Awaitable, Callable, Optional
+
+from cachetools import TTLCache
+from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage
+
+from metrics import metrics
+from tool_selection import REQUEST_MORE_TOOLS
+
+
+logger = logging.getLogger(__name__)
+
+
+# Tools that answer the same for every member, with the arguments that must
+# be passed explicitly: left out, otf_api falls back to the member's home
+# studio or location.
+SHARED_TOOLS: dict[str, tuple[str, ...]] = {
+    'get_studio_detail': ('studio_uuid',),
+    'get_studio_services': ('studio_uuid',),
+    'search_studios_by_geo': ('latitude', 'longitude'),
+    'get_studios_by_geo': ('latitude', 'longitude'),
+    'find_studio': (),
+    REQUEST_MORE_TOOLS: (),
+}
+
+# Arguments that pin an answer to one studio, place or search: a question
+# that only differs in them from a cached one wants a different answer.
+IDENTIFYING_ARGS = frozenset({'studio_uuid', 'studio_uuids', 'latitude', 'longitude', 'query'})
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(query: str) -> str:
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', query.lower())).strip()
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """Shares completed answers to non-personal questions across members.
+
+    Entries are keyed on the normalized query text and live in a TTL-bounded
+    LRU. With ``embed`` set, a query that misses on the exact text is also
+    matched against the cached queries by cosine similarity, except for
+    entries whose tools took ``IDENTIFYING_ARGS``: a similar question about
+    another studio or place must not get their answer.
+
+    Only self-contained turns are stored: the first turn of a thread that
+    called at least one of ``SHARED_TOOLS`` (``REQUEST_MORE_TOOLS`` alone
+    doesn't count) and no other tool, with their identifying arguments. A
+    turn with no tool calls may have answered from what the model knows
+    about the member, so it is never stored.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        maxsize: int = 1024,
+        embed: Optional[Callable[[str], Awaitable[list[float]]]] = None,
+        similarity: float = 0.92,
+    ):
+        self.embed = embed
+        self.similarity = similarity
+        # normalized query -> (answer, embedding or None)
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Embeddings of recent lookups, reused when the answer gets stored.
+        self._vectors: TTLCache = TTLCache(maxsize=256, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.skipped = 0
+
+    async def lookup(self, query: str) -> Optional[str]:
+        key = normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            candidates = [] if entry is not None or self.embed is None else [
+                (answer, vector) for answer, vector in self._entries.values() if vector
+            ]
+        if entry is not None:
+            self._record('hit')
+            return entry[0]
+
+        if candidates:
+            vector = await self._embedding(key)
+            if vector:
+                score, answer = max(
+                    (_cosine(vector, candidate), answer) for answer, candidate in candidates
+                )
+                if score >= self.similarity:
+                    self._record('semantic_hit')
+                    return answer
+
+        self._record('miss')
+        return None
+
+    def bypass(self):
+        self._record('bypass')
+
+    async def store(self, query: str, answer: str, messages: list[AnyMessage]):
+        """Caches ``answer`` if the turn in ``messages`` is shareable."""
+        if not self.shareable(messages):
+            self.skipped += 1
+            return
+        key = normalize(query)
+        vector = None
+        if self.embed is not None and not self.identifying(messages):
+            vector = await self._embedding(key)
+        with self._lock:
+            self._entries[key] = (answer, vector)
+        self.stores += 1
+
+    @staticmethod
+    def shareable(messages: list[AnyMessage]) -> bool:
+        # A summary means earlier turns were compacted away.
+        if any(isinstance(m, SystemMessage) for m in messages):
+            return False
+        if sum(isinstance(m, HumanMessage) for m in messages) != 1:
+            return False
+        shared = False
+        for call in _tool_calls(messages):
+            required = SHARED_TOOLS.get(call['name'])
+            if required is None:
+                return False
+            if any(call['args'].get(arg) in (None, '') for arg in required):
+                return False
+            shared = shared or call['name'] != REQUEST_MORE_TOOLS
+        return shared
+
+    @staticmethod
+    def identifying(messages: list[AnyMessage]) -> bool:
+        """Whether a tool call of the turn took any of ``IDENTIFYING_ARGS``."""
+        return any(
+            call['args'].get(arg) not in (None, '')
+            for call in _tool_calls(messages)
+            for arg in IDENTIFYING_ARGS
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            'hit_rate': (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            'hits': self.hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'stores': self.stores,
+            'skipped': self.skipped,
+            'entries': entries,
+        }
+
+    def _record(self, result: str):
+        if result == 'hit':
+            self.hits += 1
+        elif result == 'semantic_hit':
+            self.semantic_hits += 1
+        elif result == 'miss':
+            self.misses += 1
+        else:
+            self.bypassed += 1
+        metrics.inc('answer_cache_lookups_total', result=result)
+
+    async def _embedding(self, key: str) -> Optional[list[float]]:
+        with self._lock:
+            vector = self._vectors.get(key)
+        if vector is not None:
+            return vector
+        try:
+            vector = await self.embed(key)
+        except Exception as e:
+            logger.warning(f'Answer cache embedding failed, using exact match only: {e}')
+            return None
+        with self._lock:
+            self._vectors[key] = vector
+        return vector
+
+
+def _tool_calls(messages: list[AnyMessage]) -> list[dict[str, Any]]:
+    return [call for message in messages for call in getattr(message, 'tool_calls', None) or []]
@@ -0,0 +1,410 @@
+import asyncio
+import json
+import logging
+import pickle
+import threading
+import time
+
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from shared_backend import SharedBackend, VersionConflictError
+
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """An ``InMemorySaver`` that bounds how much conversation state stays in RAM.
+
+    - Only the newest ``max_checkpoints_per_thread`` checkpoints of a thread are
+      kept (the latest one carries the full message list).
+    - At most ``max_threads`` threads stay resident; the least recently used
+      thread is evicted first, and threads idle for ``idle_ttl`` seconds are
+      evicted on the next write. A thread with a turn in progress (see
+      ``running``) is never evicted, so the limit can be exceeded by the
+      number of concurrent turns.
+    - Without a ``backend``, eviction discards the thread's history for
+      good; each such loss is logged and counted in ``dropped``.
+    - With a ``backend`` set, evicted threads are spilled to it and loaded
+      back on their next access. Dirty threads are also flushed every
+      ``flush_interval`` seconds and on ``close()``, so a restarted server
+      can resume sessions.
+    - With ``shared`` set, the backend is the source of truth for several
+      worker processes: every write goes straight through as just the rows
+      it added or dropped, and a resident thread another worker has written
+      since is reloaded on access. A write made on top of a stale copy
+      fails with ``VersionConflictError`` instead of overwriting the other
+      worker's turn.
+
+    The async methods the graph calls run on a worker thread, so pickling
+    and backend I/O never block the event loop.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        max_checkpoints_per_thread: int = 10,
+        idle_ttl: float = 3600.0,
+        backend: Optional[SharedBackend] = None,
+        shared: bool = False,
+        flush_interval: float = 5.0,
+    ):
+        super().__init__()
+        self.max_threads = max_threads
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.idle_ttl = idle_ttl
+        self.flush_interval = flush_interval
+        self.evictions = 0
+        self.dropped = 0
+        self.loads = 0
+
+        self._lock = threading.RLock()
+        # thread_id -> last access time, least recently used first.
+        self._access: OrderedDict[str, float] = OrderedDict()
+        self._thread_writes: dict[str, set[tuple]] = defaultdict(set)
+        self._thread_blobs: dict[str, set[tuple]] = defaultdict(set)
+        self._dirty: set[str] = set()
+        # thread_id -> turns running on it.
+        self._active: Counter[str] = Counter()
+        self._flushed_at = time.monotonic()
+        self._backend = backend
+        self.shared = shared and backend is not None
+        # thread_id -> backend version of the resident copy.
+        self._versions: dict[str, int] = {}
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            self._touch(config['configurable']['thread_id'])
+            return super().get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config:
+                self._touch(config['configurable']['thread_id'])
+            # Materialize under the lock so eviction can't mutate mid-iteration.
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    @contextmanager
+    def running(self, thread_id: str):
+        """Keeps ``thread_id`` resident while a turn runs on it."""
+        with self._lock:
+            self._active[thread_id] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = '',
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable']['checkpoint_ns']
+        with self._lock:
+            self._touch(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            rows = {
+                _row('c', checkpoint_ns, checkpoint['id']):
+                    self.storage[thread_id][checkpoint_ns][checkpoint['id']]
+            }
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                self._thread_blobs[thread_id].add(key)
+                rows[_row('b', checkpoint_ns, channel, version)] = self.blobs[key]
+            self._dirty.add(thread_id)
+            deleted = self._prune_thread(thread_id, checkpoint_ns)
+            self._write_through(thread_id, rows, deleted)
+            self._enforce_limits()
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = '',
+    ) -> None:
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        checkpoint_id = config['configurable']['checkpoint_id']
+        outer_key = (thread_id, checkpoint_ns, checkpoint_id)
+        with self._lock:
+            self._touch(thread_id)
+            before = dict(self.writes.get(outer_key, {}))
+            super().put_writes(config, writes, task_id, task_path)
+            self._thread_writes[thread_id].add(outer_key)
+            self._dirty.add(thread_id)
+            self._write_through(
+                thread_id,
+                {
+                    _row('w', checkpoint_ns, checkpoint_id, *inner_key): value
+                    for inner_key, value in self.writes.get(outer_key, {}).items()
+                    if before.get(inner_key) is not value
+                },
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_resident(thread_id)
+            self._access.pop(thread_id, None)
+            self._dirty.discard(thread_id)
+            if self._backend is not None:
+                self._backend.delete('checkpoints', thread_id)
+
+    def flush(self):
+        """Writes every dirty resident thread to the backend."""
+        with self._lock:
+            # Shared writes already went through; a full spill could only
+            # overwrite another worker's.
+            if self._backend is not None and not self.shared:
+                for thread_id in list(self._dirty):
+                    if thread_id in self._access:
+                        self._spill(thread_id)
+            self._dirty.clear()
+            self._flushed_at = time.monotonic()
+
+    def close(self):
+        self.flush()
+        # A shared backend belongs to the server, which closes it.
+        if self._backend is not None and not self.shared:
+            self._backend.close()
+            self._backend = None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            resident_bytes = sum(self._thread_size(t) for t in self._access)
+            stats = {
+                'resident_threads': len(self._access),
+                'resident_bytes': resident_bytes,
+                'evictions': self.evictions,
+                'dropped': self.dropped,
+                'active_threads': len(self._active),
+                'loads': self.loads,
+            }
+            if self._backend is not None:
+                stats['persisted_threads'] = self._backend.count('checkpoints')
+            return stats
+
+    def _touch(self, thread_id: str):
+        if (
+            self.shared
+            and thread_id in self._access
+            and self._backend.version('checkpoints', thread_id) != self._versions.get(thread_id)
+        ):
+            # Another worker wrote this thread since it was loaded here.
+            self._forget(thread_id)
+        if thread_id not in self._access:
+            self._load(thread_id)
+        self._access[thread_id] = time.monotonic()
+        self._access.move_to_end(thread_id)
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str) -> Iterable[str]:
+        """Drops the thread's oldest checkpoints and returns their rows."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return []
+        deleted = []
+        # Checkpoint ids are time-ordered (uuid6), so the oldest sort first.
+        ordered = sorted(checkpoints)
+        for checkpoint_id in ordered[: -self.max_checkpoints_per_thread]:
+            del checkpoints[checkpoint_id]
+            deleted.append(_row('c', checkpoint_ns, checkpoint_id))
+            outer_key = (thread_id, checkpoint_ns, checkpoint_id)
+            for inner_key in self.writes.pop(outer_key, {}):
+                deleted.append(_row('w', checkpoint_ns, checkpoint_id, *inner_key))
+            self._thread_writes[thread_id].discard(outer_key)
+
+        # Drop channel blobs no remaining checkpoint of this namespace points at.
+        live = set()
+        for saved, _metadata, _parent in checkpoints.values():
+            for channel, version in self.serde.loads_typed(saved)['channel_versions'].items():
+                live.add((thread_id, checkpoint_ns, channel, version))
+        for key in [
+            k for k in self._thread_blobs[thread_id] if k[1] == checkpoint_ns and k not in live
+        ]:
+            self.blobs.pop(key, None)
+            self._thread_blobs[thread_id].discard(key)
+            deleted.append(_row('b', *key[1:]))
+        return deleted
+
+    def _enforce_limits(self):
+        now = time.monotonic()
+        excess = len(self._access) - self.max_threads
+        victims = []
+        for thread_id, last_access in self._access.items():
+            if len(victims) >= excess and now - last_access < self.idle_ttl:
+                break
+            if thread_id not in self._active:
+                victims.append(thread_id)
+        for thread_id in victims:
+            self._evict(thread_id)
+
+        if self._backend is not None and now - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def _write_through(self, thread_id: str, rows: dict[str, Any], deleted: Iterable[str] = ()):
+        if not self.shared:
+            return
+        try:
+            self._versions[thread_id] = self._backend.put_rows(
+                'checkpoints',
+                thread_id,
+                {row: pickle.dumps(value) for row, value in rows.items()},
+                deleted,
+                version=self._versions.get(thread_id, 0),
+            )
+        except VersionConflictError:
+            # Another worker ran a turn on this thread meanwhile. Its turn
+            # wins; the next access here reloads it.
+            logger.warning(f'Thread {thread_id} was written by another worker; dropping this write')
+            self._forget(thread_id)
+            raise
+        self._dirty.discard(thread_id)
+
+    def _evict(self, thread_id: str):
+        if self._backend is None:
+            self.dropped += 1
+            logger.warning(
+                f'Evicted thread {thread_id} without a checkpoint backend; '
+                f'its conversation history is lost (set CHECKPOINT_SQLITE_PATH to keep it)'
+            )
+        elif thread_id in self._dirty:
+            self._spill(thread_id)
+        self._forget(thread_id)
+        self.evictions += 1
+
+    def _forget(self, thread_id: str):
+        self._drop_resident(thread_id)
+        self._access.pop(thread_id, None)
+        self._dirty.discard(thread_id)
+
+    def _drop_resident(self, thread_id: str):
+        self._versions.pop(thread_id, None)
+        self.storage.pop(thread_id, None)
+        for key in self._thread_writes.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._thread_blobs.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+
+    def _spill(self, thread_id: str):
+        rows = {}
+        for ns, checkpoints in self.storage[thread_id].items():
+            for checkpoint_id, saved in checkpoints.items():
+                rows[_row('c', ns, checkpoint_id)] = saved
+        for outer_key in self._thread_writes[thread_id]:
+            for inner_key, value in self.writes.get(outer_key, {}).items():
+                rows[_row('w', *outer_key[1:], *inner_key)] = value
+        for key in self._thread_blobs[thread_id]:
+            if key in self.blobs:
+                rows[_row('b', *key[1:])] = self.blobs[key]
+        self._versions[thread_id] = self._backend.put_rows(
+            'checkpoints',
+            thread_id,
+            {row: pickle.dumps(value) for row, value in rows.items()},
+            replace=True,
+        )
+
+    def _load(self, thread_id: str):
+        if self._backend is None:
+            return
+        found = self._backend.get_rows('checkpoints', thread_id)
+        if found is None:
+            return
+        rows, self._versions[thread_id] = found
+        for row, data in rows.items():
+            kind, ns, *rest = json.loads(row)
+            value = pickle.loads(data)
+            if kind == 'c':
+                self.storage[thread_id][ns][rest[0]] = value
+            elif kind == 'w':
+                checkpoint_id, task_id, index = rest
+                outer_key = (thread_id, ns, checkpoint_id)
+                self.writes[outer_key][(task_id, index)] = value
+                self._thread_writes[thread_id].add(outer_key)
+            else:
+                key = (thread_id, ns, *rest)
+                self.blobs[key] = value
+                self._thread_blobs[thread_id].add(key)
+        self.loads += 1
+
+    def _thread_size(self, thread_id: str) -> int:
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for (_, checkpoint), (_, metadata), _parent in checkpoints.values():
+                size += len(checkpoint) + len(metadata)
+        for key in self._thread_writes.get(thread_id, ()):
+            for _task_id, _channel, (_, value), _path in self.writes.get(key, {}).values():
+                size += len(value)
+        for key in self._thread_blobs.get(thread_id, ()):
+            if key in self.blobs:
+                size += len(self.blobs[key][1])
+        return size
+
+
+def _row(kind: str, *key: Any) -> str:
+    """Backend row key of a checkpoint ('c'), pending write ('w') or channel blob ('b')."""
+    return json.dumps([kind, *key])
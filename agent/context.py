@@ -0,0 +1,238 @@
+import json
+import logging
+import threading
+
+from dataclasses import dataclass
+from typing import Any
+
+import tiktoken
+
+from cachetools import LRUCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_MESSAGE_ID = 'conversation-summary'
+
+SUMMARY_INSTRUCTION = (
+    'You maintain a running summary of a conversation between an Orange Theory Fitness member '
+    'and their assistant. Merge the existing summary with the new turns into one concise summary. '
+    'Keep facts later turns may need: studio names and UUIDs, class and booking ids, dates, '
+    'member preferences, and anything the member asked for that is still open. Drop raw tool output.'
+)
+
+
+@dataclass
+class ContextStats:
+    steps: int = 0
+    compactions: int = 0
+    summaries: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    last_tokens_before: int = 0
+    last_tokens_after: int = 0
+
+
+class ContextManager:
+    """``pre_model_hook`` that keeps each model call under a token budget.
+
+    When a thread's messages exceed ``budget_tokens`` the hook first cuts
+    tool outputs from earlier turns down to ``old_tool_tokens`` (any single
+    tool output is capped at ``max_tool_tokens``). If that is not enough,
+    the oldest whole turns are folded into a rolling summary. The summary
+    is a SystemMessage at the head of the thread, so it is checkpointed
+    with the thread and only the turns dropped since the last compaction
+    are sent for summarization. The compacted list replaces the thread's
+    messages, which bounds both later model calls and the checkpoint.
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        budget_tokens: int = 12000,
+        old_tool_tokens: int = 300,
+        max_tool_tokens: int = 4000,
+        encoding: str = 'o200k_base',
+    ):
+        self.model = model
+        self.budget_tokens = budget_tokens
+        self.old_tool_tokens = old_tool_tokens
+        self.max_tool_tokens = max_tool_tokens
+        self.encoding_name = encoding
+        self._encoding = None
+        self.stats = ContextStats()
+        self._counts: LRUCache = LRUCache(maxsize=20000)
+        self._lock = threading.Lock()
+
+    async def __call__(self, state: dict[str, Any]) -> dict[str, Any]:
+        messages = list(state['messages'])
+        before = self.count(messages)
+        if before <= self.budget_tokens:
+            self._record(before, before, compacted=False)
+            return {'llm_input_messages': messages}
+
+        summary, turns = self._split_turns(messages)
+        current = turns.pop() if turns else []
+        turns = [[self._shrink(m, self.old_tool_tokens) for m in turn] for turn in turns]
+        current = [self._shrink(m, self.max_tool_tokens) for m in current]
+
+        dropped: list[AnyMessage] = []
+        kept = [m for turn in turns for m in turn]
+        while turns and self.count(([summary] if summary else []) + kept + current) > self.budget_tokens:
+            dropped.extend(turns.pop(0))
+            kept = [m for turn in turns for m in turn]
+        if dropped:
+            summary = await self._summarize(summary, dropped)
+
+        compacted = ([summary] if summary else []) + kept + current
+        after = self.count(compacted)
+        self._record(before, after, compacted=True)
+        logger.info(
+            f'Compacted context from {before} to {after} tokens '
+            f'({len(dropped)} messages summarized)'
+        )
+        # llm_input_messages is a plain channel: set it too, or the model
+        # would read the value an earlier step left there.
+        return {
+            'messages': [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted],
+            'llm_input_messages': compacted,
+        }
+
+    def count(self, messages: list[AnyMessage]) -> int:
+        return sum(self._count_message(m) for m in messages)
+
+    def count_text(self, text: str) -> int:
+        return len(self._encode(text))
+
+    def get_stats(self) -> dict[str, Any]:
+        s = self.stats
+        return {
+            'model_calls': s.steps,
+            'compactions': s.compactions,
+            'summaries': s.summaries,
+            'avg_prompt_tokens_before': s.tokens_before / s.steps if s.steps else 0,
+            'avg_prompt_tokens_after': s.tokens_after / s.steps if s.steps else 0,
+            'last_prompt_tokens_before': s.last_tokens_before,
+            'last_prompt_tokens_after': s.last_tokens_after,
+        }
+
+    def _record(self, before: int, after: int, compacted: bool):
+        with self._lock:
+            self.stats.steps += 1
+            self.stats.compactions += int(compacted)
+            self.stats.tokens_before += before
+            self.stats.tokens_after += after
+            self.stats.last_tokens_before = before
+            self.stats.last_tokens_after = after
+
+    def _count_message(self, message: AnyMessage) -> int:
+        text = self._text(message)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            text += json.dumps(message.tool_calls, default=str)
+        key = (message.id, hash(text))
+        count = self._counts.get(key)
+        if count is None:
+            # ~4 tokens of per-message framing in the chat format.
+            count = len(self._encode(text)) + 4
+            self._counts[key] = count
+        return count
+
+    @staticmethod
+    def _text(message: AnyMessage) -> str:
+        if isinstance(message.content, str):
+            return message.content
+        return json.dumps(message.content, default=str)
+
+    def _encode(self, text: str) -> list:
+        if self._encoding is None:
+            try:
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                # tiktoken downloads the BPE file on first use; without it,
+                # fall back to ~4 characters per token.
+                logger.warning(f'Could not load tiktoken encoding {self.encoding_name}: {e}')
+                self._encoding = False
+        if self._encoding is False:
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+        return self._encoding.encode(text, disallowed_special=())
+
+    def _truncate(self, text: str, limit: int) -> str:
+        tokens = self._encode(text)
+        if len(tokens) <= limit:
+            return text
+        head = (
+            ''.join(tokens[:limit])
+            if self._encoding is False
+            else self._encoding.decode(tokens[:limit])
+        )
+        return head + f'\n...[truncated {len(tokens) - limit} tokens]'
+
+    def _shrink(self, message: AnyMessage, limit: int) -> AnyMessage:
+        if not isinstance(message, ToolMessage):
+            return message
+        text = self._text(message)
+        truncated = self._truncate(text, limit)
+        if truncated is text:
+            return message
+        return message.model_copy(update={'content': truncated})
+
+    @staticmethod
+    def _split_turns(
+        messages: list[AnyMessage],
+    ) -> tuple[SystemMessage | None, list[list[AnyMessage]]]:
+        """Splits messages into turns, each starting at a HumanMessage.
+
+        Cutting only at turn boundaries keeps every tool call paired with
+        its ToolMessage.
+        """
+        summary = None
+        if messages and messages[0].id == SUMMARY_MESSAGE_ID:
+            summary, messages = messages[0], messages[1:]
+        turns: list[list[AnyMessage]] = []
+        for message in messages:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return summary, turns
+
+    async def _summarize(
+        self, summary: SystemMessage | None, dropped: list[AnyMessage]
+    ) -> SystemMessage:
+        lines = []
+        if summary is not None:
+            lines.append(f'Existing summary:\n{summary.content}\n')
+        lines.append('New turns:')
+        for message in dropped:
+            if isinstance(message, HumanMessage):
+                lines.append(f'Member: {self._text(message)}')
+            elif isinstance(message, ToolMessage):
+                lines.append(f'Tool {message.name}: {self._truncate(self._text(message), 150)}')
+            elif isinstance(message, AIMessage):
+                if message.tool_calls:
+                    calls = ', '.join(
+                        f"{c['name']}({json.dumps(c['args'], default=str)})"
+                        for c in message.tool_calls
+                    )
+                    lines.append(f'Assistant called: {calls}')
+                if message.content:
+                    lines.append(f'Assistant: {self._text(message)}')
+        response = await self.model.ainvoke(
+            [SystemMessage(content=SUMMARY_INSTRUCTION), HumanMessage(content='\n'.join(lines))]
+        )
+        with self._lock:
+            self.stats.summaries += 1
+        return SystemMessage(
+            content=f'Summary of the earlier conversation:\n{response.content}',
+            id=SUMMARY_MESSAGE_ID,
+        )
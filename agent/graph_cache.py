@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from langgraph.graph.graph import CompiledGraph
+
+from mcp_session import SharedMcpSession
+from metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class GraphSnapshot:
+    """An immutable (tools, graph) pair built from one MCP tool listing.
+
+    Requests hold on to the snapshot they started with, so a refresh never
+    swaps the graph out from under an in-flight run.
+    """
+
+    graph: CompiledGraph
+    tools: list[BaseTool]
+    fingerprint: str
+    built_at: float
+
+
+@dataclass
+class GraphCacheStats:
+    hits: int = 0
+    misses: int = 0
+    rebuilds: int = 0
+    refresh_checks: int = 0
+    refresh_errors: int = 0
+    last_rebuild_seconds: float = 0.0
+    total_rebuild_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'rebuilds': self.rebuilds,
+            'refresh_checks': self.refresh_checks,
+            'refresh_errors': self.refresh_errors,
+            'last_rebuild_seconds': self.last_rebuild_seconds,
+            'avg_rebuild_seconds': (
+                self.total_rebuild_seconds / self.rebuilds if self.rebuilds else 0.0
+            ),
+        }
+
+
+class GraphCache:
+    """Caches the MCP toolset and the compiled ReAct graph built on top of it.
+
+    The tool list is fingerprinted (server name/version plus every tool's
+    name, description and input schema). The cached graph is served until a
+    background check, run at most once per ``refresh_interval`` seconds,
+    sees a different fingerprint. Every tool of a server calls it through
+    one ``SharedMcpSession``, which bounds how many calls run at once.
+    """
+
+    def __init__(
+        self,
+        connections: dict[str, dict[str, Any]],
+        build_graph: Callable[[list[BaseTool]], CompiledGraph],
+        refresh_interval: float = 60.0,
+        max_concurrency: int = 8,
+        tool_timeout: float = 60.0,
+    ):
+        self.connections = connections
+        self.sessions = {
+            server_name: SharedMcpSession(connection, max_concurrency, tool_timeout)
+            for server_name, connection in connections.items()
+        }
+        self.build_graph = build_graph
+        self.refresh_interval = refresh_interval
+        self.stats = GraphCacheStats()
+        self._snapshot: GraphSnapshot | None = None
+        self._checked_at = 0.0
+        self._lock: asyncio.Lock | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def snapshot(self) -> GraphSnapshot | None:
+        return self._snapshot
+
+    async def get(self) -> GraphSnapshot:
+        """Returns the current snapshot, building it on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.stats.misses += 1
+            return await self.refresh(force=False)
+
+        self.stats.hits += 1
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            self._schedule_refresh()
+        return snapshot
+
+    async def warm_up(self):
+        try:
+            await self.refresh(force=False)
+        except Exception as e:
+            logger.warning(f'MCP tool warm-up failed, will retry on first request: {e}')
+
+    async def refresh(self, force: bool = False) -> GraphSnapshot:
+        """Re-lists the MCP tools and rebuilds the graph if they changed."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            current = self._snapshot
+            if (
+                current is not None
+                and not force
+                and time.monotonic() - self._checked_at < self.refresh_interval
+            ):
+                return current
+
+            self.stats.refresh_checks += 1
+            with metrics.span('mcp_discovery'):
+                tools, fingerprint = await self._load_tools()
+            self._checked_at = time.monotonic()
+            if current is not None and current.fingerprint == fingerprint:
+                return current
+
+            start = time.perf_counter()
+            with metrics.span('graph_build', tools=len(tools)):
+                graph = self.build_graph(tools)
+            elapsed = time.perf_counter() - start
+
+            self.stats.rebuilds += 1
+            self.stats.last_rebuild_seconds = elapsed
+            self.stats.total_rebuild_seconds += elapsed
+            self._snapshot = GraphSnapshot(
+                graph=graph,
+                tools=tools,
+                fingerprint=fingerprint,
+                built_at=time.time(),
+            )
+            logger.info(
+                f'Built agent graph with {len(tools)} MCP tools in {elapsed:.3f}s '
+                f'(fingerprint {fingerprint[:12]})'
+            )
+            return self._snapshot
+
+    async def close(self):
+        for session in self.sessions.values():
+            await session.close()
+
+    def _schedule_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh(force=False)
+        except Exception as e:
+            self.stats.refresh_errors += 1
+            # Keep serving the last good graph; try again after another interval.
+            self._checked_at = time.monotonic()
+            logger.warning(f'Failed to refresh MCP tools: {e}')
+
+    async def _load_tools(self) -> tuple[list[BaseTool], str]:
+        client = MultiServerMCPClient(self.connections)
+        digest = hashlib.sha256()
+        tools: list[BaseTool] = []
+        for server_name in self.connections:
+            async with client.session(server_name, auto_initialize=False) as session:
+                init_result = await session.initialize()
+                listed = await session.list_tools()
+            server_info = init_result.serverInfo
+            digest.update(f'{server_name}:{server_info.name}:{server_info.version}'.encode())
+            for mcp_tool in sorted(listed.tools, key=lambda t: t.name):
+                digest.update(
+                    json.dumps(
+                        [mcp_tool.name, mcp_tool.description, mcp_tool.inputSchema],
+                        sort_keys=True,
+                        default=str,
+                    ).encode()
+                )
+                logger.debug(f'MCP tool {mcp_tool.name}: {mcp_tool.inputSchema}')
+                # Tools call through the shared session, not the listing one,
+                # so the snapshot outlives this session.
+                tools.append(
+                    convert_mcp_tool_to_langchain_tool(self.sessions[server_name], mcp_tool)
+                )
+        return tools, digest.hexdigest()
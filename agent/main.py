@@ -1,10 +1,15 @@
+import json
 import logging
 import os
 import asyncio
 
 import click
+import uvicorn
 
 from agent import OrangeTheoryAgent
+from member_auth import MEMBER_SECRET, MemberAuthMiddleware, MemberKeys
+from metrics import metrics
+from shared_backend import shared_backend
 from task_manager import AgentTaskManager
 from google_a2a.common.server import A2AServer
 from google_a2a.common.types import (
@@ -13,60 +18,146 @@ from google_a2a.common.types import (
     AgentSkill,
 )
 from google_a2a.common.utils.push_notification_auth import PushNotificationSenderAuth
+from starlette.responses import JSONResponse, PlainTextResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def main(host, port):
+def build_server(host, port) -> A2AServer:
+    """Builds the agent, its task manager and the A2A server around them."""
+    capabilities = AgentCapabilities(streaming=True, pushNotifications=True)
+    skill = AgentSkill(
+        id='otf_assistant',
+        name='Orange Theory Assistant',
+        description='Helps with Orange Theory Fitness bookings, classes, stats, and studio information.',
+        tags=['otf', 'fitness', 'bookings', 'classes', 'stats', 'studio'],
+        examples=['Book me into a class tomorrow', 'Show my stats for last month', 'Find studios near me'],
+    )
+    agent_card = AgentCard(
+        name='Orange Theory Agent',
+        description='Helps with Orange Theory Fitness bookings, classes, stats, and studio information.',
+        url=f'http://{host}:{port}/',
+        version='1.0.0',
+        defaultInputModes=OrangeTheoryAgent.SUPPORTED_CONTENT_TYPES,
+        defaultOutputModes=OrangeTheoryAgent.SUPPORTED_CONTENT_TYPES,
+        capabilities=capabilities,
+        skills=[skill],
+    )
+
+    # Optional OpenTelemetry export of the same spans and metrics: console or otlp.
+    metrics.enable_otel(os.getenv('AGENT_OTEL_EXPORTER'))
+
+    notification_sender_auth = PushNotificationSenderAuth()
+    notification_sender_auth.generate_jwk()
+    agent = OrangeTheoryAgent()
+    task_manager = AgentTaskManager(
+        agent=agent,
+        notification_sender_auth=notification_sender_auth,
+    )
+
+    server = A2AServer(
+        agent_card=agent_card,
+        task_manager=task_manager,
+        host=host,
+        port=port,
+    )
+
+    # With AGENT_MEMBER_KEYS_FILE set, clients authenticate with a per-member
+    # API key and act for that member only; without it, for the default one.
+    member_keys = MemberKeys.load(os.getenv('AGENT_MEMBER_KEYS_FILE'))
+    if member_keys is not None and MEMBER_SECRET is None:
+        raise RuntimeError('AGENT_MEMBER_KEYS_FILE needs OTF_MEMBER_SECRET, shared with the MCP server')
+    server.app.add_middleware(MemberAuthMiddleware, keys=member_keys)
+
+    backend = shared_backend()
+    if backend is None:
+        jwks_endpoint = notification_sender_auth.handle_jwks_endpoint
+    else:
+        # Every worker signs with its own key; publish all of them so a
+        # receiver can verify a notification from any worker.
+        for key in notification_sender_auth.public_keys:
+            backend.put('jwks', key['kid'], json.dumps(key))
+
+        def jwks_endpoint(_request):
+            keys = (backend.get('jwks', kid) for kid in backend.keys('jwks'))
+            return JSONResponse({'keys': [json.loads(row[0]) for row in keys if row]})
+
+    server.app.add_route(
+        '/.well-known/jwks.json',
+        jwks_endpoint,
+        methods=['GET'],
+    )
+
+    def stats():
+        return {
+            'graph_cache': agent.get_cache_stats(),
+            'checkpointer': agent.get_checkpointer_stats(),
+            'tool_cache': agent.get_tool_cache_stats(),
+            'mcp_sessions': agent.get_mcp_session_stats(),
+            'fast_path': agent.get_router_stats(),
+            'answer_cache': agent.get_answer_cache_stats(),
+            'context': agent.get_context_stats(),
+            'tool_selection': agent.get_tool_selection_stats(),
+            'scheduler': task_manager.scheduler.stats(),
+            'push_notifications': task_manager.notification_dispatcher.stats(),
+            'task_store': task_manager.tasks.stats(),
+        }
+
+    server.app.add_route(
+        '/agent/stats',
+        lambda _request: JSONResponse(stats()),
+        methods=['GET'],
+    )
+    # Prometheus scrape target: stage/LLM/tool metrics plus the stats above as gauges.
+    server.app.add_route(
+        '/metrics',
+        lambda _request: PlainTextResponse(
+            metrics.render(stats()), media_type='text/plain; version=0.0.4'
+        ),
+        methods=['GET'],
+    )
+    # Load the MCP tools and compile the graph before taking traffic.
+    server.app.add_event_handler('startup', agent.warm_up)
+    # Persist resident conversations so a restart can resume them.
+    server.app.add_event_handler('shutdown', agent.close)
+    server.app.add_event_handler('shutdown', task_manager.notification_dispatcher.close)
+
+    if backend is not None:
+        server.app.add_event_handler('shutdown', backend.close)
+    return server
+
+
+def create_app():
+    """App factory uvicorn calls in each worker process."""
+    host = os.getenv('AGENT_HOST', '0.0.0.0')
+    port = int(os.getenv('AGENT_PORT', '10000'))
+    return build_server(host, port).app
+
+
+def main(host, port, app='main:create_app'):
     """Starts the Orange Theory Agent server."""
     try:
-    
-        capabilities = AgentCapabilities(streaming=False, pushNotifications=True)
-        skill = AgentSkill(
-            id='otf_assistant',
-            name='Orange Theory Assistant',
-            description='Helps with Orange Theory Fitness bookings, classes, stats, and studio information.',
-            tags=['otf', 'fitness', 'bookings', 'classes', 'stats', 'studio'],
-            examples=['Book me into a class tomorrow', 'Show my stats for last month', 'Find studios near me'],
-        )
-        agent_card = AgentCard(
-            name='Orange Theory Agent',
-            description='Helps with Orange Theory Fitness bookings, classes, stats, and studio information.',
-            url=f'http://{host}:{port}/',
-            version='1.0.0',
-            defaultInputModes=OrangeTheoryAgent.SUPPORTED_CONTENT_TYPES,
-            defaultOutputModes=OrangeTheoryAgent.SUPPORTED_CONTENT_TYPES,
-            capabilities=capabilities,
-            skills=[skill],
-        )
-
-        notification_sender_auth = PushNotificationSenderAuth()
-        notification_sender_auth.generate_jwk()
-        agent = OrangeTheoryAgent()
-    
-        server = A2AServer(
-            agent_card=agent_card,
-            task_manager=AgentTaskManager(
-                agent= agent,
-                notification_sender_auth=notification_sender_auth,
-            ),
-            host=host,
-            port=port,
-        )
-
-        server.app.add_route(
-            '/.well-known/jwks.json',
-            notification_sender_auth.handle_jwks_endpoint,
-            methods=['GET'],
-        )
-
-        logger.info(f'Starting server on {host}:{port}')
-        server.start()
+        workers = int(os.getenv('AGENT_WORKERS', '1'))
+        if workers <= 1:
+            server = build_server(host, port)
+            logger.info(f'Starting server on {host}:{port}')
+            server.start()
+            return
+
+        # Workers are separate processes: tasks, SSE events and conversation
+        # checkpoints must live in the shared backend.
+        if shared_backend() is None:
+            logger.error('AGENT_WORKERS > 1 needs AGENT_SHARED_DB, a SQLite path all workers share')
+            exit(1)
+        os.environ['AGENT_HOST'] = host
+        os.environ['AGENT_PORT'] = str(port)
+        logger.info(f'Starting {workers} workers on {host}:{port}')
+        uvicorn.run(app, factory=True, host=host, port=port, workers=workers)
     except Exception as e:
         logger.error(f'An error occurred during server startup: {e}')
         exit(1)
 
 
-
-main("0.0.0.0", 10000)
\ No newline at end of file
+if __name__ == '__main__':
+    main("0.0.0.0", 10000)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+
+from datetime import timedelta
+from typing import Any
+
+import anyio
+import httpx
+
+from langchain_core.runnables import ensure_config
+from langchain_mcp_adapters.sessions import Connection, create_session
+from mcp import ClientSession, types
+from mcp.types import CallToolResult
+
+from member_auth import MEMBER_SECRET, sign_member
+
+
+logger = logging.getLogger(__name__)
+
+
+# Errors that mean the session itself is gone, not that one call failed.
+_CONNECTION_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    httpx.TransportError,
+    ConnectionError,
+)
+
+
+class SharedMcpSession:
+    """One long-lived MCP client session shared by every tool call to a server.
+
+    Tool calls are JSON-RPC requests multiplexed over the session, so the
+    parallel tool calls of one model turn go out together instead of each
+    paying for its own SSE connect and ``initialize`` handshake. At most
+    ``max_concurrency`` calls are in flight at once; the rest wait their turn.
+
+    The session is opened lazily by an owner task, which keeps the transport's
+    context open until ``close``. If the connection drops, a call that could
+    not be sent is retried once on a fresh session; calls already sent raise.
+    """
+
+    def __init__(self, connection: Connection, max_concurrency: int = 8, timeout: float = 60.0):
+        self.connection = connection
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore: asyncio.Semaphore | None = None
+        self._owner: asyncio.Task | None = None
+        self._ready: asyncio.Future | None = None
+        self._closing: asyncio.Event | None = None
+        self._current: ClientSession | None = None
+        self._in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.connects = 0
+        self.peak_in_flight = 0
+
+    async def call_tool(self, name: str, arguments: dict[str, Any] | None = None) -> CallToolResult:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.calls += 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+            session = None
+            try:
+                session = await self._session()
+                try:
+                    return await self._call(session, name, arguments)
+                except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                    # The request was never written to the dead session, so
+                    # sending it again on a fresh one is safe.
+                    self._discard(session)
+                    session = await self._session()
+                    return await self._call(session, name, arguments)
+            except _CONNECTION_ERRORS:
+                self.errors += 1
+                self._discard(session)
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self._in_flight -= 1
+
+    async def _call(self, session: ClientSession, name: str, arguments: dict[str, Any] | None):
+        timeout = timedelta(seconds=self.timeout)
+        # The member of the conversation running this tool, from its run config.
+        member = ensure_config().get('configurable', {}).get('otf_member')
+        if member is None:
+            return await session.call_tool(name, arguments, read_timeout_seconds=timeout)
+        if MEMBER_SECRET is None:
+            raise RuntimeError('Acting for a member needs OTF_MEMBER_SECRET')
+        # call_tool can't set _meta, which is where the MCP server reads
+        # whose OTF account the call acts on. The member is the one the A2A
+        # request authenticated as, signed so the server can check it.
+        meta = {'otf_member': member, 'otf_member_signature': sign_member(member, MEMBER_SECRET)}
+        request = types.ClientRequest(
+            types.CallToolRequest(
+                method='tools/call',
+                params=types.CallToolRequestParams(
+                    name=name, arguments=arguments, _meta=meta
+                ),
+            )
+        )
+        return await session.send_request(
+            request, CallToolResult, request_read_timeout_seconds=timeout
+        )
+
+    async def close(self):
+        owner = self._owner
+        self._discard()
+        if owner is not None:
+            await asyncio.gather(owner, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'connected': self._owner is not None and not self._owner.done(),
+            'connects': self.connects,
+            'calls': self.calls,
+            'errors': self.errors,
+            'in_flight': self._in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'max_concurrency': self.max_concurrency,
+        }
+
+    async def _session(self) -> ClientSession:
+        if self._owner is None or self._owner.done():
+            self._ready = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._owner = asyncio.create_task(self._own(self._ready, self._closing))
+            self.connects += 1
+        # Shielded so one cancelled caller can't cancel the shared handshake.
+        self._current = await asyncio.shield(self._ready)
+        return self._current
+
+    async def _own(self, ready: asyncio.Future, closing: asyncio.Event):
+        # The transport's task groups must be entered and exited by the same
+        # task, so this task holds the session for its whole life.
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                ready.set_result(session)
+                await closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f'MCP session closed with an error: {e}')
+        finally:
+            if not ready.done():
+                ready.cancel()
+
+    def _discard(self, session: ClientSession | None = None):
+        # A call that failed on an already replaced session leaves the new one alone.
+        if session is not None and session is not self._current:
+            return
+        # New calls open a fresh session; the old owner closes its transport.
+        if self._closing is not None:
+            self._closing.set()
+        self._owner = None
+        self._ready = None
+        self._closing = None
+        self._current = None
@@ -0,0 +1,95 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+
+from contextvars import ContextVar
+
+from starlette.responses import JSONResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+# Shared with the MCP server, which only acts for a named member when the
+# name comes with a valid signature made with it.
+MEMBER_SECRET = os.getenv('OTF_MEMBER_SECRET')
+
+# The member the A2A request being served authenticated as; None means the
+# default member of a single-member deployment.
+authenticated_member: ContextVar[str | None] = ContextVar('authenticated_member', default=None)
+
+
+class UnauthenticatedMemberError(PermissionError):
+    """Raised when a request names a member it did not authenticate as."""
+
+
+def sign_member(member: str, secret: str) -> str:
+    """Signature the MCP server checks before acting for ``member``."""
+    return hmac.new(secret.encode(), member.encode(), hashlib.sha256).hexdigest()
+
+
+class MemberKeys:
+    """API keys clients present as ``Authorization: Bearer <key>``.
+
+    Loaded from a JSON file of {"<member>": "<api key>"}; each key acts for
+    its member only. Keys are held as SHA-256 digests, so a lookup never
+    compares the secret itself.
+    """
+
+    def __init__(self, keys: dict[str, str]):
+        self._members = {_digest(key): member for member, key in keys.items()}
+
+    @classmethod
+    def load(cls, path: str | None) -> 'MemberKeys | None':
+        if not path:
+            return None
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def member(self, key: str) -> str | None:
+        return self._members.get(_digest(key)) if key else None
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.sha256(key.encode()).digest()
+
+
+class MemberAuthMiddleware:
+    """Authenticates A2A calls and records the member they act for.
+
+    With ``keys`` set every POST must carry a known bearer key and is
+    rejected with 401 otherwise; the key's member is then the only one the
+    request can act for. Without keys every request acts for the default
+    member. Other methods (the agent card, stats, JWKS) stay public.
+    """
+
+    def __init__(self, app, keys: MemberKeys | None = None):
+        self.app = app
+        self.keys = keys
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or self.keys is None:
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope['headers']).get(b'authorization', b'').decode('latin-1')
+        scheme, _, key = header.partition(' ')
+        member = self.keys.member(key.strip()) if scheme.lower() == 'bearer' else None
+        if member is None:
+            logger.warning(f'Rejecting unauthenticated request to {scope["path"]}')
+            response = JSONResponse(
+                {'error': 'Missing or unknown API key'},
+                status_code=401,
+                headers={'WWW-Authenticate': 'Bearer'},
+            )
+            await response(scope, receive, send)
+            return
+        token = authenticated_member.set(member)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            authenticated_member.reset(token)
@@ -0,0 +1,303 @@
+import logging
+import re
+import threading
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from opentelemetry import metrics as otel_metrics
+from opentelemetry import trace
+
+
+logger = logging.getLogger(__name__)
+
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (type, help). Every metric the agent records is declared here.
+METRICS = {
+    'stage_seconds': ('histogram', 'Time spent in each stage of handling a task.'),
+    'stage_errors_total': ('counter', 'Stages that raised.'),
+    'llm_calls_total': ('counter', 'Chat model calls.'),
+    'llm_errors_total': ('counter', 'Chat model calls that raised.'),
+    'llm_seconds': ('histogram', 'Chat model call latency.'),
+    'llm_tokens_total': ('counter', 'Tokens used by chat model calls.'),
+    'tool_calls_total': ('counter', 'MCP tool calls.'),
+    'tool_errors_total': ('counter', 'MCP tool calls that raised.'),
+    'tool_seconds': ('histogram', 'MCP tool call latency.'),
+    'tool_payload_bytes': ('histogram', 'Size of MCP tool results.'),
+    'answer_cache_lookups_total': ('counter', 'Shared answer cache lookups, by result.'),
+}
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process counters and histograms, rendered in the Prometheus text format.
+
+    ``span`` times a stage into ``stage_seconds`` and opens an OpenTelemetry
+    span around it. Spans and metrics are no-ops for OpenTelemetry until
+    ``enable_otel`` installs an SDK provider, so the ``/metrics`` route works
+    with no exporter configured.
+    """
+
+    def __init__(self, namespace: str = 'otf_agent'):
+        self.namespace = namespace
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+        self._lock = threading.Lock()
+        self.tracer = trace.get_tracer(namespace)
+        self._otel_instruments: Optional[dict[str, Any]] = None
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self._otel_instruments is not None:
+            self._otel_instruments[name].add(value, labels)
+
+    def observe(
+        self, name: str, value: float, buckets: tuple[float, ...] = SECONDS_BUCKETS, **labels: str
+    ):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+        if self._otel_instruments is not None:
+            self._otel_instruments[name].record(value, labels)
+
+    @contextmanager
+    def span(self, stage: str, **attributes: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        with self.tracer.start_as_current_span(stage, attributes=attributes):
+            try:
+                yield
+            except BaseException:
+                self.inc('stage_errors_total', stage=stage)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                self.observe('stage_seconds', elapsed, stage=stage)
+                logger.debug(f'stage={stage} seconds={elapsed:.4f} {attributes}')
+
+    def enable_otel(self, exporter: Optional[str]):
+        """Exports spans and metrics through the OpenTelemetry SDK.
+
+        ``exporter`` is ``console`` (stdout, from opentelemetry-sdk) or
+        ``otlp`` (needs opentelemetry-exporter-otlp-proto-http).
+        """
+        if not exporter:
+            return
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import (
+            ConsoleMetricExporter,
+            PeriodicExportingMetricReader,
+        )
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if exporter == 'console':
+            span_exporter, metric_exporter = ConsoleSpanExporter(), ConsoleMetricExporter()
+        elif exporter == 'otlp':
+            try:
+                from opentelemetry.exporter.otlp.proto.http.metric_exporter import (
+                    OTLPMetricExporter,
+                )
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                    OTLPSpanExporter,
+                )
+            except ImportError:
+                logger.warning(
+                    'OTLP export needs opentelemetry-exporter-otlp-proto-http; '
+                    'OpenTelemetry export stays off'
+                )
+                return
+            span_exporter, metric_exporter = OTLPSpanExporter(), OTLPMetricExporter()
+        else:
+            logger.warning(f'Unknown OpenTelemetry exporter {exporter!r}; export stays off')
+            return
+
+        tracer_provider = TracerProvider()
+        tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        trace.set_tracer_provider(tracer_provider)
+        otel_metrics.set_meter_provider(
+            MeterProvider(metric_readers=[PeriodicExportingMetricReader(metric_exporter)])
+        )
+        self.tracer = trace.get_tracer(self.namespace)
+
+        meter = otel_metrics.get_meter(self.namespace)
+        instruments = {}
+        for name, (kind, description) in METRICS.items():
+            full_name = f'{self.namespace}_{name}'
+            if kind == 'counter':
+                instruments[name] = meter.create_counter(full_name, description=description)
+            else:
+                instruments[name] = meter.create_histogram(full_name, description=description)
+        self._otel_instruments = instruments
+        logger.info(f'OpenTelemetry export enabled ({exporter})')
+
+    def render(self, gauges: Optional[dict[str, Any]] = None) -> str:
+        """Prometheus text exposition of every metric, plus ``gauges``.
+
+        ``gauges`` is a nested dict such as the ``/agent/stats`` payload;
+        every numeric leaf becomes a gauge named after its path.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items()
+            }
+
+        lines = []
+        for name, (kind, description) in METRICS.items():
+            full_name = f'{self.namespace}_{name}'
+            lines.append(f'# HELP {full_name} {description}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{full_name}{_labels(labels)} {value:g}')
+                continue
+            for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(
+                        f'{full_name}_bucket{_labels(labels + (("le", f"{bound:g}"),))} {cumulative}'
+                    )
+                lines.append(f'{full_name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{full_name}_sum{_labels(labels)} {total:g}')
+                lines.append(f'{full_name}_count{_labels(labels)} {count}')
+
+        for path, value in _flatten(gauges or {}):
+            full_name = re.sub(r'[^a-zA-Z0-9_]', '_', f'{self.namespace}_{path}')
+            lines.append(f'# TYPE {full_name} gauge')
+            lines.append(f'{full_name} {float(value):g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    pairs = (
+        '{}="{}"'.format(
+            key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for key, value in labels
+    )
+    return '{' + ','.join(pairs) + '}'
+
+
+def _flatten(data: dict[str, Any], prefix: str = '') -> Iterator[tuple[str, float]]:
+    for key, value in data.items():
+        path = f'{prefix}_{key}' if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records per-call LLM and MCP tool metrics from LangChain callbacks."""
+
+    # Bookkeeping only; don't hop to an executor for every event.
+    run_inline = True
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._runs: dict[UUID, tuple[float, str, Any]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        metadata = kwargs.get('metadata') or {}
+        model = metadata.get('ls_model_name') or (serialized or {}).get('name') or 'unknown'
+        span = self.metrics.tracer.start_span('llm_call', attributes={'model': model})
+        self._runs[run_id] = (time.perf_counter(), model, span)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, model, span = run
+        elapsed = time.perf_counter() - start
+        self.metrics.inc('llm_calls_total', model=model)
+        self.metrics.observe('llm_seconds', elapsed, model=model)
+        self.metrics.observe('stage_seconds', elapsed, stage='llm_call')
+
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if usage:
+                    input_tokens += usage.get('input_tokens', 0)
+                    output_tokens += usage.get('output_tokens', 0)
+        if input_tokens or output_tokens:
+            self.metrics.inc('llm_tokens_total', input_tokens, model=model, kind='input')
+            self.metrics.inc('llm_tokens_total', output_tokens, model=model, kind='output')
+            span.set_attribute('input_tokens', input_tokens)
+            span.set_attribute('output_tokens', output_tokens)
+        span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        _, model, span = run
+        self.metrics.inc('llm_errors_total', model=model)
+        span.record_exception(error)
+        span.end()
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, **kwargs: Any):
+        name = (serialized or {}).get('name') or kwargs.get('name') or 'unknown'
+        span = self.metrics.tracer.start_span('tool_call', attributes={'tool': name})
+        self._runs[run_id] = (time.perf_counter(), name, span)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, name, span = run
+        elapsed = time.perf_counter() - start
+        content = getattr(output, 'content', output)
+        payload_bytes = len(content.encode() if isinstance(content, str) else str(content).encode())
+        self.metrics.inc('tool_calls_total', tool=name)
+        self.metrics.observe('tool_seconds', elapsed, tool=name)
+        self.metrics.observe('tool_payload_bytes', payload_bytes, BYTES_BUCKETS, tool=name)
+        self.metrics.observe('stage_seconds', elapsed, stage='tool_call')
+        span.set_attribute('payload_bytes', payload_bytes)
+        span.end()
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, name, span = run
+        self.metrics.inc('tool_calls_total', tool=name)
+        self.metrics.inc('tool_errors_total', tool=name)
+        self.metrics.observe('tool_seconds', time.perf_counter() - start, tool=name)
+        span.record_exception(error)
+        span.end()
+
+
+metrics = Metrics()
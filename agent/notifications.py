@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+import jwt
+
+from google_a2a.common.utils.push_notification_auth import PushNotificationSenderAuth
+from metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Notification:
+    url: str
+    data: dict
+    final: bool
+    attempts: int = 0
+
+
+class PushNotificationDispatcher:
+    """Sends A2A push notifications in the background.
+
+    ``submit`` only queues the payload, so a slow webhook receiver never
+    holds up a ``tasks/send`` response. Pending notifications are keyed by
+    (url, task id): a newer state for a task replaces the queued one in
+    place, so a WORKING update still waiting when the final state arrives
+    is never sent. Each destination gets its own keep-alive ``httpx``
+    client, and failed sends are retried with exponential backoff unless a
+    newer state for the task is already queued.
+    """
+
+    def __init__(
+        self,
+        notification_sender_auth: PushNotificationSenderAuth,
+        max_queue: int = 1000,
+        workers: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        timeout: float = 10.0,
+    ):
+        self.notification_sender_auth = notification_sender_auth
+        self.max_queue = max_queue
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self._pending: OrderedDict[tuple[str, str], _Notification] = OrderedDict()
+        self._in_flight: set[tuple[str, str]] = set()
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def submit(self, url: str, task_id: str, data: dict, final: bool):
+        self._ensure_workers()
+        key = (url, task_id)
+        if key in self._pending:
+            self._pending[key] = _Notification(url, data, final)
+            self.coalesced += 1
+        else:
+            if len(self._pending) >= self.max_queue and not self._make_room(final):
+                self.dropped += 1
+                logger.warning(f'Push notification queue full, dropping update for task {task_id}')
+                return
+            self._pending[key] = _Notification(url, data, final)
+        self._wakeup.set()
+
+    async def close(self):
+        for worker in self._worker_tasks:
+            worker.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'queued': len(self._pending),
+            'in_flight': len(self._in_flight),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'destinations': len(self._clients),
+        }
+
+    def _make_room(self, final: bool) -> bool:
+        # Interim updates are expendable; a final state is not.
+        if not final:
+            return False
+        for key, notification in self._pending.items():
+            if not notification.final:
+                del self._pending[key]
+                self.dropped += 1
+                return True
+        return False
+
+    def _ensure_workers(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                asyncio.create_task(self._worker()) for _ in range(self.workers)
+            ]
+
+    def _next(self) -> tuple[tuple[str, str], _Notification] | None:
+        # Skip tasks with a send already in flight so states arrive in order.
+        for key in self._pending:
+            if key not in self._in_flight:
+                return key, self._pending.pop(key)
+        return None
+
+    async def _worker(self):
+        while True:
+            item = self._next()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            key, notification = item
+            self._in_flight.add(key)
+            try:
+                await self._deliver(key, notification)
+            finally:
+                self._in_flight.discard(key)
+                if self._pending:
+                    self._wakeup.set()
+
+    async def _deliver(self, key: tuple[str, str], notification: _Notification):
+        while True:
+            notification.attempts += 1
+            try:
+                with metrics.span('push_notification'):
+                    await self._post(notification)
+                self.sent += 1
+                return
+            except Exception as e:
+                if key in self._pending or notification.attempts > self.max_retries:
+                    # Either superseded by a newer state or out of retries.
+                    self.failed += 1
+                    logger.warning(
+                        f'Error during sending push-notification for URL {notification.url}: {e}'
+                    )
+                    return
+                self.retries += 1
+                await asyncio.sleep(self.backoff_seconds * 2 ** (notification.attempts - 1))
+
+    async def _post(self, notification: _Notification):
+        # The same compact JSON A2A receivers hash to check the signature.
+        body = json.dumps(
+            notification.data, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+        ).encode()
+        headers = {
+            'Authorization': f'Bearer {self._sign(body)}',
+            'Content-Type': 'application/json',
+        }
+        response = await self._client_for(notification.url).post(
+            notification.url, content=body, headers=headers
+        )
+        response.raise_for_status()
+        logger.info(f'Push-notification sent for URL: {notification.url}')
+
+    def _sign(self, body: bytes) -> str:
+        """A2A push notification JWT over ``body``, signed with the sender's JWK."""
+        key = self.notification_sender_auth.private_key_jwk
+        return jwt.encode(
+            {'iat': int(time.time()), 'request_body_sha256': hashlib.sha256(body).hexdigest()},
+            key=key.key,
+            headers={'kid': key.key_id},
+            algorithm='RS256',
+        )
+
+    def _client_for(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        origin = f'{parts.scheme}://{parts.netloc}'
+        client = self._clients.get(origin)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60),
+            )
+            self._clients[origin] = client
+        return client
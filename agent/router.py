@@ -0,0 +1,277 @@
+import json
+import logging
+import re
+import time
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+
+from langchain_core.runnables.config import RunnableConfig
+from langchain_core.tools import BaseTool
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Route:
+    """A query pattern that maps straight onto one MCP tool call."""
+
+    name: str
+    patterns: tuple[re.Pattern, ...]
+    tool: str
+    render: Callable[[Any], Optional[str]]
+    arguments: Callable[[re.Match], dict[str, Any]] = lambda _match: {}
+
+
+@dataclass
+class RouteStats:
+    hits: int = 0
+    fallbacks: int = 0
+    total_seconds: float = 0.0
+    saved_seconds: float = 0.0
+
+
+def _parse(content: Any) -> Any:
+    """Decodes FastMCP tool output: one JSON text block per returned object."""
+    if isinstance(content, list):
+        return [_parse(item) for item in content]
+    if not content:
+        return []
+    try:
+        return _rows(json.loads(content))
+    except (TypeError, ValueError):
+        return content
+
+
+def _rows(data: Any) -> Any:
+    """Expands the MCP server's compact {"columns", "rows"} lists into objects."""
+    if not isinstance(data, dict) or data.keys() != {'columns', 'rows'}:
+        return data
+    objects = []
+    for row in data['rows']:
+        item: dict = {}
+        for column, value in zip(data['columns'], row):
+            *parents, key = column.split('.')
+            node = item
+            for parent in parents:
+                node = node.setdefault(parent, {})
+            node[key] = value
+        objects.append(item)
+    return objects
+
+
+def _as_list(value: Any) -> list:
+    if value in ('', None):
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _field(data: dict, *keys: str) -> Any:
+    """First present key; FastMCP dumps otf_api models by alias, not field name."""
+    for key in keys:
+        if data.get(key) is not None:
+            return data[key]
+    return None
+
+
+def _render_today(content: Any) -> Optional[str]:
+    today = date.fromisoformat(str(_parse(content)))
+    return f"Today is {today:%A, %B} {today.day}, {today.year} ({today.isoformat()})."
+
+
+def _render_bookings(content: Any) -> Optional[str]:
+    bookings = _as_list(_parse(content))
+    if not bookings:
+        return 'You have no upcoming bookings in the next 45 days.'
+    lines = []
+    for booking in bookings:
+        otf_class = _field(booking, 'class', 'otf_class')
+        starts_at = datetime.fromisoformat(_field(otf_class, 'starts_at_local', 'starts_at'))
+        studio = (otf_class.get('studio') or {}).get('name') or 'your studio'
+        coach = f" with {otf_class['coach']}" if otf_class.get('coach') else ''
+        lines.append(
+            f"- {otf_class['name']} at {studio} on {starts_at:%a %b} {starts_at.day}, "
+            f"{starts_at:%I:%M %p}{coach}"
+        )
+    return 'Here are your upcoming bookings:\n' + '\n'.join(lines)
+
+
+def _render_favorites(content: Any) -> Optional[str]:
+    studios = _as_list(_parse(content))
+    if not studios:
+        return "You don't have any favorite studios yet."
+    lines = []
+    for studio in studios:
+        location = _field(studio, 'studioLocation', 'location') or {}
+        address = ', '.join(
+            part for part in (location.get('address_line1'), location.get('city')) if part
+        )
+        name = _field(studio, 'studioName', 'name')
+        lines.append(f'- {name}' + (f' ({address})' if address else ''))
+    return 'Your favorite studios:\n' + '\n'.join(lines)
+
+
+_STATS_PERIODS = {
+    'this week': 'thisWeek',
+    'last week': 'lastWeek',
+    'this month': 'thisMonth',
+    'last month': 'lastMonth',
+    'this year': 'thisYear',
+    'last year': 'lastYear',
+}
+
+
+def _stats_arguments(match: re.Match) -> dict[str, Any]:
+    period = match.group('period')
+    return {'select_time': _STATS_PERIODS[period]} if period else {}
+
+
+def _render_stats(content: Any) -> Optional[str]:
+    stats = _parse(content)
+    if not isinstance(stats, dict):
+        return None
+    lines = []
+    for keys, label, unit in (
+        (('calories',), 'Calories burned', ''),
+        (('splatPoint', 'splat_point'), 'Splat points', ''),
+        (('workoutDuration', 'workout_duration'), 'Workout time', ' min'),
+        (('stepCount', 'step_count'), 'Steps', ''),
+        (('treadmillDistance', 'treadmill_distance'), 'Treadmill distance', ''),
+        (('rowerDistance', 'rower_distance'), 'Rower distance', ''),
+    ):
+        value = _field(stats, *keys)
+        if value is not None:
+            lines.append(f'- {label}: {value:,.0f}{unit}')
+    if not lines:
+        return None
+    return 'Your in-studio stats:\n' + '\n'.join(lines)
+
+
+ROUTES = (
+    Route(
+        name='today_date',
+        patterns=(
+            re.compile(r"^(what(?:'s| is) )?(today'?s date|the date( today)?)$"),
+            re.compile(r'^what day is (it|today)$'),
+        ),
+        tool='get_today_date',
+        render=_render_today,
+    ),
+    Route(
+        name='upcoming_bookings',
+        patterns=(
+            re.compile(
+                r'^((show|list|get)( me)?|what are) my (upcoming |next )?'
+                r'(bookings|booked classes|reservations)$'
+            ),
+            re.compile(r'^my (upcoming )?bookings$'),
+        ),
+        tool='get_bookings_new',
+        render=_render_bookings,
+    ),
+    Route(
+        name='favorite_studios',
+        patterns=(
+            re.compile(r'^((show|list|get)( me)?|what are) my favou?rite studios$'),
+            re.compile(r'^my favou?rite studios$'),
+        ),
+        tool='get_favorite_studios',
+        render=_render_favorites,
+    ),
+    Route(
+        name='lifetime_stats',
+        patterns=(
+            re.compile(
+                r'^((show|get)( me)?|what are) my (lifetime |all[- ]time |in[- ]studio )?'
+                r'(stats|statistics)( (for )?(?P<period>(this|last) (week|month|year)))?$'
+            ),
+        ),
+        tool='get_member_lifetime_stats_in_studio',
+        render=_render_stats,
+        arguments=_stats_arguments,
+    ),
+)
+
+
+class FastPathRouter:
+    """Answers a few high-confidence intents with one MCP tool call and a template.
+
+    Queries must fully match a route's pattern after normalization; anything
+    else, a missing tool, a tool error or an unrenderable result returns
+    ``None`` so the caller falls back to the ReAct graph.
+    """
+
+    def __init__(self, routes: tuple[Route, ...] = ROUTES):
+        self.routes = routes
+        self.stats: dict[str, RouteStats] = {route.name: RouteStats() for route in routes}
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        query = re.sub(r'\s+', ' ', query.strip().lower())
+        query = query.replace('’', "'")
+        return re.sub(r'^(please |hey |hi )+|[\s?.!]+$|( please)$', '', query)
+
+    def match(self, query: str) -> tuple[Route, re.Match] | None:
+        normalized = self.normalize(query)
+        for route in self.routes:
+            for pattern in route.patterns:
+                match = pattern.match(normalized)
+                if match:
+                    return route, match
+        return None
+
+    async def answer(
+        self,
+        query: str,
+        get_tool: Callable[[str], Optional[BaseTool]],
+        config: RunnableConfig,
+        baseline_seconds: float,
+    ) -> Optional[str]:
+        matched = self.match(query)
+        if matched is None:
+            self.misses += 1
+            return None
+        route, match = matched
+        stats = self.stats[route.name]
+        tool = get_tool(route.tool)
+        if tool is None:
+            stats.fallbacks += 1
+            return None
+
+        start = time.perf_counter()
+        try:
+            content = await tool.ainvoke(route.arguments(match), config)
+            answer = route.render(content)
+        except Exception as e:
+            logger.warning(f'Fast path {route.name} failed, falling back to the agent: {e}')
+            answer = None
+        if answer is None:
+            stats.fallbacks += 1
+            return None
+
+        elapsed = time.perf_counter() - start
+        stats.hits += 1
+        stats.total_seconds += elapsed
+        stats.saved_seconds += max(baseline_seconds - elapsed, 0.0)
+        return answer
+
+    def get_stats(self) -> dict[str, Any]:
+        matched = sum(s.hits + s.fallbacks for s in self.stats.values())
+        hits = sum(s.hits for s in self.stats.values())
+        total = matched + self.misses
+        return {
+            'hit_rate': hits / total if total else 0.0,
+            'misses': self.misses,
+            'routes': {
+                name: {
+                    'hits': s.hits,
+                    'fallbacks': s.fallbacks,
+                    'avg_seconds': s.total_seconds / s.hits if s.hits else 0.0,
+                    'saved_seconds': s.saved_seconds,
+                }
+                for name, s in self.stats.items()
+            },
+        }
@@ -0,0 +1,350 @@
+import abc
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from collections.abc import Iterable
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class VersionConflictError(Exception):
+    """Raised when a record changed since the version a writer expected."""
+
+
+class SharedBackend(abc.ABC):
+    """Storage that several agent worker processes can share.
+
+    Records are opaque payloads in named namespaces (``tasks``,
+    ``push_configs``, ``jwks``), each stamped with the time it was written.
+    Workers compare that stamp with the copy they hold to notice another
+    worker's update. Conversation checkpoints (``checkpoints``) are instead
+    kept as rows written one change at a time under a record version, which
+    a writer can make its write conditional on. The event log carries SSE
+    events of a running task to subscribers on other workers.
+    """
+
+    @abc.abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[tuple[bytes | str, float]]:
+        ...
+
+    @abc.abstractmethod
+    def put(self, namespace: str, key: str, data: bytes | str) -> float:
+        """Stores ``data`` and returns its write stamp."""
+
+    @abc.abstractmethod
+    def updated_at(self, namespace: str, key: str) -> Optional[float]:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, namespace: str, key: str):
+        ...
+
+    @abc.abstractmethod
+    def keys(self, namespace: str) -> list[str]:
+        ...
+
+    @abc.abstractmethod
+    def count(self, namespace: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def prune(self, namespace: str, older_than: float) -> int:
+        """Deletes records last written before ``older_than`` and returns how many."""
+
+    @abc.abstractmethod
+    def get_rows(self, namespace: str, key: str) -> Optional[tuple[dict[str, bytes], int]]:
+        """Returns every row of the record and its version."""
+
+    @abc.abstractmethod
+    def put_rows(
+        self,
+        namespace: str,
+        key: str,
+        rows: dict[str, bytes],
+        deleted: Iterable[str] = (),
+        version: Optional[int] = None,
+        replace: bool = False,
+    ) -> int:
+        """Writes ``rows`` and drops ``deleted`` in one transaction.
+
+        With ``replace`` set the record's other rows are dropped too. With
+        ``version`` set the write only happens if the record is still at
+        that version (0: doesn't exist yet) and raises
+        ``VersionConflictError`` otherwise. Returns the new version.
+        """
+
+    @abc.abstractmethod
+    def version(self, namespace: str, key: str) -> Optional[int]:
+        ...
+
+    @abc.abstractmethod
+    def append_event(self, task_id: str, data: str) -> int:
+        """Appends to the task's event log and returns the event's sequence number."""
+
+    @abc.abstractmethod
+    def read_events(self, task_id: str, after: int) -> list[tuple[int, str]]:
+        ...
+
+    @abc.abstractmethod
+    def last_event(self, task_id: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def prune_events(self, older_than: float) -> int:
+        ...
+
+    def close(self):
+        pass
+
+
+class SqliteBackend(SharedBackend):
+    """``SharedBackend`` on a local SQLite file in WAL mode.
+
+    Good for several workers on one machine. Every process opens its own
+    connection, and WAL lets readers run alongside the single writer.
+    """
+
+    # namespace -> key column. The tasks table predates the shared backend,
+    # so existing spill files keep working.
+    TABLES = {
+        'tasks': 'task_id',
+        'push_configs': 'task_id',
+        'jwks': 'kid',
+    }
+    # namespace -> key column of records kept as rows: ``<namespace>`` holds
+    # each record's version, ``<namespace>_rows`` its rows.
+    ROW_TABLES = {
+        'checkpoints': 'thread_id',
+    }
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        for table, column in self.TABLES.items():
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                f'{column} TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)'
+            )
+        for table, column in self.ROW_TABLES.items():
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                f'{column} TEXT PRIMARY KEY, version INTEGER NOT NULL, updated_at REAL NOT NULL)'
+            )
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {table}_rows ('
+                f'{column} TEXT NOT NULL, row TEXT NOT NULL, data BLOB NOT NULL, '
+                f'PRIMARY KEY ({column}, row))'
+            )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS task_events ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, task_id TEXT NOT NULL, '
+            'data TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS task_events_task ON task_events (task_id, seq)'
+        )
+        self._db.commit()
+
+    def _table(self, namespace: str) -> tuple[str, str]:
+        return namespace, self.TABLES.get(namespace) or self.ROW_TABLES[namespace]
+
+    def get(self, namespace: str, key: str) -> Optional[tuple[bytes | str, float]]:
+        table, column = self._table(namespace)
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT data, updated_at FROM {table} WHERE {column} = ?', (key,)
+            ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def put(self, namespace: str, key: str, data: bytes | str) -> float:
+        table, column = self._table(namespace)
+        updated_at = time.time()
+        with self._lock:
+            self._db.execute(
+                f'INSERT OR REPLACE INTO {table} ({column}, data, updated_at) VALUES (?, ?, ?)',
+                (key, data, updated_at),
+            )
+            self._db.commit()
+        return updated_at
+
+    def updated_at(self, namespace: str, key: str) -> Optional[float]:
+        table, column = self._table(namespace)
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT updated_at FROM {table} WHERE {column} = ?', (key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def delete(self, namespace: str, key: str):
+        table, column = self._table(namespace)
+        with self._lock:
+            self._db.execute(f'DELETE FROM {table} WHERE {column} = ?', (key,))
+            if namespace in self.ROW_TABLES:
+                self._db.execute(f'DELETE FROM {table}_rows WHERE {column} = ?', (key,))
+            self._db.commit()
+
+    def keys(self, namespace: str) -> list[str]:
+        table, column = self._table(namespace)
+        with self._lock:
+            return [row[0] for row in self._db.execute(f'SELECT {column} FROM {table}')]
+
+    def count(self, namespace: str) -> int:
+        table, _column = self._table(namespace)
+        with self._lock:
+            return self._db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def prune(self, namespace: str, older_than: float) -> int:
+        table, column = self._table(namespace)
+        with self._lock:
+            if namespace in self.ROW_TABLES:
+                self._db.execute(
+                    f'DELETE FROM {table}_rows WHERE {column} IN '
+                    f'(SELECT {column} FROM {table} WHERE updated_at < ?)',
+                    (older_than,),
+                )
+            cursor = self._db.execute(f'DELETE FROM {table} WHERE updated_at < ?', (older_than,))
+            self._db.commit()
+        return cursor.rowcount
+
+    def get_rows(self, namespace: str, key: str) -> Optional[tuple[dict[str, bytes], int]]:
+        table, column = self._table(namespace)
+        with self._lock:
+            # One read transaction, so the rows match the version.
+            self._db.execute('BEGIN')
+            try:
+                head = self._db.execute(
+                    f'SELECT version FROM {table} WHERE {column} = ?', (key,)
+                ).fetchone()
+                rows = self._db.execute(
+                    f'SELECT row, data FROM {table}_rows WHERE {column} = ?', (key,)
+                ).fetchall()
+            finally:
+                self._db.commit()
+        return None if head is None else (dict(rows), head[0])
+
+    def put_rows(
+        self,
+        namespace: str,
+        key: str,
+        rows: dict[str, bytes],
+        deleted: Iterable[str] = (),
+        version: Optional[int] = None,
+        replace: bool = False,
+    ) -> int:
+        table, column = self._table(namespace)
+        now = time.time()
+        with self._lock:
+            try:
+                # Bumping the version first takes the write lock, so the
+                # check and the write are one step for every process.
+                if version is None:
+                    cursor = self._db.execute(
+                        f'UPDATE {table} SET version = version + 1, updated_at = ? '
+                        f'WHERE {column} = ?',
+                        (now, key),
+                    )
+                else:
+                    cursor = self._db.execute(
+                        f'UPDATE {table} SET version = version + 1, updated_at = ? '
+                        f'WHERE {column} = ? AND version = ?',
+                        (now, key, version),
+                    )
+                if cursor.rowcount == 0:
+                    if version:
+                        raise VersionConflictError(f'{namespace} {key} is no longer at version {version}')
+                    try:
+                        self._db.execute(
+                            f'INSERT INTO {table} ({column}, version, updated_at) VALUES (?, 1, ?)',
+                            (key, now),
+                        )
+                    except sqlite3.IntegrityError:
+                        raise VersionConflictError(f'{namespace} {key} already exists') from None
+                new_version = self._db.execute(
+                    f'SELECT version FROM {table} WHERE {column} = ?', (key,)
+                ).fetchone()[0]
+                if replace:
+                    self._db.execute(f'DELETE FROM {table}_rows WHERE {column} = ?', (key,))
+                self._db.executemany(
+                    f'DELETE FROM {table}_rows WHERE {column} = ? AND row = ?',
+                    [(key, row) for row in deleted],
+                )
+                self._db.executemany(
+                    f'INSERT OR REPLACE INTO {table}_rows ({column}, row, data) VALUES (?, ?, ?)',
+                    [(key, row, data) for row, data in rows.items()],
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return new_version
+
+    def version(self, namespace: str, key: str) -> Optional[int]:
+        table, column = self._table(namespace)
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT version FROM {table} WHERE {column} = ?', (key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def append_event(self, task_id: str, data: str) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO task_events (task_id, data, created_at) VALUES (?, ?, ?)',
+                (task_id, data, time.time()),
+            )
+            self._db.commit()
+        return cursor.lastrowid
+
+    def read_events(self, task_id: str, after: int) -> list[tuple[int, str]]:
+        with self._lock:
+            return self._db.execute(
+                'SELECT seq, data FROM task_events WHERE task_id = ? AND seq > ? ORDER BY seq',
+                (task_id, after),
+            ).fetchall()
+
+    def last_event(self, task_id: str) -> int:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT MAX(seq) FROM task_events WHERE task_id = ?', (task_id,)
+            ).fetchone()
+        return row[0] or 0
+
+    def prune_events(self, older_than: float) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                'DELETE FROM task_events WHERE created_at < ?', (older_than,)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_backend(sqlite_path: Optional[str]) -> Optional[SharedBackend]:
+    return SqliteBackend(sqlite_path) if sqlite_path else None
+
+
+_shared: Optional[SharedBackend] = None
+
+
+def shared_backend() -> Optional[SharedBackend]:
+    """The backend this worker shares with the others, from ``AGENT_SHARED_DB``.
+
+    None in single-process mode. Opened once per process.
+    """
+    global _shared
+    path = os.getenv('AGENT_SHARED_DB')
+    if _shared is None and path:
+        _shared = SqliteBackend(path)
+        logger.info(f'Sharing tasks, events and checkpoints through {path}')
+    return _shared
@@ -1,16 +1,29 @@
 import asyncio
+import heapq
+import itertools
+import json
 import logging
-import traceback
+import os
+import time
 
-from collections.abc import AsyncIterable
+from collections import deque
+from collections.abc import AsyncIterable, Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
 
 from agent import OrangeTheoryAgent
+from member_auth import UnauthenticatedMemberError, authenticated_member
+from metrics import metrics
+from notifications import PushNotificationDispatcher
+from shared_backend import open_backend, shared_backend
+from task_store import TERMINAL_STATES, PushConfigStore, TaskStore
 from google_a2a.common.server import utils
 from google_a2a.common.server.task_manager import InMemoryTaskManager
 from google_a2a.common.types import (
     Artifact,
     InternalError,
     InvalidParamsError,
+    JSONRPCError,
     JSONRPCResponse,
     Message,
     PushNotificationConfig,
@@ -33,6 +46,117 @@ from google_a2a.common.utils.push_notification_auth import PushNotificationSende
 logger = logging.getLogger(__name__)
 
 
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the scheduler's wait queue is full."""
+
+
+@dataclass
+class _Job:
+    run: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    priority: int
+    seq: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class TaskScheduler:
+    """Admission control for agent runs.
+
+    At most ``max_concurrency`` runs execute at once and at most ``max_queue``
+    wait behind them; anything beyond that is rejected immediately with
+    ``SchedulerBusyError``. Runs for the same session execute one at a time in
+    arrival order, so two messages never race on one checkpoint thread.
+    Across sessions the lowest priority value goes first, then FIFO.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._sessions: dict[str, deque[_Job]] = {}
+        # (priority, seq, session_id) for every session whose head job is
+        # waiting to start.
+        self._ready: list[tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+
+    async def run(
+        self,
+        session_id: str,
+        run: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Any:
+        if self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerBusyError(
+                f'Agent is at capacity ({self._running} running, {self._waiting} queued)'
+            )
+
+        job = _Job(
+            run=run,
+            future=asyncio.get_running_loop().create_future(),
+            priority=priority,
+            seq=next(self._seq),
+        )
+        queue = self._sessions.setdefault(session_id, deque())
+        queue.append(job)
+        self._waiting += 1
+        if len(queue) == 1:
+            heapq.heappush(self._ready, (job.priority, job.seq, session_id))
+        self._dispatch()
+        return await job.future
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'running': self._running,
+            'queued': self._waiting,
+            'active_sessions': len(self._sessions),
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'avg_wait_seconds': (
+                self.total_wait_seconds / self.completed if self.completed else 0.0
+            ),
+        }
+
+    def _dispatch(self):
+        while self._ready and self._running < self.max_concurrency:
+            _, _, session_id = heapq.heappop(self._ready)
+            job = self._sessions[session_id][0]
+            self._waiting -= 1
+            self._running += 1
+            waited = time.monotonic() - job.enqueued_at
+            self.total_wait_seconds += waited
+            metrics.observe('stage_seconds', waited, stage='queue_wait')
+            asyncio.create_task(self._execute(session_id, job))
+
+    async def _execute(self, session_id: str, job: _Job):
+        try:
+            result = await job.run()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._running -= 1
+            self.completed += 1
+            queue = self._sessions[session_id]
+            queue.popleft()
+            if queue:
+                heapq.heappush(self._ready, (queue[0].priority, queue[0].seq, session_id))
+            else:
+                del self._sessions[session_id]
+            self._dispatch()
+
+
 class AgentTaskManager(InMemoryTaskManager):
     def __init__(
         self,
@@ -40,16 +164,181 @@ class AgentTaskManager(InMemoryTaskManager):
         notification_sender_auth: PushNotificationSenderAuth,
     ):
         super().__init__()
+        # Set when several workers serve this agent: tasks, push configs and
+        # SSE events then go through it so any worker can answer for a task.
+        self.shared_backend = shared_backend()
+        self.tasks = TaskStore(
+            max_tasks=int(os.getenv('TASK_STORE_MAX_TASKS', '10000')),
+            max_history=int(os.getenv('TASK_STORE_MAX_HISTORY', '50')),
+            completed_ttl=float(os.getenv('TASK_STORE_COMPLETED_TTL_SECONDS', '3600')),
+            abandoned_ttl=float(os.getenv('TASK_STORE_ABANDONED_TTL_SECONDS', '86400')),
+            backend=self.shared_backend or open_backend(os.getenv('TASK_STORE_SQLITE_PATH')),
+            shared=self.shared_backend is not None,
+        )
+        if self.shared_backend is not None:
+            self.push_notification_infos = PushConfigStore(self.shared_backend)
+        self.events_ttl = float(os.getenv('TASK_EVENTS_TTL_SECONDS', '600'))
+        # Shared conversations not written for this long are deleted.
+        self.checkpoints_ttl = float(os.getenv('CHECKPOINT_SHARED_TTL_SECONDS', '604800'))
+        self.events_poll_interval = float(os.getenv('TASK_EVENTS_POLL_SECONDS', '0.1'))
+        self.events_idle_timeout = float(os.getenv('TASK_EVENTS_IDLE_TIMEOUT_SECONDS', '300'))
+        self.sweep_interval = float(os.getenv('TASK_STORE_SWEEP_SECONDS', '60'))
+        self._swept_at = time.monotonic()
         self.agent = agent
         self.notification_sender_auth = notification_sender_auth
+        self.notification_dispatcher = PushNotificationDispatcher(
+            notification_sender_auth,
+            max_queue=int(os.getenv('PUSH_MAX_QUEUE', '1000')),
+            workers=int(os.getenv('PUSH_WORKERS', '4')),
+        )
+        self.scheduler = TaskScheduler(
+            max_concurrency=int(os.getenv('AGENT_MAX_CONCURRENCY', '8')),
+            max_queue=int(os.getenv('AGENT_MAX_QUEUE', '64')),
+        )
+        # Clients holding a tasks/send connection open go ahead of tasks that
+        # report back through push notifications.
+        self.prioritize_interactive = (
+            os.getenv('AGENT_PRIORITIZE_INTERACTIVE', 'true').lower() == 'true'
+        )
 
-    async def _run_streaming_agent(self, request: SendTaskStreamingRequest):
+    async def upsert_task(self, task_send_params: TaskSendParams) -> Task:
+        task = await super().upsert_task(task_send_params)
+        async with self.lock:
+            self.tasks.touch(task.id)
+        if time.monotonic() - self._swept_at >= self.sweep_interval:
+            await self.sweep()
+        return task
+
+    async def update_store(
+        self, task_id: str, status: TaskStatus, artifacts: list[Artifact] | None
+    ) -> Task:
+        task = await super().update_store(task_id, status, artifacts)
+        async with self.lock:
+            self.tasks.touch(task_id)
+        return task
+
+    async def sweep(self):
+        """Evicts expired tasks and drops their push configs and orphaned SSE queues.
+
+        Also deletes persisted tasks and, in shared mode, the task events,
+        push configs and conversations no worker has written for their TTL.
+        """
+        self._swept_at = time.monotonic()
+        async with self.lock:
+            evicted = self.tasks.sweep()
+            pruned = self.tasks.prune()
+            # Shared push configs outlive this worker's resident copy of the task.
+            if self.shared_backend is None:
+                for task_id in evicted:
+                    self.push_notification_infos.pop(task_id, None)
+            resident = set(self.tasks.keys())
+        async with self.subscriber_lock:
+            orphaned = [
+                task_id
+                for task_id, subscribers in self.task_sse_subscribers.items()
+                if not subscribers or task_id not in resident
+            ]
+            for task_id in orphaned:
+                del self.task_sse_subscribers[task_id]
+        deleted = {}
+        if self.shared_backend is not None:
+            now = time.time()
+            deleted = {
+                'task events': self.shared_backend.prune_events(now - self.events_ttl),
+                'push configs': self.shared_backend.prune(
+                    'push_configs', now - self.tasks.abandoned_ttl
+                ),
+                'conversations': self.shared_backend.prune(
+                    'checkpoints', now - self.checkpoints_ttl
+                ),
+            }
+        if evicted or orphaned or pruned or any(deleted.values()):
+            logger.info(
+                f'Task sweep evicted {len(evicted)} tasks and '
+                f'{len(orphaned)} SSE subscriber lists, and deleted '
+                f'{pruned} persisted tasks'
+                + ''.join(f', {count} {name}' for name, count in deleted.items())
+            )
+
+    def _priority(self, task_send_params: TaskSendParams) -> int:
+        if self.prioritize_interactive and task_send_params.pushNotification:
+            return PRIORITY_BACKGROUND
+        return PRIORITY_INTERACTIVE
+
+    def _use_answer_cache(self, task_send_params: TaskSendParams) -> bool:
+        # Clients set metadata {"bypass_cache": true} to force a fresh answer.
+        metadata = task_send_params.metadata or {}
+        return not metadata.get('bypass_cache', False)
+
+    def _member(self, task_send_params: TaskSendParams) -> str | None:
+        # The OTF account the MCP server acts on is the member the request's
+        # API key belongs to (see member_auth.py). Metadata {"otf_member":
+        # "<id>"} may still name it, but never another member. Called while
+        # serving the request, where the authenticated member is set.
+        member = authenticated_member.get()
+        named = (task_send_params.metadata or {}).get('otf_member')
+        if named is not None and named != member:
+            raise UnauthenticatedMemberError(
+                f'Request is not authenticated as member {named!r}'
+            )
+        return member
+
+    async def _reject_busy(self, task_id: str, error: SchedulerBusyError) -> Task:
+        logger.warning(f'Rejecting task {task_id}: {error}')
+        task_status = TaskStatus(
+            state=TaskState.FAILED,
+            message=Message(
+                role='agent',
+                parts=[
+                    {
+                        'type': 'text',
+                        'text': 'The assistant is busy right now. Please try again shortly.',
+                    }
+                ],
+            ),
+        )
+        task = await self.update_store(task_id, task_status, None)
+        await self.send_task_notification(task)
+        return task
+
+    async def _schedule_streaming_agent(
+        self, request: SendTaskStreamingRequest, member: str | None
+    ):
+        task_send_params: TaskSendParams = request.params
+        try:
+            await self.scheduler.run(
+                task_send_params.sessionId,
+                lambda: self._run_streaming_agent(request, member),
+                self._priority(task_send_params),
+            )
+        except SchedulerBusyError as e:
+            task = await self._reject_busy(task_send_params.id, e)
+            await self.enqueue_events_for_sse(
+                task_send_params.id,
+                TaskStatusUpdateEvent(
+                    id=task_send_params.id, status=task.status, final=True
+                ),
+            )
+
+    async def _run_streaming_agent(
+        self, request: SendTaskStreamingRequest, member: str | None
+    ):
+        with metrics.span('stream_task'):
+            await self._stream_agent(request, member)
+
+    async def _stream_agent(
+        self, request: SendTaskStreamingRequest, member: str | None
+    ):
         task_send_params: TaskSendParams = request.params
         query = self._get_user_query(task_send_params)
+        last_notified_state = None
 
         try:
             async for item in self.agent.stream(
-                query, task_send_params.sessionId
+                query,
+                task_send_params.sessionId,
+                use_cache=self._use_answer_cache(task_send_params),
+                member=member,
             ):
                 is_task_complete = item['is_task_complete']
                 require_user_input = item['require_user_input']
@@ -71,12 +360,25 @@ class AgentTaskManager(InMemoryTaskManager):
                     end_stream = True
 
                 task_status = TaskStatus(state=task_state, message=message)
+                if item.get('is_partial'):
+                    # Token batches only go to SSE subscribers; they are not
+                    # task history and would flood push receivers.
+                    await self.enqueue_events_for_sse(
+                        task_send_params.id,
+                        TaskStatusUpdateEvent(
+                            id=task_send_params.id, status=task_status, final=False
+                        ),
+                    )
+                    continue
+
                 latest_task = await self.update_store(
                     task_send_params.id,
                     task_status,
                     None if artifact is None else [artifact],
                 )
-                await self.send_task_notification(latest_task)
+                if task_state != last_notified_state:
+                    await self.send_task_notification(latest_task)
+                    last_notified_state = task_state
 
                 if artifact:
                     task_artifact_update_event = TaskArtifactUpdateEvent(
@@ -129,10 +431,22 @@ class AgentTaskManager(InMemoryTaskManager):
                 ),
             )
 
+        try:
+            self._member(task_send_params)
+        except UnauthenticatedMemberError as e:
+            logger.warning(f'Rejecting task {task_send_params.id}: {e}')
+            return JSONRPCResponse(
+                id=request.id, error=InvalidParamsError(message=str(e))
+            )
+
         return None
 
     async def on_send_task(self, request: SendTaskRequest) -> SendTaskResponse:
         """Handles the 'send task' request."""
+        with metrics.span('send_task'):
+            return await self._send_task(request)
+
+    async def _send_task(self, request: SendTaskRequest) -> SendTaskResponse:
         validation_error = self._validate_request(request)
         if validation_error:
             return SendTaskResponse(id=request.id, error=validation_error.error)
@@ -156,9 +470,23 @@ class AgentTaskManager(InMemoryTaskManager):
 
         task_send_params: TaskSendParams = request.params
         query = self._get_user_query(task_send_params)
+        member = self._member(task_send_params)
         try:
-            agent_response =  await self.agent.invoke(
-                query, task_send_params.sessionId
+            agent_response = await self.scheduler.run(
+                task_send_params.sessionId,
+                lambda: self.agent.invoke(
+                    query,
+                    task_send_params.sessionId,
+                    use_cache=self._use_answer_cache(task_send_params),
+                    member=member,
+                ),
+                self._priority(task_send_params),
+            )
+        except SchedulerBusyError as e:
+            task = await self._reject_busy(task_send_params.id, e)
+            return SendTaskResponse(
+                id=request.id,
+                result=self.append_task_history(task, task_send_params.historyLength),
             )
         except Exception as e:
             logger.error(f'Error invoking agent: {e}')
@@ -191,14 +519,17 @@ class AgentTaskManager(InMemoryTaskManager):
                 task_send_params.id, False
             )
 
-            asyncio.create_task(self._run_streaming_agent(request))
+            asyncio.create_task(
+                self._schedule_streaming_agent(
+                    request, self._member(task_send_params)
+                )
+            )
 
             return self.dequeue_events_for_sse(
                 request.id, task_send_params.id, sse_event_queue
             )
         except Exception as e:
-            logger.error(f'Error in SSE stream: {e}')
-            print(traceback.format_exc())
+            logger.exception(f'Error in SSE stream: {e}')
             return JSONRPCResponse(
                 id=request.id,
                 error=InternalError(
@@ -245,15 +576,35 @@ class AgentTaskManager(InMemoryTaskManager):
         push_info = await self.get_push_notification_info(task.id)
 
         logger.info(f'Notifying for task {task.id} => {task.status.state}')
-        await self.notification_sender_auth.send_push_notification(
-            push_info.url, data=task.model_dump(exclude_none=True)
+        self.notification_dispatcher.submit(
+            push_info.url,
+            task.id,
+            data=task.model_dump(exclude_none=True),
+            final=task.status.state not in (TaskState.SUBMITTED, TaskState.WORKING),
         )
 
+    async def enqueue_events_for_sse(self, task_id: str, task_update_event: Any):
+        await super().enqueue_events_for_sse(task_id, task_update_event)
+        if self.shared_backend is not None:
+            self.shared_backend.append_event(task_id, _encode_event(task_update_event))
+
     async def on_resubscribe_to_task(
         self, request
     ) -> AsyncIterable[SendTaskStreamingResponse] | JSONRPCResponse:
         task_id_params: TaskIdParams = request.params
         try:
+            async with self.subscriber_lock:
+                is_live = task_id_params.id in self.task_sse_subscribers
+            if not is_live:
+                async with self.lock:
+                    task = self.tasks.get(task_id_params.id)
+                if task is not None:
+                    if self.shared_backend is not None and not _is_settled(task):
+                        # Still running, on another worker.
+                        return self._follow_events(request.id, task.id)
+                    # The run has no live stream (it finished, or its queue was
+                    # swept); replay the stored state instead.
+                    return self._replay_task(request.id, task)
             sse_event_queue = await self.setup_sse_consumer(
                 task_id_params.id, True
             )
@@ -269,6 +620,57 @@ class AgentTaskManager(InMemoryTaskManager):
                 ),
             )
 
+    async def _follow_events(
+        self, request_id: str, task_id: str
+    ) -> AsyncIterable[SendTaskStreamingResponse]:
+        """Streams a task running on another worker from the shared event log."""
+        after = self.shared_backend.last_event(task_id)
+        idle_since = time.monotonic()
+        while True:
+            events = self.shared_backend.read_events(task_id, after)
+            for seq, data in events:
+                after = seq
+                event = _decode_event(data)
+                if isinstance(event, JSONRPCError):
+                    yield SendTaskStreamingResponse(id=request_id, error=event)
+                    return
+                yield SendTaskStreamingResponse(id=request_id, result=event)
+                if isinstance(event, TaskStatusUpdateEvent) and event.final:
+                    return
+            if events:
+                idle_since = time.monotonic()
+            else:
+                async with self.lock:
+                    task = self.tasks.get(task_id)
+                # Settled without a final event reaching us, or its worker died.
+                if (
+                    task is None
+                    or _is_settled(task)
+                    or time.monotonic() - idle_since >= self.events_idle_timeout
+                ):
+                    if task is not None:
+                        async for response in self._replay_task(request_id, task):
+                            yield response
+                    return
+            await asyncio.sleep(self.events_poll_interval)
+
+    async def _replay_task(
+        self, request_id: str, task: Task
+    ) -> AsyncIterable[SendTaskStreamingResponse]:
+        for artifact in task.artifacts or []:
+            yield SendTaskStreamingResponse(
+                id=request_id,
+                result=TaskArtifactUpdateEvent(id=task.id, artifact=artifact),
+            )
+        yield SendTaskStreamingResponse(
+            id=request_id,
+            result=TaskStatusUpdateEvent(
+                id=task.id,
+                status=task.status,
+                final=_is_settled(task),
+            ),
+        )
+
     async def set_push_notification_info(
         self, task_id: str, push_notification_config: PushNotificationConfig
     ):
@@ -284,4 +686,26 @@ class AgentTaskManager(InMemoryTaskManager):
         await super().set_push_notification_info(
             task_id, push_notification_config
         )
-        return True
\ No newline at end of file
+        return True
+
+
+def _is_settled(task: Task) -> bool:
+    return task.status.state in TERMINAL_STATES or task.status.state == TaskState.INPUT_REQUIRED
+
+
+# Event kind -> type, for SSE events passed between workers.
+_EVENT_TYPES = {
+    'status': TaskStatusUpdateEvent,
+    'artifact': TaskArtifactUpdateEvent,
+    'error': JSONRPCError,
+}
+
+
+def _encode_event(event: Any) -> str:
+    kind = next(k for k, event_type in _EVENT_TYPES.items() if isinstance(event, event_type))
+    return json.dumps({'kind': kind, 'event': event.model_dump(mode='json', exclude_none=True)})
+
+
+def _decode_event(data: str) -> Any:
+    payload = json.loads(data)
+    return _EVENT_TYPES[payload['kind']].model_validate(payload['event'])
@@ -0,0 +1,204 @@
+import logging
+import time
+
+from collections import OrderedDict
+from collections.abc import Iterator, MutableMapping
+from typing import Any, Optional
+
+from google_a2a.common.types import PushNotificationConfig, Task, TaskState
+
+from shared_backend import SharedBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+TERMINAL_STATES = {TaskState.COMPLETED, TaskState.CANCELED, TaskState.FAILED}
+
+
+class TaskStore(MutableMapping):
+    """A bounded drop-in for ``InMemoryTaskManager.tasks``.
+
+    Keeps at most ``max_tasks`` tasks in RAM (least recently updated
+    first, terminal tasks before live ones) and at most ``max_history``
+    messages per task. ``sweep`` evicts terminal tasks idle for
+    ``completed_ttl`` seconds and any task idle for ``abandoned_ttl``.
+    With a ``backend`` set, evicted tasks are written to it and a lookup
+    of an evicted id loads it back, so ``tasks/get`` and resubscribe keep
+    working; ``prune`` deletes the ones not written for ``abandoned_ttl``.
+    With ``shared`` set, every update is written through and a task
+    another worker updated since is reloaded on lookup.
+    """
+
+    def __init__(
+        self,
+        max_tasks: int = 10000,
+        max_history: int = 50,
+        completed_ttl: float = 3600.0,
+        abandoned_ttl: float = 86400.0,
+        backend: Optional[SharedBackend] = None,
+        shared: bool = False,
+    ):
+        self.max_tasks = max_tasks
+        self.max_history = max_history
+        self.completed_ttl = completed_ttl
+        self.abandoned_ttl = abandoned_ttl
+        self.evictions = 0
+        self.loads = 0
+        self._tasks: OrderedDict[str, Task] = OrderedDict()
+        self._updated: dict[str, float] = {}
+        self._backend = backend
+        self.shared = shared and backend is not None
+        # task_id -> write stamp of the resident copy in the backend.
+        self._versions: dict[str, float] = {}
+
+    def __getitem__(self, task_id: str) -> Task:
+        task = self._tasks.get(task_id)
+        if task is not None and self.shared and (
+            self._backend.updated_at('tasks', task_id) != self._versions.get(task_id)
+        ):
+            # Another worker updated this task since it was loaded here.
+            task = None
+        if task is None:
+            task = self._load(task_id)
+            if task is None:
+                raise KeyError(task_id)
+            self._keep(task_id, task)
+        return task
+
+    def __setitem__(self, task_id: str, task: Task):
+        self._keep(task_id, task)
+        self.touch(task_id)
+
+    def __delitem__(self, task_id: str):
+        del self._tasks[task_id]
+        self._updated.pop(task_id, None)
+        self._versions.pop(task_id, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tasks)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._tasks or (
+            isinstance(task_id, str)
+            and self._backend is not None
+            and self._backend.updated_at('tasks', task_id) is not None
+        )
+
+    def touch(self, task_id: str):
+        """Marks a task as just updated and trims its history."""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        if task.history and len(task.history) > self.max_history:
+            del task.history[: -self.max_history]
+        self._updated[task_id] = time.monotonic()
+        self._tasks.move_to_end(task_id)
+        if self.shared:
+            self._save(task_id, task)
+
+    def sweep(self) -> list[str]:
+        """Evicts expired tasks and returns their ids."""
+        now = time.monotonic()
+        expired = []
+        for task_id, task in self._tasks.items():
+            idle = now - self._updated.get(task_id, now)
+            if idle >= self.abandoned_ttl or (
+                task.status.state in TERMINAL_STATES and idle >= self.completed_ttl
+            ):
+                expired.append(task_id)
+        for task_id in expired:
+            self.evict(task_id)
+        return expired
+
+    def prune(self) -> int:
+        """Deletes persisted tasks not written for ``abandoned_ttl`` seconds."""
+        if self._backend is None:
+            return 0
+        return self._backend.prune('tasks', time.time() - self.abandoned_ttl)
+
+    def evict(self, task_id: str):
+        task = self._tasks.pop(task_id)
+        self._updated.pop(task_id, None)
+        # A shared backend already holds the latest copy.
+        if self._backend is not None and not self.shared:
+            self._save(task_id, task)
+        self._versions.pop(task_id, None)
+        self.evictions += 1
+
+    def stats(self) -> dict[str, Any]:
+        stats = {
+            'resident_tasks': len(self._tasks),
+            'evictions': self.evictions,
+            'loads': self.loads,
+        }
+        if self._backend is not None:
+            stats['persisted_tasks'] = self._backend.count('tasks')
+        return stats
+
+    def _keep(self, task_id: str, task: Task):
+        self._tasks[task_id] = task
+        self._updated[task_id] = time.monotonic()
+        self._tasks.move_to_end(task_id)
+        while len(self._tasks) > self.max_tasks:
+            self.evict(self._eviction_candidate())
+
+    def _save(self, task_id: str, task: Task):
+        self._versions[task_id] = self._backend.put(
+            'tasks', task_id, task.model_dump_json(exclude_none=True)
+        )
+
+    def _eviction_candidate(self) -> str:
+        newest = next(reversed(self._tasks))
+        for task_id, task in self._tasks.items():
+            if task.status.state in TERMINAL_STATES and task_id != newest:
+                return task_id
+        return next(iter(self._tasks))
+
+    def _load(self, task_id: str) -> Optional[Task]:
+        if self._backend is None:
+            return None
+        row = self._backend.get('tasks', task_id)
+        if row is None:
+            return None
+        self.loads += 1
+        self._versions[task_id] = row[1]
+        return Task.model_validate_json(row[0])
+
+
+class PushConfigStore(MutableMapping):
+    """``InMemoryTaskManager.push_notification_infos`` kept in a shared backend.
+
+    Any worker can then notify for a task, whichever worker registered it.
+    """
+
+    def __init__(self, backend: SharedBackend):
+        self._backend = backend
+
+    def __getitem__(self, task_id: str) -> PushNotificationConfig:
+        row = self._backend.get('push_configs', task_id)
+        if row is None:
+            raise KeyError(task_id)
+        return PushNotificationConfig.model_validate_json(row[0])
+
+    def __setitem__(self, task_id: str, config: PushNotificationConfig):
+        self._backend.put('push_configs', task_id, config.model_dump_json(exclude_none=True))
+
+    def __delitem__(self, task_id: str):
+        if task_id not in self:
+            raise KeyError(task_id)
+        self._backend.delete('push_configs', task_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._backend.keys('push_configs'))
+
+    def __len__(self) -> int:
+        return self._backend.count('push_configs')
+
+    def __contains__(self, task_id: object) -> bool:
+        return isinstance(task_id, str) and (
+            self._backend.updated_at('push_configs', task_id) is not None
+        )
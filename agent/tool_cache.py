@@ -0,0 +1,134 @@
+import json
+import logging
+import threading
+
+from typing import Any
+
+from cachetools import TTLCache
+from langchain_core.runnables.config import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+logger = logging.getLogger(__name__)
+
+
+# Read-only MCP tools whose results can be replayed within a conversation.
+CACHEABLE_TOOLS = {
+    'get_studio_detail',
+    'get_studio_services',
+    'get_favorite_studios',
+    'get_favroite_studios_info',
+    'get_bookings_new',
+    'get_booking_new',
+    'get_bookings',
+    'get_booking',
+    'get_classes',
+    'get_member_services',
+}
+
+_BOOKING_TOOLS = {
+    'get_bookings_new',
+    'get_booking_new',
+    'get_bookings',
+    'get_booking',
+    'get_classes',
+}
+_FAVORITE_TOOLS = {'get_favorite_studios', 'get_favroite_studios_info'}
+
+# Mutating tool -> cached tools whose results it can make stale.
+INVALIDATIONS = {
+    'book_class': _BOOKING_TOOLS,
+    'book_class_new': _BOOKING_TOOLS,
+    'cancel_booking': _BOOKING_TOOLS,
+    'cancel_booking_new': _BOOKING_TOOLS,
+    'add_favorite_studio': _FAVORITE_TOOLS,
+    'remove_favorite_studio': _FAVORITE_TOOLS,
+}
+
+
+class ToolResultCache:
+    """Memoizes read-only MCP tool results per conversation thread.
+
+    Entries are keyed on (thread_id, tool name, normalized arguments) and
+    expire after ``ttl`` seconds. A successful or failed call to a mutating
+    tool drops the entries it can make stale in every thread, since threads
+    may act on the same OTF account and bookings change class availability
+    for everyone.
+    """
+
+    def __init__(self, ttl: float = 300.0, maxsize: int = 4096):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def wrap_tools(self, tools: list[BaseTool]) -> list[BaseTool]:
+        return [self.wrap(tool) for tool in tools]
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        if tool.name not in CACHEABLE_TOOLS and tool.name not in INVALIDATIONS:
+            return tool
+        if getattr(tool, 'coroutine', None) is None:
+            return tool
+
+        async def call_tool(config: RunnableConfig, **arguments: Any):
+            thread_id = config.get('configurable', {}).get('thread_id')
+            if tool.name in INVALIDATIONS:
+                try:
+                    return await tool.coroutine(**arguments)
+                finally:
+                    self.invalidate(INVALIDATIONS[tool.name])
+
+            key = (thread_id, tool.name, self._normalize(arguments))
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+            result = await tool.coroutine(**arguments)
+            with self._lock:
+                self._cache[key] = result
+            return result
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=call_tool,
+            response_format=tool.response_format,
+            metadata=tool.metadata,
+        )
+
+    def invalidate(self, tool_names: set[str], thread_id: str | None = None):
+        with self._lock:
+            stale = [
+                key
+                for key in list(self._cache.keys())
+                if key[1] in tool_names and (thread_id is None or key[0] == thread_id)
+            ]
+            for key in stale:
+                self._cache.pop(key, None)
+        if stale:
+            self.invalidations += len(stale)
+            logger.info(f'Invalidated {len(stale)} cached tool results')
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'entries': len(self._cache),
+        }
+
+    @staticmethod
+    def _normalize(arguments: dict[str, Any]) -> str:
+        # Omitted and explicit-None arguments mean the same thing to otf_api.
+        return json.dumps(
+            {k: v for k, v in arguments.items() if v is not None},
+            sort_keys=True,
+            default=str,
+        )
@@ -0,0 +1,240 @@
+import json
+import logging
+import re
+import threading
+
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.tools import BaseTool, tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_openai import ChatOpenAI
+
+
+logger = logging.getLogger(__name__)
+
+
+REQUEST_MORE_TOOLS = 'request_more_tools'
+
+# Category -> words in a query (or tool name/description) that point at it.
+CATEGORY_KEYWORDS = {
+    'date': {'today', 'tomorrow', 'yesterday', 'date', 'day', 'week', 'month', 'year', 'when', 'next', 'last'},
+    'booking': {'book', 'booking', 'bookings', 'booked', 'cancel', 'reserve', 'reservation', 'waitlist', 'upcoming', 'schedule', 'spot'},
+    'classes': {'class', 'classes', 'schedule', 'coach', 'orange', 'strength', 'tread', 'session', 'available', 'time'},
+    'studio': {'studio', 'studios', 'location', 'near', 'nearby', 'address', 'favorite', 'favourite', 'home', 'service', 'services', 'geo', 'city'},
+    'stats': {'stats', 'statistics', 'performance', 'workout', 'workouts', 'splat', 'splats', 'calorie', 'calories', 'heart', 'hr', 'zone', 'zones', 'telemetry', 'history', 'body', 'composition', 'progress', 'trend', 'average'},
+    'challenges': {'challenge', 'challenges', 'benchmark', 'benchmarks', 'dri', 'tracker', 'rower', 'treadmill', 'mile', 'row'},
+    'account': {'purchase', 'purchases', 'membership', 'member', 'services', 'package', 'account', 'bought'},
+}
+
+# Tools in one category routinely need lookups from another first
+# (booking needs a class id, classes need a studio uuid, ...).
+CATEGORY_DEPENDS = {
+    'booking': {'classes', 'studio', 'date'},
+    'classes': {'studio', 'date'},
+    'stats': {'date'},
+    'challenges': {'stats'},
+}
+
+# Cheap tools every call gets.
+ALWAYS_INCLUDED = {'date', 'general'}
+
+
+@tool(REQUEST_MORE_TOOLS)
+def request_more_tools(categories: Optional[list[str]] = None) -> str:
+    """Enable more tools when none of the available ones can do what the member asked.
+
+    Pass one or more of: booking, classes, studio, stats, challenges, account.
+    Pass nothing to enable every tool.
+    """
+    if categories:
+        return f'Enabled tools for: {", ".join(categories)}. Call them next.'
+    return 'Enabled all tools. Call them next.'
+
+
+@dataclass
+class SelectionStats:
+    calls: int = 0
+    widened: int = 0
+    tools_offered: int = 0
+    tools_total: int = 0
+    schema_tokens_offered: int = 0
+    schema_tokens_total: int = 0
+
+
+@dataclass(frozen=True)
+class _ToolIndex:
+    # tool name -> categories, for every catalog tool.
+    categories: dict[str, frozenset[str]]
+    # tool name -> tokens its schema costs per request.
+    tokens: dict[str, int]
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r'[a-z]+', text.lower().replace('_', ' ')))
+
+
+class ToolSelector:
+    """Picks the MCP tools relevant to the current turn.
+
+    Every tool is assigned to categories by its name and description. A
+    model call is offered the tools of the categories its latest member
+    message mentions (plus their dependencies), every tool already called
+    in this turn, and ``request_more_tools``. When the model calls
+    ``request_more_tools`` the set widens for the rest of the turn. A
+    message that matches no category gets every tool.
+
+    ``index`` builds a new immutable index and swaps it in whole, so a
+    request in flight keeps reading the one it started with. Each tool's
+    schema is tokenized once there, not on every request.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        self.count_tokens = count_tokens
+        self.stats = SelectionStats()
+        self._index = _ToolIndex({}, {})
+        # Tokens of payload tools outside the catalog (the structured
+        # response schema), by name.
+        self._other_tokens: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def index(self, tools: list[BaseTool]):
+        categories = {}
+        tokens = {}
+        for t in [*tools, request_more_tools]:
+            tokens[t.name] = self.count_tokens(json.dumps(convert_to_openai_tool(t)))
+            if t.name == REQUEST_MORE_TOOLS:
+                continue
+            name_words = _words(t.name)
+            matched = {c for c, words in CATEGORY_KEYWORDS.items() if name_words & words}
+            if not matched:
+                matched = {
+                    c
+                    for c, words in CATEGORY_KEYWORDS.items()
+                    if _words(t.description or '') & words
+                }
+            categories[t.name] = frozenset(matched or {'general'})
+        self._index = _ToolIndex(categories, tokens)
+
+    def select(
+        self, messages: list[AnyMessage], index: Optional[_ToolIndex] = None
+    ) -> Optional[set[str]]:
+        """Returns the tool names to offer, or None to offer everything."""
+        categories = (index or self._index).categories
+        if not categories:
+            return None
+        turn = self._current_turn(messages)
+        if not turn:
+            return None
+
+        called = {c['name'] for m in turn if isinstance(m, AIMessage) for c in m.tool_calls}
+        requested: set[str] = set()
+        for m in turn:
+            if isinstance(m, AIMessage):
+                for call in m.tool_calls:
+                    if call['name'] == REQUEST_MORE_TOOLS:
+                        asked = call['args'].get('categories')
+                        if not asked:
+                            return None
+                        requested.update(asked)
+
+        query_words = _words(str(turn[0].content))
+        wanted = {c for c, words in CATEGORY_KEYWORDS.items() if query_words & words}
+        if not (wanted - ALWAYS_INCLUDED) and not requested:
+            return None
+        wanted |= requested
+        for category in list(wanted):
+            wanted |= CATEGORY_DEPENDS.get(category, set())
+        wanted |= ALWAYS_INCLUDED
+
+        selected = {name for name, cats in categories.items() if cats & wanted}
+        return selected | (called & categories.keys()) | {REQUEST_MORE_TOOLS}
+
+    def filter_payload_tools(
+        self, messages: list[AnyMessage], tools: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        index = self._index
+        known = index.categories.keys() | {REQUEST_MORE_TOOLS}
+        if not any(self._tool_name(t) in known for t in tools):
+            return tools
+        selected = self.select(messages, index)
+        if selected is None:
+            offered = tools
+        else:
+            # Tools outside the catalog (e.g. the structured-response schema)
+            # always pass through.
+            offered = [
+                t for t in tools
+                if self._tool_name(t) not in known or self._tool_name(t) in selected
+            ]
+        offered_tokens = sum(self._tokens(index, t) for t in offered)
+        total_tokens = sum(self._tokens(index, t) for t in tools)
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.widened += int(selected is None)
+            self.stats.tools_offered += len(offered)
+            self.stats.tools_total += len(tools)
+            self.stats.schema_tokens_offered += offered_tokens
+            self.stats.schema_tokens_total += total_tokens
+        return offered
+
+    def _tokens(self, index: _ToolIndex, payload_tool: dict[str, Any]) -> int:
+        name = self._tool_name(payload_tool)
+        tokens = index.tokens.get(name)
+        if tokens is None:
+            tokens = self._other_tokens.get(name)
+        if tokens is None:
+            tokens = self._other_tokens[name] = self.count_tokens(json.dumps(payload_tool))
+        return tokens
+
+    def get_stats(self) -> dict[str, Any]:
+        s = self.stats
+        return {
+            'model_calls': s.calls,
+            'full_toolset_calls': s.widened,
+            'avg_tools_offered': s.tools_offered / s.calls if s.calls else 0,
+            'avg_tools_total': s.tools_total / s.calls if s.calls else 0,
+            'schema_tokens_saved': s.schema_tokens_total - s.schema_tokens_offered,
+            'avg_schema_tokens_saved': (
+                (s.schema_tokens_total - s.schema_tokens_offered) / s.calls if s.calls else 0
+            ),
+        }
+
+    @staticmethod
+    def _tool_name(payload_tool: dict[str, Any]) -> Optional[str]:
+        # Chat Completions nests the name under "function"; Responses doesn't.
+        return payload_tool.get('function', {}).get('name') or payload_tool.get('name')
+
+    @staticmethod
+    def _current_turn(messages: list[AnyMessage]) -> list[AnyMessage]:
+        for i in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[i], HumanMessage):
+                return messages[i:]
+        return []
+
+
+class ToolSelectingChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that offers each request only the tools ToolSelector picks.
+
+    The graph still binds, and ToolNode still executes, the full toolset;
+    only the tool schemas sent with each request are narrowed.
+    """
+
+    tool_selector: Optional[Any] = None
+
+    def _get_request_payload(
+        self,
+        input_: LanguageModelInput,
+        *,
+        stop: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> dict:
+        payload = super()._get_request_payload(input_, stop=stop, **kwargs)
+        if self.tool_selector is not None and payload.get('tools'):
+            messages = self._convert_input(input_).to_messages()
+            payload['tools'] = self.tool_selector.filter_payload_tools(
+                messages, payload['tools']
+            )
+        return payload
@@ -0,0 +1,368 @@
+import os
+import random
+import time
+
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+import otf_api
+
+from otf_api import models
+
+
+# Deterministic fixture data: a small grid of studios around Manhattan, a
+# week of classes per studio and a handful of bookings.
+STUDIO_NAMES = [
+    'Manhattan-West Village',
+    'Manhattan-Chelsea',
+    'Manhattan-Flatiron',
+    'Manhattan-Upper West Side',
+    'Manhattan-Upper East Side',
+    'Manhattan-Midtown East',
+    'Manhattan-Tribeca',
+    'Brooklyn-Williamsburg',
+    'Brooklyn-Park Slope',
+    'Brooklyn-Dumbo',
+    'Queens-Astoria',
+    'Queens-Long Island City',
+    'Jersey City-Downtown',
+    'Hoboken',
+    'Bronx-Riverdale',
+    'Staten Island-St. George',
+]
+
+CLASS_TIMES = [(5, 0), (6, 15), (7, 30), (9, 30), (12, 0), (17, 30), (18, 45)]
+CLASS_TYPES = [
+    ('Orange 60', 'ORANGE_60'),
+    ('Strength 50', 'STRENGTH_50'),
+    ('Tread 50', 'TREAD_50'),
+]
+COACHES = ['Sam', 'Alex', 'Jordan', 'Riley', 'Casey']
+
+
+def studio_uuid(index: int) -> str:
+    return f'studio-{index:04d}'
+
+
+def class_uuid(studio_index: int, day: int, slot: int) -> str:
+    return f'class-{studio_index:04d}-{day:02d}-{slot:02d}'
+
+
+def _studio_payload(index: int) -> dict[str, Any]:
+    name = STUDIO_NAMES[index]
+    return {
+        'studioUUId': studio_uuid(index),
+        'studioName': name,
+        'studioLocation': {
+            'physicalAddress': f'{100 + index * 7} {name.split("-")[-1]} Street',
+            'physicalCity': name.split('-')[0],
+            'physicalState': 'NJ' if index in (12, 13) else 'NY',
+            'physicalPostalCode': f'{10001 + index:05d}',
+            'phoneNumber': f'212-555-{1000 + index:04d}',
+            'latitude': 40.70 + (index % 4) * 0.03,
+            'longitude': -74.01 + (index // 4) * 0.03,
+        },
+        'timeZone': 'America/New_York',
+    }
+
+
+def _class_payload(studio_index: int, day: int, slot: int) -> dict[str, Any]:
+    hour, minute = CLASS_TIMES[slot]
+    starts_at = datetime.combine(date.today() + timedelta(days=day), datetime.min.time()).replace(
+        hour=hour, minute=minute
+    )
+    name, class_type = CLASS_TYPES[(day + slot) % len(CLASS_TYPES)]
+    return {
+        'ot_base_class_uuid': class_uuid(studio_index, day, slot),
+        'id': class_uuid(studio_index, day, slot),
+        'name': name,
+        'type': class_type,
+        'coach': {'first_name': COACHES[(studio_index + slot) % len(COACHES)]},
+        'starts_at_local': starts_at,
+        'ends_at_local': starts_at + timedelta(minutes=60 if class_type == 'ORANGE_60' else 50),
+        'studio': _studio_payload(studio_index),
+        'max_capacity': 24,
+        'booking_capacity': (studio_index + day + slot) % 25,
+        'full': False,
+    }
+
+
+def _booking_payload(booking_id: str, studio_index: int, day: int, slot: int) -> dict[str, Any]:
+    otf_class = _class_payload(studio_index, day, slot)
+    studio = otf_class['studio']
+    return {
+        'id': booking_id,
+        'member_id': 'member-0001',
+        'person_id': 'person-0001',
+        'checked_in': False,
+        'canceled': False,
+        'ratable': False,
+        'class': {
+            'id': otf_class['id'],
+            'ot_base_class_uuid': otf_class['ot_base_class_uuid'],
+            'name': otf_class['name'],
+            'type': otf_class['type'],
+            'coach': otf_class['coach'],
+            'starts_at_local': otf_class['starts_at_local'],
+            'studio': {
+                'id': studio['studioUUId'],
+                'name': studio['studioName'],
+                'phone_number': studio['studioLocation']['phoneNumber'],
+                'latitude': studio['studioLocation']['latitude'],
+                'longitude': studio['studioLocation']['longitude'],
+            },
+        },
+    }
+
+
+def _workout(index: int) -> models.Workout:
+    # A workout roughly every other day going back from yesterday, with
+    # splats and treadmill distance slowly improving.
+    day = -1 - index * 2 - index % 3
+    booking = _booking_payload(f'booking-w{index:04d}', index % 3, day, index % len(CLASS_TIMES))
+    orange = 9 + (40 - index) % 7 // 2
+    red = 2 + index % 3
+    zones = {'gray': 4, 'blue': 9, 'green': 60 - 13 - orange - red, 'orange': orange, 'red': red}
+    booking['workout'] = {
+        'id': f'workout-{index:04d}',
+        'performance_summary_id': f'workout-{index:04d}',
+        'calories_burned': 520 + (index * 37) % 140,
+        'splat_points': orange + red,
+        'step_count': 4200 + (index * 53) % 900,
+        'active_time_seconds': 3300,
+        'zone_time_minutes': zones,
+    }
+    details = {
+        'calories_burned': booking['workout']['calories_burned'],
+        'splat_points': orange + red,
+        'step_count': booking['workout']['step_count'],
+        'zone_time_minutes': zones,
+        'heart_rate': {'max_hr': 188, 'peak_hr': 176 + index % 6, 'peak_hr_percent': 94, 'avg_hr': 141 + index % 5, 'avg_hr_percent': 75},
+        'equipment_data': {
+            'treadmill': {
+                name: {'display_value': value, 'display_unit': unit, 'metric_value': value}
+                for name, value, unit in (
+                    ('avg_pace', 720.0, 'min/mi'),
+                    ('avg_speed', 5.2, 'mph'),
+                    ('max_pace', 600.0, 'min/mi'),
+                    ('max_speed', 7.0, 'mph'),
+                    ('moving_time', 1500.0, 'sec'),
+                    ('total_distance', round(2.4 - index * 0.01, 2), 'mi'),
+                    ('avg_incline', 1.5, '%'),
+                    ('elevation_gained', 120.0, 'ft'),
+                    ('max_incline', 4.0, '%'),
+                )
+            },
+        },
+    }
+    return models.Workout(
+        id=f'workout-{index:04d}',
+        details=details,
+        v2_booking=models.BookingV2.model_validate(booking),
+    )
+
+
+WORKOUTS = 90
+
+
+class FakeOtfUser:
+    """Accepts any credentials; nothing is authenticated."""
+
+    def __init__(self, username: Optional[str] = None, password: Optional[str] = None, **kwargs):
+        self.username = username
+        self.member_uuid = 'member-0001'
+
+
+class FakeOtf:
+    """Stand-in for ``otf_api.Otf`` that answers from fixture ``models.*`` objects.
+
+    Every call blocks for ``latency`` seconds (plus up to ``jitter``) the way
+    the real client blocks on the OTF API, so the MCP server sees the same
+    synchronous call pattern without any network.
+    """
+
+    def __init__(
+        self,
+        user: Optional[FakeOtfUser] = None,
+        latency: Optional[float] = None,
+        jitter: Optional[float] = None,
+    ):
+        self.user = user or FakeOtfUser()
+        self.latency = float(os.getenv('BENCH_OTF_LATENCY', '0.05')) if latency is None else latency
+        self.jitter = float(os.getenv('BENCH_OTF_JITTER', '0.02')) if jitter is None else jitter
+        self.calls: dict[str, int] = {}
+        self._rng = random.Random(0)
+        self._favorites = [0, 1, 7]
+        self._bookings = {
+            'booking-0001': (0, 1, 2),
+            'booking-0002': (1, 3, 5),
+            'booking-0003': (7, 6, 1),
+        }
+
+    @property
+    def home_studio_uuid(self) -> str:
+        return studio_uuid(0)
+
+    def _wait(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency + self._rng.random() * self.jitter
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def _studio_index(uuid: Optional[str]) -> int:
+        if uuid and uuid.startswith('studio-'):
+            return int(uuid.split('-')[1]) % len(STUDIO_NAMES)
+        return 0
+
+    # Bookings & classes
+
+    def get_bookings_new(self, start_date=None, end_date=None, exclude_cancelled=True):
+        self._wait('get_bookings_new')
+        return [
+            models.BookingV2.model_validate(_booking_payload(booking_id, *slot))
+            for booking_id, slot in self._bookings.items()
+        ]
+
+    def get_booking_new(self, booking_id: str):
+        self._wait('get_booking_new')
+        slot = self._bookings.get(booking_id, (0, 1, 2))
+        return models.BookingV2.model_validate(_booking_payload(booking_id, *slot))
+
+    def get_classes(
+        self,
+        start_date=None,
+        end_date=None,
+        studio_uuids=None,
+        include_home_studio=None,
+        filters_=None,
+    ):
+        self._wait('get_classes')
+        indexes = [self._studio_index(uuid) for uuid in (studio_uuids or [self.home_studio_uuid])]
+        return [
+            models.OtfClass.model_validate(_class_payload(index, day, slot))
+            for index in indexes
+            for day in range(7)
+            for slot in range(len(CLASS_TIMES))
+        ]
+
+    def book_class_new(self, class_id: str):
+        self._wait('book_class_new')
+        parts = class_id.split('-')
+        slot = (int(parts[1]), int(parts[2]), int(parts[3])) if len(parts) == 4 else (0, 1, 2)
+        # Rebooking the same class returns the same booking, so repeated
+        # benchmark runs don't grow the booking list.
+        booking_id = f'booking-{class_id}'
+        self._bookings[booking_id] = slot
+        return models.BookingV2.model_validate(_booking_payload(booking_id, *slot))
+
+    def cancel_booking_new(self, booking_id: str):
+        self._wait('cancel_booking_new')
+        self._bookings.pop(booking_id, None)
+
+    # Studios
+
+    def get_studio_detail(self, studio_uuid: Optional[str] = None):
+        self._wait('get_studio_detail')
+        return models.StudioDetail.model_validate(_studio_payload(self._studio_index(studio_uuid)))
+
+    def get_studios_by_geo(self, latitude=None, longitude=None):
+        return self.search_studios_by_geo(latitude, longitude)
+
+    def search_studios_by_geo(self, latitude=None, longitude=None, distance=50):
+        self._wait('search_studios_by_geo')
+        studios = []
+        for index in range(len(STUDIO_NAMES)):
+            payload = _studio_payload(index)
+            location = payload['studioLocation']
+            payload['distance'] = round(
+                69 * (
+                    (location['latitude'] - (latitude or 40.73)) ** 2
+                    + (location['longitude'] - (longitude or -74.0)) ** 2
+                ) ** 0.5,
+                2,
+            )
+            if payload['distance'] <= distance:
+                studios.append(models.StudioDetail.model_validate(payload))
+        return sorted(studios, key=lambda studio: studio.distance)
+
+    def get_favorite_studios(self):
+        self._wait('get_favorite_studios')
+        return [models.StudioDetail.model_validate(_studio_payload(i)) for i in self._favorites]
+
+    def add_favorite_studio(self, studio_uuids):
+        self._wait('add_favorite_studio')
+        uuids = [studio_uuids] if isinstance(studio_uuids, str) else studio_uuids
+        for uuid in uuids:
+            index = self._studio_index(uuid)
+            if index not in self._favorites:
+                self._favorites.append(index)
+        return [models.StudioDetail.model_validate(_studio_payload(i)) for i in self._favorites]
+
+    def remove_favorite_studio(self, studio_uuids):
+        self._wait('remove_favorite_studio')
+        uuids = [studio_uuids] if isinstance(studio_uuids, str) else studio_uuids
+        removed = {self._studio_index(uuid) for uuid in uuids}
+        self._favorites = [i for i in self._favorites if i not in removed]
+
+    # Stats
+
+    def get_member_lifetime_stats_in_studio(self, select_time=models.StatsTime.AllTime):
+        self._wait('get_member_lifetime_stats_in_studio')
+        return models.InStudioStatsData.model_validate(
+            {
+                'calories': 184_250,
+                'splatPoint': 4_120,
+                'workoutDuration': 12_600,
+                'stepCount': 410_000,
+                'treadmillDistance': 610.4,
+                'rowerDistance': 98_000,
+                'totalOrangeZone': 1_850,
+                'totalRedZone': 420,
+            }
+        )
+
+    def get_member_lifetime_stats_out_of_studio(self, select_time=models.StatsTime.AllTime):
+        self._wait('get_member_lifetime_stats_out_of_studio')
+        return models.OutStudioStatsData.model_validate({'calories': 12_400, 'workoutDuration': 900})
+
+    def get_hr_history(self):
+        self._wait('get_hr_history')
+        return [
+            models.TelemetryHistoryItem.model_validate(
+                {
+                    'max_hr_type': 'AUTO',
+                    'max_hr_value': 188 - i % 3,
+                    'assignedAt': datetime.combine(date.today(), datetime.min.time())
+                    - timedelta(days=30 * i),
+                }
+            )
+            for i in range(12)
+        ]
+
+    def get_workouts(self, start_date=None, end_date=None):
+        self._wait('get_workouts')
+        start = date.fromisoformat(str(start_date)[:10]) if start_date else date.today() - timedelta(days=30)
+        end = date.fromisoformat(str(end_date)[:10]) if end_date else date.today()
+        workouts = (_workout(i) for i in range(WORKOUTS))
+        return [w for w in workouts if start <= w.otf_class.starts_at.date() <= end]
+
+    def get_member_services(self, active_only: bool = True):
+        self._wait('get_member_services')
+        return [{'service': 'Premier Membership', 'active': True}]
+
+    def __getattr__(self, name: str):
+        # Tools the benchmark scenarios don't exercise still answer, empty.
+        if name.startswith('get_'):
+            def empty(*args, **kwargs):
+                self._wait(name)
+                return []
+
+            return empty
+        raise AttributeError(name)
+
+
+def install():
+    """Makes ``from otf_api import Otf, OtfUser`` resolve to the fakes."""
+    otf_api.Otf = FakeOtf
+    otf_api.OtfUser = FakeOtfUser
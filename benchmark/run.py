@@ -0,0 +1,328 @@
+"""Offline load test for the agent, the MCP server and phone_routing.
+
+Starts each component in its own process against the scripted chat model
+and the fake OTF backend, drives ``--sessions`` concurrent sessions through
+the benchmark scenarios, and reports latency percentiles, throughput and
+resident memory per component.
+
+    python benchmark/run.py --sessions 20 --turns 6
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncContextManager, Awaitable, Callable, Optional
+
+import httpx
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from scenarios import SCENARIOS
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Ports the entrypoints bind to.
+MCP_PORT = 8000
+AGENT_PORT = 10000
+PHONE_PORT = 8080
+
+COMPONENTS = ('mcp', 'agent', 'phone')
+
+
+@dataclass
+class ComponentResult:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    wall_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    end_rss_mb: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        # Nearest-rank percentile.
+        rank = max(int(round(p / 100 * len(ordered) + 0.5)) - 1, 0)
+        return ordered[min(rank, len(ordered) - 1)]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'throughput_rps': len(self.latencies) / self.wall_seconds if self.wall_seconds else 0.0,
+            'peak_rss_mb': self.peak_rss_mb,
+            'end_rss_mb': self.end_rss_mb,
+        }
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of ``pid`` from /proc, or None where unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def port_open(port: int) -> bool:
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+class Process:
+    def __init__(self, name: str, script: str, port: int, env: dict[str, str], log_dir: str):
+        self.name = name
+        self.port = port
+        if port_open(port):
+            raise RuntimeError(f'port {port} is already in use; stop whatever is serving it first')
+        self.log = open(os.path.join(log_dir, f'{name}.log'), 'w')
+        self.popen = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, script)],
+            cwd=HERE,
+            env={**os.environ, **env},
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+
+    async def wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.popen.poll() is not None:
+                raise RuntimeError(f'{self.name} exited early; see {self.log.name}')
+            if port_open(self.port):
+                return
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f'{self.name} did not open port {self.port} within {timeout}s')
+
+    def stop(self):
+        self.popen.terminate()
+        try:
+            self.popen.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.popen.kill()
+        self.log.close()
+
+
+async def sample_memory(processes: dict[str, Process], memory: dict[str, list[float]], stop: asyncio.Event):
+    """Records [peak, latest] RSS of every component until ``stop`` is set."""
+    while not stop.is_set():
+        for name, process in processes.items():
+            rss = rss_mb(process.popen.pid)
+            if rss is not None:
+                peak, _ = memory.get(name, [0.0, 0.0])
+                memory[name] = [max(peak, rss), rss]
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def drive(
+    result: ComponentResult,
+    sessions: int,
+    turns: int,
+    session_factory: Callable[[int], AsyncContextManager[Any]],
+    request: Callable[[Any, int, int], Awaitable[bool]],
+):
+    """Runs ``sessions`` concurrent sessions of ``turns`` sequential requests."""
+
+    async def run_session(index: int):
+        async with session_factory(index) as session:
+            for turn in range(turns):
+                start = time.perf_counter()
+                try:
+                    ok = await request(session, index, turn)
+                except Exception:
+                    ok = False
+                result.latencies.append(time.perf_counter() - start)
+                result.errors += int(not ok)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i) for i in range(sessions)))
+    result.wall_seconds = time.perf_counter() - start
+
+
+def scenario_for(index: int, turn: int):
+    return SCENARIOS[(index + turn) % len(SCENARIOS)]
+
+
+async def bench_mcp(result: ComponentResult, sessions: int, turns: int):
+    # Every tool call the scenarios make, in a fixed cycle.
+    calls = [call for scenario in SCENARIOS for step in scenario.steps for call in step.tool_calls]
+    cycle = itertools.cycle(calls)
+
+    @asynccontextmanager
+    async def mcp_session(_index: int):
+        async with sse_client(f'http://127.0.0.1:{MCP_PORT}/sse') as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+    async def request(session: ClientSession, _index: int, _turn: int) -> bool:
+        name, arguments = next(cycle)
+        response = await session.call_tool(name, arguments)
+        return not response.isError
+
+    await drive(result, sessions, turns, mcp_session, request)
+
+
+async def bench_agent(result: ComponentResult, sessions: int, turns: int):
+    client = httpx.AsyncClient(timeout=120)
+
+    @asynccontextmanager
+    async def agent_session(_index: int):
+        yield uuid.uuid4().hex
+
+    async def request(session_id: str, index: int, turn: int) -> bool:
+        payload = {
+            'jsonrpc': '2.0',
+            'id': uuid.uuid4().hex,
+            'method': 'tasks/send',
+            'params': {
+                'id': uuid.uuid4().hex,
+                'sessionId': session_id,
+                'message': {
+                    'role': 'user',
+                    'parts': [{'type': 'text', 'text': scenario_for(index, turn).query}],
+                },
+            },
+        }
+        response = await client.post(f'http://127.0.0.1:{AGENT_PORT}/', json=payload)
+        body = response.json()
+        state = body.get('result', {}).get('status', {}).get('state')
+        return response.status_code == 200 and body.get('error') is None and state != 'failed'
+
+    try:
+        await drive(result, sessions, turns, agent_session, request)
+    finally:
+        await client.aclose()
+
+
+async def bench_phone(result: ComponentResult, sessions: int, turns: int):
+    client = httpx.AsyncClient(timeout=120)
+
+    @asynccontextmanager
+    async def phone_session(index: int):
+        yield f'555{index:07d}@sms.example.com'
+
+    async def request(sender: str, index: int, turn: int) -> bool:
+        response = await client.post(
+            f'http://127.0.0.1:{PHONE_PORT}/api/incoming-sms',
+            json={'sender': sender, 'message': scenario_for(index, turn).query},
+        )
+        return response.status_code == 200
+
+    try:
+        await drive(result, sessions, turns, phone_session, request)
+    finally:
+        await client.aclose()
+
+
+BENCHES = {'mcp': bench_mcp, 'agent': bench_agent, 'phone': bench_phone}
+
+
+async def main(args: argparse.Namespace) -> dict[str, dict[str, Any]]:
+    components = [c for c in COMPONENTS if c in args.components.split(',')]
+    needed = set(components)
+    # The agent needs the MCP server, phone_routing needs the agent.
+    if 'phone' in needed:
+        needed.add('agent')
+    if 'agent' in needed:
+        needed.add('mcp')
+
+    os.makedirs(args.log_dir, exist_ok=True)
+    env = {
+        'BENCH_LLM_LATENCY': str(args.llm_latency),
+        'BENCH_TOKEN_LATENCY': str(args.token_latency),
+        'BENCH_OTF_LATENCY': str(args.otf_latency),
+        'MCP_SERVER_URL': f'http://127.0.0.1:{MCP_PORT}/sse',
+        'AGENT_URL': f'http://127.0.0.1:{AGENT_PORT}/',
+        'PYTHONUNBUFFERED': '1',
+    }
+    if args.agent_workers > 1:
+        env['AGENT_WORKERS'] = str(args.agent_workers)
+        env['AGENT_SHARED_DB'] = os.path.join(args.log_dir, f'shared-{uuid.uuid4().hex[:8]}.db')
+    scripts = {
+        'mcp': ('serve_mcp.py', MCP_PORT),
+        'agent': ('serve_agent.py', AGENT_PORT),
+        'phone': ('serve_phone.py', PHONE_PORT),
+    }
+
+    processes: dict[str, Process] = {}
+    memory: dict[str, list[float]] = {}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_memory(processes, memory, stop))
+    results = {}
+    try:
+        for name in COMPONENTS:
+            if name in needed:
+                script, port = scripts[name]
+                processes[name] = Process(name, script, port, env, args.log_dir)
+                await processes[name].wait_ready(args.startup_timeout)
+
+        # One component at a time, so each one's numbers are its own.
+        for name in components:
+            results[name] = ComponentResult(name)
+            await BENCHES[name](results[name], args.sessions, args.turns)
+    finally:
+        stop.set()
+        await sampler
+        for process in processes.values():
+            process.stop()
+
+    for name, result in results.items():
+        result.peak_rss_mb, result.end_rss_mb = memory.get(name, [0.0, 0.0])
+    return {name: result.as_dict() for name, result in results.items()}
+
+
+def report(results: dict[str, dict[str, Any]]):
+    header = f"{'component':<10}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'peak MB':>10}{'end MB':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<10}{r['requests']:>7}{r['errors']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['throughput_rps']:>9.2f}{r['peak_rss_mb']:>10.1f}{r['end_rss_mb']:>9.1f}"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--components', default=','.join(COMPONENTS), help='comma-separated subset of mcp,agent,phone')
+    parser.add_argument('--sessions', type=int, default=10, help='concurrent sessions per component')
+    parser.add_argument('--turns', type=int, default=6, help='sequential requests per session')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='seconds before the scripted model answers')
+    parser.add_argument('--token-latency', type=float, default=0.005, help='seconds between streamed words')
+    parser.add_argument('--otf-latency', type=float, default=0.05, help='seconds each fake OTF call blocks')
+    parser.add_argument('--agent-workers', type=int, default=1, help='agent worker processes sharing one SQLite backend')
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    parser.add_argument('--log-dir', default=os.path.join(HERE, 'logs'))
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+from fake_otf import class_uuid, studio_uuid
+
+
+@dataclass(frozen=True)
+class Step:
+    """One scripted model turn: tool calls to make, or the final answer."""
+
+    tool_calls: tuple[tuple[str, dict[str, Any]], ...] = ()
+    content: str = ''
+    status: str = 'completed'
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    query: str
+    steps: tuple[Step, ...] = field(default_factory=tuple)
+
+
+SCENARIOS = (
+    Scenario(
+        name='classes_at_studio',
+        query='What are some classes I can book at the Manhattan-West Village studio?',
+        steps=(
+            Step(tool_calls=(('get_today_date', {}), ('get_favorite_studios', {}))),
+            Step(tool_calls=(('get_classes', {'studio_uuids': [studio_uuid(0)]}),)),
+            Step(
+                content=(
+                    'Tomorrow at Manhattan-West Village you can take Orange 60 at 5:00 AM, '
+                    'Strength 50 at 6:15 AM and Tread 50 at 7:30 AM.'
+                )
+            ),
+        ),
+    ),
+    Scenario(
+        name='book_class',
+        query='Book me into the 7:30 class tomorrow at West Village',
+        steps=(
+            Step(tool_calls=(('get_classes', {'studio_uuids': [studio_uuid(0)]}),)),
+            Step(tool_calls=(('book_class_new', {'class_id': class_uuid(0, 1, 2)}),)),
+            Step(content='You are booked into Tread 50 tomorrow at 7:30 AM at Manhattan-West Village.'),
+        ),
+    ),
+    Scenario(
+        name='studios_nearby',
+        query='Which studios are near Union Square?',
+        steps=(
+            Step(tool_calls=(('search_studios_by_geo', {'latitude': 40.7359, 'longitude': -73.9911, 'distance': 3}),)),
+            Step(content='The closest studios are Manhattan-Flatiron, Manhattan-Chelsea and Manhattan-West Village.'),
+        ),
+    ),
+    Scenario(
+        name='stats_trend',
+        query='How have my workouts and max heart rate trended this year?',
+        steps=(
+            Step(
+                tool_calls=(
+                    ('get_member_lifetime_stats_in_studio', {'select_time': 'thisYear'}),
+                    ('get_hr_history', {}),
+                )
+            ),
+            Step(content='You have logged 4,120 splat points this year and your max heart rate has held steady around 187.'),
+        ),
+    ),
+    Scenario(
+        name='clarify',
+        query='Can you move my booking?',
+        steps=(
+            Step(tool_calls=(('get_bookings_new', {}),)),
+            Step(
+                content='You have three upcoming bookings. Which one should I move, and to when?',
+                status='input_required',
+            ),
+        ),
+    ),
+    # Built only from shared studio data, so repeats come from the answer cache.
+    Scenario(
+        name='studio_services',
+        query='What services does the Manhattan-West Village studio offer?',
+        steps=(
+            Step(tool_calls=(('get_studio_services', {'studio_uuid': studio_uuid(0)}),)),
+            Step(content='Manhattan-West Village offers body composition scans, lockers and showers.'),
+        ),
+    ),
+    # Answered by the agent's fast path without a model call.
+    Scenario(name='upcoming_bookings', query='Show my upcoming bookings'),
+)
+
+SCENARIOS_BY_QUERY = {scenario.query: scenario for scenario in SCENARIOS}
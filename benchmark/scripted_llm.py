@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from collections.abc import AsyncIterator, Iterator
+from typing import Any, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    AnyMessage,
+    BaseMessage,
+    HumanMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from scenarios import SCENARIOS_BY_QUERY, Scenario, Step
+
+
+FALLBACK_STEP = Step(content='I can only help with Orange Theory Fitness questions.')
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic chat model that replays each scenario's scripted steps.
+
+    The step is picked by the first member message of the current turn and
+    the number of model messages already in it, so concurrent sessions and
+    multi-turn threads replay independently. Each call waits ``latency``
+    seconds before the first token and ``token_latency`` per streamed word.
+    """
+
+    scripts: dict[str, Scenario] = SCENARIOS_BY_QUERY
+    latency: float = float(os.getenv('BENCH_LLM_LATENCY', '0.3'))
+    token_latency: float = float(os.getenv('BENCH_TOKEN_LATENCY', '0.005'))
+    # Set by OrangeTheoryAgent; the scripted model ignores it.
+    tool_selector: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def with_structured_output(self, schema, **kwargs):
+        async def respond(messages: list[AnyMessage]):
+            await asyncio.sleep(self.latency)
+            return self._structured(schema, messages)
+
+        def respond_sync(messages: list[AnyMessage]):
+            time.sleep(self.latency)
+            return self._structured(schema, messages)
+
+        return RunnableLambda(respond_sync, afunc=respond)
+
+    def next_step(self, messages: list[BaseMessage]) -> Step:
+        turn_start = max(
+            (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=None
+        )
+        if turn_start is None:
+            return FALLBACK_STEP
+        scenario = self.scripts.get(str(messages[turn_start].content))
+        if scenario is None or not scenario.steps:
+            return FALLBACK_STEP
+        done = sum(isinstance(m, AIMessage) for m in messages[turn_start:])
+        return scenario.steps[min(done, len(scenario.steps) - 1)]
+
+    def _structured(self, schema, messages: list[AnyMessage]):
+        step = self.next_step(messages[:-1] if isinstance(messages[-1], AIMessage) else messages)
+        answer = next(
+            (m.content for m in reversed(messages) if isinstance(m, AIMessage) and m.content),
+            step.content,
+        )
+        return schema(status=step.status, message=answer)
+
+    def _message(self, step: Step, call_id: str) -> AIMessage:
+        return AIMessage(
+            content=step.content,
+            tool_calls=[
+                {'name': name, 'args': args, 'id': f'{call_id}-{i}', 'type': 'tool_call'}
+                for i, (name, args) in enumerate(step.tool_calls)
+            ],
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        message = self._message(self.next_step(messages), f'call-{uuid.uuid4().hex[:12]}')
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        message = self._message(self.next_step(messages), f'call-{uuid.uuid4().hex[:12]}')
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for chunk in self._chunks(self.next_step(messages), f'call-{uuid.uuid4().hex[:12]}'):
+            yield chunk
+            time.sleep(self.token_latency)
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(self.next_step(messages), f'call-{uuid.uuid4().hex[:12]}'):
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_latency)
+
+    def _chunks(self, step: Step, call_id: str) -> list[ChatGenerationChunk]:
+        if step.tool_calls:
+            tool_call_chunks = [
+                {
+                    'name': name,
+                    'args': json.dumps(args),
+                    'id': f'{call_id}-{i}',
+                    'index': i,
+                    'type': 'tool_call_chunk',
+                }
+                for i, (name, args) in enumerate(step.tool_calls)
+            ]
+            return [
+                ChatGenerationChunk(
+                    message=AIMessageChunk(content='', tool_call_chunks=tool_call_chunks)
+                )
+            ]
+        words = step.content.split(' ')
+        return [
+            ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f' {word}'))
+            for i, word in enumerate(words)
+        ]
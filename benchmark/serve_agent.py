@@ -0,0 +1,37 @@
+"""Runs agent/main.py with the scripted chat model in place of OpenAI.
+
+With AGENT_WORKERS > 1 each uvicorn worker imports ``create_app`` from
+here, so every worker process gets the scripted model too.
+"""
+import os
+import sys
+
+from scripted_llm import ScriptedChatModel
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT_DIR = os.path.join(ROOT, 'agent')
+
+
+def _patch():
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    if AGENT_DIR not in sys.path:
+        sys.path.insert(0, AGENT_DIR)
+
+    import agent
+
+    agent.ToolSelectingChatOpenAI = lambda **_kwargs: ScriptedChatModel()
+
+
+def create_app():
+    _patch()
+    import main
+
+    return main.create_app()
+
+
+if __name__ == '__main__':
+    _patch()
+    import main
+
+    main.main('0.0.0.0', 10000, app='serve_agent:create_app')
@@ -0,0 +1,16 @@
+"""Runs mcp_server/mcp_server.py against the fake OTF backend."""
+import os
+import runpy
+import sys
+
+import fake_otf
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+if __name__ == '__main__':
+    fake_otf.install()
+    # mcp_server.py imports its sibling modules flat.
+    sys.path.insert(0, os.path.join(ROOT, 'mcp_server'))
+    runpy.run_path(os.path.join(ROOT, 'mcp_server', 'mcp_server.py'), run_name='__main__')
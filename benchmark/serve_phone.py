@@ -0,0 +1,20 @@
+"""Runs phone_routing/main.py with outgoing email disabled."""
+import os
+import runpy
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHONE_DIR = os.path.join(ROOT, 'phone_routing')
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('GMAIL_USER', 'benchmark@example.com')
+    os.environ.setdefault('GMAIL_PASSWORD', 'benchmark')
+    sys.path.insert(0, PHONE_DIR)
+
+    from services import email_service
+
+    # api/sms.py imports send_email by name, so patch it before that import.
+    email_service.send_email = lambda to_address, subject, body: True
+    runpy.run_path(os.path.join(PHONE_DIR, 'main.py'), run_name='__main__')
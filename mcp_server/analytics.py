@@ -0,0 +1,202 @@
+from datetime import date
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+# Metric name -> (attribute path on models.Workout, scale).
+METRICS: Dict[str, tuple] = {
+    "calories": ("calories_burned", 1.0),
+    "splat_points": ("splat_points", 1.0),
+    "steps": ("step_count", 1.0),
+    "active_minutes": ("active_time_seconds", 1 / 60),
+    "avg_hr": ("heart_rate.avg_hr", 1.0),
+    "peak_hr": ("heart_rate.peak_hr", 1.0),
+    "treadmill_distance": ("treadmill_data.total_distance.metric_value", 1.0),
+    "treadmill_avg_speed": ("treadmill_data.avg_speed.metric_value", 1.0),
+    "treadmill_elevation": ("treadmill_data.elevation_gained.metric_value", 1.0),
+    "rower_distance": ("rower_data.total_distance.metric_value", 1.0),
+    "rower_avg_speed": ("rower_data.avg_speed.metric_value", 1.0),
+    "rower_avg_power": ("rower_data.avg_power.metric_value", 1.0),
+}
+
+ZONES = ("gray", "blue", "green", "orange", "red")
+PERIODS = ("week", "month")
+
+
+def _value(item: Any, path: str) -> Optional[float]:
+    for name in path.split("."):
+        item = getattr(item, name, None)
+        if item is None:
+            return None
+    return float(item)
+
+
+def _round(value: float, digits: int = 1) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _metric(name: str) -> tuple:
+    if name not in METRICS:
+        raise ValueError(f"Unknown metric {name!r}; use one of {', '.join(METRICS)}")
+    return METRICS[name]
+
+
+def _period(period: Optional[str]):
+    if period is not None and period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; use one of {', '.join(PERIODS)}")
+
+
+def check(metric: Optional[str] = None, period: Optional[str] = None):
+    """
+    Raises ValueError for an unknown metric or period, so tools can refuse
+    before fetching any workouts.
+    """
+    if metric is not None:
+        _metric(metric)
+    _period(period)
+
+
+class WorkoutFrame:
+    """
+    Workouts as columns: one datetime64 day per workout, a float array per
+    metric and a (workouts x zones) array of zone minutes, with NaN wherever
+    a workout lacks the value. Built once per call from ``models.Workout``.
+    """
+
+    def __init__(self, workouts: Sequence[Any], metrics: Sequence[str] = ()):
+        workouts = sorted(workouts, key=lambda w: w.otf_class.starts_at)
+        self.days = np.array([w.otf_class.starts_at.date() for w in workouts], dtype="datetime64[D]")
+        self.columns: Dict[str, np.ndarray] = {}
+        for name in metrics:
+            path, scale = _metric(name)
+            values = [_value(w, path) for w in workouts]
+            self.columns[name] = np.array([np.nan if v is None else v for v in values], dtype=float) * scale
+        self.zones = np.array(
+            [
+                [getattr(w.zone_time_minutes, zone) for zone in ZONES] if w.zone_time_minutes else [np.nan] * len(ZONES)
+                for w in workouts
+            ],
+            dtype=float,
+        ).reshape(-1, len(ZONES))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+def _buckets(days: np.ndarray, period: str) -> tuple:
+    """
+    Returns every period start from the first workout to the last, empty
+    ones included, and each workout's index into them.
+    """
+    _period(period)
+    if period == "month":
+        months = days.astype("datetime64[M]")
+        starts = np.arange(months.min(), months.max() + 1)
+        index = (months - starts[0]).astype(int)
+        return starts.astype("datetime64[D]"), index
+    # 1970-01-01 was a Thursday; weeks start on Monday.
+    mondays = days - (days.astype(int) + 3) % 7
+    starts = np.arange(mondays.min(), mondays.max() + 1, 7)
+    index = ((mondays - starts[0]).astype(int)) // 7
+    return starts, index
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    window_counts = counts[end] - counts[start]
+    window_sums = sums[end] - sums[start]
+    return np.divide(window_sums, window_counts, out=np.full(len(values), np.nan), where=window_counts > 0)
+
+
+def trend(frame: WorkoutFrame, metric: str, period: str = "week", window: int = 4) -> Dict[str, Any]:
+    """
+    Per-period workout count, total and mean of a metric, the mean's rolling
+    average over ``window`` periods and its linear trend per period.
+    """
+    values = frame.columns[metric]
+    if not len(frame):
+        return {"metric": metric, "period": period, "workouts": 0}
+    starts, index = _buckets(frame.days, period)
+    present = ~np.isnan(values)
+    counts = np.bincount(index, weights=present, minlength=len(starts))
+    totals = np.bincount(index, weights=np.where(present, values, 0.0), minlength=len(starts))
+    means = np.divide(totals, counts, out=np.full(len(starts), np.nan), where=counts > 0)
+    rolling = _rolling_mean(means, max(window, 1))
+    workouts = np.bincount(index, minlength=len(starts))
+
+    slope = np.nan
+    x = np.flatnonzero(~np.isnan(means))
+    if len(x) >= 2:
+        slope = np.polyfit(x, means[x], 1)[0]
+    return {
+        "metric": metric,
+        "period": period,
+        "workouts": int(len(frame)),
+        "mean": _round(np.nanmean(values)) if present.any() else None,
+        "trend_per_period": _round(slope, 2),
+        "periods": {
+            "columns": ["start", "workouts", "total", "mean", f"rolling_mean_{window}"],
+            "rows": [
+                [str(start), int(n), _round(total), _round(mean), _round(roll)]
+                for start, n, total, mean, roll in zip(starts, workouts, totals, means, rolling)
+            ],
+        },
+    }
+
+
+def percentiles(frame: WorkoutFrame, metric: str, qs: Sequence[float] = (10, 25, 50, 75, 90)) -> Dict[str, Any]:
+    values = frame.columns[metric]
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"metric": metric, "workouts": 0}
+    points = np.percentile(values, qs)
+    return {
+        "metric": metric,
+        "workouts": int(len(values)),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+        "mean": _round(values.mean()),
+        "std": _round(values.std()),
+        "percentiles": {f"p{q:g}": _round(p) for q, p in zip(qs, points)},
+    }
+
+
+def zone_distribution(frame: WorkoutFrame, period: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Minutes in each heart-rate zone: totals, share of all zone time, average
+    per workout and, with ``period``, minutes per zone per period.
+    """
+    zones = frame.zones[~np.isnan(frame.zones).any(axis=1)]
+    if not len(zones):
+        return {"workouts": 0}
+    totals = zones.sum(axis=0)
+    share = totals / totals.sum() * 100 if totals.sum() else np.zeros(len(ZONES))
+    result: Dict[str, Any] = {
+        "workouts": int(len(zones)),
+        "total_minutes": {zone: _round(t) for zone, t in zip(ZONES, totals)},
+        "share_percent": {zone: _round(s) for zone, s in zip(ZONES, share)},
+        "mean_minutes_per_workout": {zone: _round(m) for zone, m in zip(ZONES, zones.mean(axis=0))},
+        # Orange and red together are what earns splat points.
+        "orange_plus_red_minutes_per_workout": _round(zones[:, 3:].sum(axis=1).mean()),
+    }
+    if period:
+        starts, index = _buckets(frame.days, period)
+        complete = ~np.isnan(frame.zones).any(axis=1)
+        by_period = np.zeros((len(starts), len(ZONES)))
+        np.add.at(by_period, index[complete], frame.zones[complete])
+        result["periods"] = {
+            "columns": ["start", *ZONES],
+            "rows": [[str(start), *(_round(m) for m in row)] for start, row in zip(starts, by_period)],
+        }
+    return result
+
+
+def date_range(start_date: Optional[date], end_date: Optional[date], default_days: int = 90) -> tuple:
+    end = end_date or date.today()
+    start = start_date or date.fromordinal(end.toordinal() - default_days)
+    return start, end
+
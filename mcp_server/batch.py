@@ -0,0 +1,52 @@
+import contextvars
+import logging
+from concurrent.futures import Executor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 50
+
+
+@dataclass
+class Batch:
+    items: List[Any]
+    # id -> why it has no item.
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+def unique_ids(ids: Iterable[str], limit: int = MAX_BATCH_SIZE) -> List[str]:
+    """
+    Drops repeated and empty ids, keeping the first occurrence's order.
+    """
+    unique = list(dict.fromkeys(i for i in ids if i))
+    if len(unique) > limit:
+        raise ValueError(f"At most {limit} ids per call, got {len(unique)}")
+    return unique
+
+
+def error_message(e: BaseException) -> str:
+    return f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+
+def fan_out(pool: Executor, call: Callable[[str], Any], ids: Iterable[str], limit: int = MAX_BATCH_SIZE) -> Batch:
+    """
+    Calls ``call`` once per unique id on ``pool`` and waits for all of them.
+
+    Each call runs in a copy of the caller's context, so it acts for the
+    same member. Items come back in the order of ``ids``; an id whose call
+    failed is in ``errors`` instead and doesn't fail the others.
+    """
+    ids = unique_ids(ids, limit)
+    futures = {i: pool.submit(contextvars.copy_context().run, call, i) for i in ids}
+    wait(futures.values())
+    batch = Batch([])
+    for i, future in futures.items():
+        error = future.exception()
+        if error is None:
+            batch.items.append(future.result())
+        else:
+            logger.debug(f"Batch item {i} failed: {error!r}")
+            batch.errors[i] = error_message(error)
+    return batch
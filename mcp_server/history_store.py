@@ -0,0 +1,365 @@
+import importlib.metadata
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from otf_api import models
+
+logger = logging.getLogger(__name__)
+
+WORKOUTS = "workouts"
+BOOKINGS = "bookings"
+BODY_COMPOSITION = "body_composition"
+PERFORMANCE_SUMMARIES = "performance_summaries"
+TELEMETRY = "telemetry"
+
+# get_historical_bookings covers this many days back, as otf_api does.
+HISTORICAL_BOOKING_DAYS = 47
+
+# (id, starts_at, studio_uuid, class_type, value) as stored.
+Record = Tuple[str, Optional[datetime], Optional[str], Optional[str], Any]
+
+
+def _day(value: Union[date, str, None]) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _workout(workout: models.Workout) -> Record:
+    return (
+        workout.performance_summary_id,
+        workout.otf_class.starts_at,
+        workout.studio.studio_uuid,
+        workout.otf_class.class_type.value,
+        workout,
+    )
+
+
+def _booking(booking: models.Booking) -> Record:
+    # Old-style bookings have no class type; the class name stands in.
+    return (
+        booking.booking_uuid,
+        booking.otf_class.starts_at,
+        booking.otf_class.studio.studio_uuid,
+        booking.otf_class.name,
+        booking,
+    )
+
+
+def _scan(scan: models.BodyCompositionData) -> Record:
+    return (scan.scan_result_uuid, scan.scan_datetime, None, None, scan)
+
+
+class HistoryStore:
+    """
+    Members' past workouts, bookings, body-composition scans, performance
+    summaries and telemetry in a local SQLite file.
+
+    Records of a kind are kept with their date, studio and class type, each
+    indexed. For dated kinds the store remembers per member which days it
+    holds (a low and a high-water mark) so a sync only asks upstream for the
+    days it doesn't hold yet, plus the last ``overlap_days`` again at most
+    every ``sync_interval`` seconds to pick up workouts still being scored.
+    Values are pickled; a file written by another otf_api version is
+    cleared on open.
+    """
+
+    def __init__(self, path: str, sync_interval: float = 300.0, overlap_days: int = 1, timeout: float = 10.0):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.overlap_days = overlap_days
+        self.upstream_calls = 0
+        self.upstream_records = 0
+        # Records fetched but not stored because upstream hadn't filled them in yet.
+        self.incomplete = 0
+        self._lock = threading.Lock()
+        # (member, kind) -> lock held while that sync runs.
+        self._sync_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                member TEXT NOT NULL, kind TEXT NOT NULL, id TEXT NOT NULL,
+                starts_at TEXT, studio_uuid TEXT, class_type TEXT, data BLOB NOT NULL,
+                PRIMARY KEY (member, kind, id)
+            );
+            CREATE INDEX IF NOT EXISTS records_date ON records (member, kind, starts_at);
+            CREATE INDEX IF NOT EXISTS records_studio ON records (member, kind, studio_uuid, starts_at);
+            CREATE INDEX IF NOT EXISTS records_class_type ON records (member, kind, class_type, starts_at);
+            CREATE TABLE IF NOT EXISTS syncs (
+                member TEXT NOT NULL, kind TEXT NOT NULL,
+                low TEXT, high TEXT, synced_at REAL NOT NULL,
+                PRIMARY KEY (member, kind)
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        version = importlib.metadata.version("otf-api")
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'otf_api'").fetchone()
+        if row is not None and row[0] != version:
+            logger.info(f"History store was written by otf_api {row[0]}, clearing it for {version}")
+            self._db.execute("DELETE FROM records")
+            self._db.execute("DELETE FROM syncs")
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('otf_api', ?)", (version,))
+        self._db.commit()
+
+    def sync_range(self, member: str, kind: str, start: date, end: date, fetch: Callable[[date, date], Iterable[Record]]):
+        """
+        Makes sure the store holds ``kind`` from start to end, calling
+        ``fetch`` only for the days around what it already holds.
+        """
+        end = min(end, date.today())
+        if start > end:
+            return
+        with self._sync_lock(member, kind):
+            mark = self._mark(member, kind)
+            if mark is None:
+                self._fetch(member, kind, fetch, start, end)
+                self._set_mark(member, kind, start, end)
+                return
+            low, high, synced_at = mark
+            if start < low:
+                self._fetch(member, kind, fetch, start, low - timedelta(days=1))
+                low = start
+            stale = time.time() - synced_at > self.sync_interval
+            if end > high or (stale and end >= high - timedelta(days=self.overlap_days)):
+                # Anything after the high-water mark, and the last days again
+                # since today's workouts may not have been scored yet.
+                high = max(high, end)
+                self._fetch(member, kind, fetch, mark[1] - timedelta(days=self.overlap_days), high)
+                synced_at = time.time()
+            self._set_mark(member, kind, low, high, synced_at)
+
+    def sync_all(self, member: str, kind: str, fetch: Callable[[], Iterable[Record]]):
+        """
+        For kinds upstream can only return whole: refetches at most every
+        ``sync_interval`` seconds and keeps what it had otherwise.
+        """
+        with self._sync_lock(member, kind):
+            mark = self._mark(member, kind)
+            if mark is not None and time.time() - mark[2] <= self.sync_interval:
+                return
+            records = list(fetch())
+            self._put(member, kind, records)
+            self._set_mark(member, kind, None, None)
+
+    def query(
+        self,
+        member: str,
+        kind: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        studio_uuid: Optional[str] = None,
+        class_type: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Returns the stored ``kind`` records of a member, oldest first.
+        """
+        sql = "SELECT data FROM records WHERE member = ? AND kind = ?"
+        params: List[Any] = [member, kind]
+        if start:
+            sql += " AND starts_at >= ?"
+            params.append(start.isoformat())
+        if end:
+            sql += " AND starts_at < ?"
+            params.append((end + timedelta(days=1)).isoformat())
+        if studio_uuid:
+            sql += " AND studio_uuid = ?"
+            params.append(studio_uuid)
+        if class_type:
+            sql += " AND class_type = ?"
+            params.append(class_type)
+        sql += " ORDER BY starts_at, id"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def get(
+        self, member: str, kind: str, record_id: str, fetch: Callable[[], Any], complete: Callable[[Any], bool] = lambda value: True
+    ) -> Any:
+        """
+        Returns one record that never changes once it is complete, fetching
+        it until then. Upstream fills some records in only after the class
+        (summaries, telemetry); one ``complete`` rejects isn't stored, so
+        the next call fetches it again.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM records WHERE member = ? AND kind = ? AND id = ?", (member, kind, record_id)
+            ).fetchone()
+        if row is not None:
+            return pickle.loads(row[0])
+        value = fetch()
+        if complete(value):
+            self._put(member, kind, [(record_id, None, None, None, value)])
+        else:
+            self.incomplete += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = self._db.execute("SELECT kind, COUNT(*), COUNT(DISTINCT member) FROM records GROUP BY kind").fetchall()
+            studios = self._db.execute(
+                "SELECT kind, studio_uuid, COUNT(*) FROM records WHERE studio_uuid IS NOT NULL GROUP BY kind, studio_uuid"
+            ).fetchall()
+            class_types = self._db.execute(
+                "SELECT kind, class_type, COUNT(*) FROM records WHERE class_type IS NOT NULL GROUP BY kind, class_type"
+            ).fetchall()
+        stats: Dict[str, Any] = {
+            "path": self.path,
+            "upstream_calls": self.upstream_calls,
+            "upstream_records": self.upstream_records,
+            "incomplete": self.incomplete,
+            "kinds": {kind: {"records": count, "members": members} for kind, count, members in kinds},
+        }
+        for kind, studio, count in studios:
+            stats["kinds"][kind].setdefault("by_studio", {})[studio] = count
+        for kind, class_type, count in class_types:
+            stats["kinds"][kind].setdefault("by_class_type", {})[class_type] = count
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _sync_lock(self, member: str, kind: str) -> threading.Lock:
+        with self._lock:
+            return self._sync_locks.setdefault((member, kind), threading.Lock())
+
+    def _fetch(self, member: str, kind: str, fetch: Callable[[date, date], Iterable[Record]], start: date, end: date):
+        records = list(fetch(start, end))
+        self._put(member, kind, records)
+        logger.debug(f"Synced {len(records)} {kind} for {member!r} from {start} to {end}")
+
+    def _put(self, member: str, kind: str, records: List[Record]):
+        self.upstream_calls += 1
+        self.upstream_records += len(records)
+        rows = [
+            (
+                member,
+                kind,
+                record_id,
+                starts_at.isoformat() if starts_at else None,
+                studio_uuid,
+                class_type,
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+            for record_id, starts_at, studio_uuid, class_type, value in records
+        ]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records (member, kind, id, starts_at, studio_uuid, class_type, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+
+    def _mark(self, member: str, kind: str) -> Optional[Tuple[Optional[date], Optional[date], float]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT low, high, synced_at FROM syncs WHERE member = ? AND kind = ?", (member, kind)
+            ).fetchone()
+        if row is None:
+            return None
+        return _day(row[0]), _day(row[1]), row[2]
+
+    def _set_mark(self, member: str, kind: str, low: Optional[date], high: Optional[date], synced_at: Optional[float] = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs (member, kind, low, high, synced_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    member,
+                    kind,
+                    low.isoformat() if low else None,
+                    high.isoformat() if high else None,
+                    time.time() if synced_at is None else synced_at,
+                ),
+            )
+            self._db.commit()
+
+
+class HistoryOtf:
+    """
+    Serves an ``Otf`` client's history calls from a ``HistoryStore``.
+
+    Workouts and historical bookings are synced for the requested days and
+    then read locally; performance summaries and telemetry are fetched once
+    per id. Everything else passes straight through to the client.
+    """
+
+    def __init__(self, otf: Any, store: HistoryStore, member: Callable[[], str] = lambda: ""):
+        self._otf = otf
+        self._store = store
+        self._member = member
+
+    def __getattr__(self, name: str):
+        return getattr(self._otf, name)
+
+    def get_workouts(self, start_date: Union[date, str, None] = None, end_date: Union[date, str, None] = None) -> List[models.Workout]:
+        end = _day(end_date) or date.today()
+        start = _day(start_date) or date.today() - timedelta(days=30)
+        member = self._member()
+        self._store.sync_range(
+            member, WORKOUTS, start, end, lambda s, e: map(_workout, self._otf.get_workouts(s, e))
+        )
+        return self._store.query(member, WORKOUTS, start, end)
+
+    def get_historical_bookings(self) -> List[models.Booking]:
+        end = date.today()
+        start = end - timedelta(days=HISTORICAL_BOOKING_DAYS)
+        member = self._member()
+
+        def fetch(s: date, e: date) -> Iterable[Record]:
+            bookings = self._otf.get_bookings(
+                start_date=s,
+                end_date=e,
+                status=models.HISTORICAL_BOOKING_STATUSES,
+                exclude_cancelled=False,
+                exclude_checkedin=False,
+            )
+            return map(_booking, bookings)
+
+        self._store.sync_range(member, BOOKINGS, start, end, fetch)
+        return self._store.query(member, BOOKINGS, start, end)
+
+    def get_body_composition_list(self) -> List[models.BodyCompositionData]:
+        member = self._member()
+        self._store.sync_all(member, BODY_COMPOSITION, lambda: map(_scan, self._otf.get_body_composition_list()))
+        return self._store.query(member, BODY_COMPOSITION)
+
+    def get_performance_summary(self, performance_summary_id: str) -> models.PerformanceSummary:
+        return self._store.get(
+            self._member(),
+            PERFORMANCE_SUMMARIES,
+            performance_summary_id,
+            lambda: self._otf.get_performance_summary(performance_summary_id),
+            _summary_complete,
+        )
+
+    def get_telemetry(self, performance_summary_id: str, max_data_points: int = 150) -> models.Telemetry:
+        return self._store.get(
+            self._member(),
+            TELEMETRY,
+            f"{performance_summary_id}:{max_data_points}",
+            lambda: self._otf.get_telemetry(performance_summary_id, max_data_points),
+            _telemetry_complete,
+        )
+
+
+def _summary_complete(summary: models.PerformanceSummary) -> bool:
+    return bool(summary.calories_burned or summary.splat_points)
+
+
+def _telemetry_complete(telemetry: models.Telemetry) -> bool:
+    return bool(telemetry.telemetry)
@@ -1,17 +1,225 @@
+import time
+
+# Taken before the heavy imports so cold-start time includes them.
+STARTED_AT = time.monotonic()
+
+import asyncio  # noqa: E402
+import contextvars
+import functools
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 from typing import List, Optional, Union, Any
+
 from mcp.server.fastmcp import FastMCP
 from otf_api import Otf, OtfUser, filters, models
 from dotenv import load_dotenv
+import orjson
+import uvicorn
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+import analytics
+from batch import Batch, fan_out, unique_ids
+from history_store import HistoryOtf, HistoryStore
+from otf_cache import CachedOtf
+from otf_sessions import (
+    DEFAULT_MEMBER,
+    OtfSessionPool,
+    UnauthenticatedMemberError,
+    UnknownMemberError,
+    current_member,
+    load_members,
+    verify_member,
+)
+from pagination import paginate
+from projection import Compactor
+from readiness import Readiness, start_warm_up
+from studio_index import StudioDirectory, start_refresh
 
 load_dotenv()
 
+readiness = Readiness(STARTED_AT)
+
 # Name your server appropriately
 email = os.environ.get("OTF_EMAIL")
 password = os.environ.get("OTF_PASSWORD")
-otf = Otf(user=OtfUser(email, password))
+# One process serves many members. Requests name theirs in the MCP request
+# _meta ("otf_member"), signed by the agent with OTF_MEMBER_SECRET
+# ("otf_member_signature"); credentials come from OTF_MEMBERS_FILE, and
+# OTF_EMAIL/OTF_PASSWORD are the member of requests that name none. Each
+# member logs in on first use and their client is pooled after that.
+OTF_MEMBER_SECRET = os.environ.get("OTF_MEMBER_SECRET")
+sessions = OtfSessionPool(
+    load_members(os.environ.get("OTF_MEMBERS_FILE"), email, password),
+    lambda username, secret: Otf(user=OtfUser(username, secret)),
+    maxsize=int(os.environ.get("OTF_SESSION_POOL_SIZE", "64")),
+    idle_ttl=float(os.environ.get("OTF_SESSION_IDLE_SECONDS", "3600")),
+    max_logins=int(os.environ.get("OTF_MAX_CONCURRENT_LOGINS", "2")),
+)
+otf = sessions.client()
+# Past workouts, bookings and scans never change: with OTF_HISTORY_DB set they
+# are kept in a local SQLite file and synced from upstream incrementally.
+history = None
+if os.environ.get("OTF_HISTORY_DB"):
+    history = HistoryStore(
+        os.environ["OTF_HISTORY_DB"], sync_interval=float(os.environ.get("OTF_HISTORY_SYNC_SECONDS", "300"))
+    )
+    otf = HistoryOtf(otf, history, member=current_member.get)
+# Studio details, schedules and benchmarks change rarely but are fetched on
+# nearly every agent step; serve them from a TTL cache (see otf_cache.py).
+if os.environ.get("OTF_CACHE_ENABLED", "true").lower() == "true":
+    otf = CachedOtf(
+        otf, maxsize=int(os.environ.get("OTF_CACHE_MAX_ENTRIES", "1024")), member=current_member.get
+    )
 mcp = FastMCP("OTF API MCP Server")
+# Every studio the tools return is kept in a local directory that find_studio
+# answers from without going upstream (see studio_index.py).
+studio_directory = StudioDirectory(os.environ.get("OTF_STUDIO_DIRECTORY_FILE"))
+# Tools hand the model only the fields it needs, as compact JSON. What that
+# saves is measured on one call in OTF_COMPACT_STATS_SAMPLE per tool (0: never).
+compactor = Compactor(
+    tables=os.environ.get("OTF_COMPACT_TABLES", "true").lower() == "true",
+    stats_sample=int(os.environ.get("OTF_COMPACT_STATS_SAMPLE", "20")),
+)
+
+# otf calls block on the OTF API, so they run on a dedicated worker pool
+# instead of the event loop every SSE session shares. The pool bounds how
+# many upstream calls run at once; each tool also has its own limit, so one
+# slow endpoint can't take every worker, and a timeout.
+otf_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("OTF_MAX_CONCURRENCY", "8")), thread_name_prefix="otf"
+)
+# Batch tools fan their ids out on a pool of their own: waiting on otf_pool
+# from one of its workers could leave no worker to run the items.
+batch_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("OTF_BATCH_CONCURRENCY", "8")), thread_name_prefix="otf-batch"
+)
+OTF_ENDPOINT_CONCURRENCY = int(os.environ.get("OTF_ENDPOINT_CONCURRENCY", "4"))
+OTF_TOOL_TIMEOUT_SECONDS = float(os.environ.get("OTF_TOOL_TIMEOUT_SECONDS", "30"))
+
+
+def otf_tool(max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+    """
+    Registers a blocking otf wrapper as an MCP tool that runs on the otf pool.
+
+    At most max_concurrency calls of the tool run at once. A call that takes
+    longer than timeout seconds fails; one cancelled while still queued never
+    reaches the OTF API.
+    """
+    def decorator(fn):
+        slots = asyncio.Semaphore(max_concurrency or OTF_ENDPOINT_CONCURRENCY)
+        limit = timeout or OTF_TOOL_TIMEOUT_SECONDS
+
+        @functools.wraps(fn)
+        async def run_in_pool(*args, **kwargs):
+            # The worker thread runs the call as the requesting member.
+            context = contextvars.copy_context()
+            context.run(current_member.set, request_member())
+            await slots.acquire()
+            loop = asyncio.get_running_loop()
+            try:
+                future = otf_pool.submit(context.run, fn, *args, **kwargs)
+            except BaseException:
+                slots.release()
+                raise
+            # The slot frees only when the call really ends, so a timed-out
+            # call still running upstream keeps counting against the limit.
+            future.add_done_callback(lambda _: _release(loop, slots))
+            try:
+                # Cancelling the wait cancels the call if it hasn't started.
+                return await asyncio.wait_for(asyncio.wrap_future(future), limit)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{fn.__name__} timed out after {limit:g}s") from None
+
+        return mcp.tool()(run_in_pool)
+
+    return decorator
+
+
+def request_member() -> str:
+    """
+    Returns the member the current MCP request acts for. A named member must
+    come with the agent's signature and have credentials here.
+    """
+    meta = mcp.get_context().request_context.meta
+    member = getattr(meta, "otf_member", None)
+    if not member:
+        return DEFAULT_MEMBER
+    if not verify_member(member, getattr(meta, "otf_member_signature", None), OTF_MEMBER_SECRET):
+        raise UnauthenticatedMemberError(f"Request for member {member!r} is not authenticated")
+    if not sessions.has_member(member):
+        raise UnknownMemberError(f"No OTF credentials for member {member!r}")
+    return member
+
+
+def _release(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore):
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:
+        # The loop has shut down; nobody is waiting on the slot.
+        pass
+
+
+@mcp.custom_route("/cache/stats", methods=["GET"])
+async def cache_stats(request: Request) -> JSONResponse:
+    """
+    Returns the otf cache's hit, miss and invalidation counts.
+    """
+    if not isinstance(otf, CachedOtf):
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **otf.stats()})
+
+
+@mcp.custom_route("/history/stats", methods=["GET"])
+async def history_stats(request: Request) -> JSONResponse:
+    """
+    Returns what the history store holds and how much it fetched upstream.
+    """
+    if history is None:
+        return JSONResponse({"enabled": False})
+    return JSONResponse({"enabled": True, **history.stats()})
+
+
+@mcp.custom_route("/projection/stats", methods=["GET"])
+async def projection_stats(request: Request) -> JSONResponse:
+    """
+    Returns the bytes and estimated tokens compact tool outputs saved.
+    """
+    return JSONResponse(compactor.stats())
+
+
+@mcp.custom_route("/studios/stats", methods=["GET"])
+async def studio_stats(request: Request) -> JSONResponse:
+    """
+    Returns the size of the local studio directory and when it was refreshed.
+    """
+    return JSONResponse(studio_directory.stats())
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    """
+    Liveness: the process is up. Reports startup and warm-up timings.
+    """
+    return JSONResponse(readiness.report())
+
+
+@mcp.custom_route("/ready", methods=["GET"])
+async def ready(request: Request) -> JSONResponse:
+    """
+    Readiness: 503 while the warm-up can't log in to OTF.
+    """
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+@mcp.custom_route("/sessions/stats", methods=["GET"])
+async def session_stats(request: Request) -> JSONResponse:
+    """
+    Returns how many members are logged in and how many logins have run.
+    """
+    return JSONResponse(sessions.stats())
+
 
 # from otf_api import functions to wrap around
 @mcp.tool()
@@ -36,134 +244,202 @@ def get_date_offset(days: int) -> str:
     """
     return (date.today() + timedelta(days=days)).isoformat()
 # Booking & Class Management
-@mcp.tool()
-def get_bookings_new(start_date: Optional[Union[datetime, date, str]] = None, end_date: Optional[Union[datetime, date, str]] = None, exclude_cancelled: bool = True) -> List[models.BookingV2]:
+@otf_tool()
+def get_bookings_new(start_date: Optional[Union[datetime, date, str]] = None, end_date: Optional[Union[datetime, date, str]] = None, exclude_cancelled: bool = True, fields: Optional[List[str]] = None) -> str:
     """
     Get the bookings for the user. If no dates are provided, it will return all bookings between today and 45 days from now.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_bookings_new(start_date, end_date, exclude_cancelled)
+    return compactor.compact("get_bookings_new", otf.get_bookings_new(start_date, end_date, exclude_cancelled), fields)
 
-@mcp.tool()
-def get_booking_new(booking_id: str) -> models.BookingV2:
+@otf_tool()
+def get_booking_new(booking_id: str, fields: Optional[List[str]] = None) -> str:
     """
     Get a specific booking by booking_id.
+    For several bookings use get_booking_new_batch.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_booking_new(booking_id)
+    return compactor.compact("get_booking_new", otf.get_booking_new(booking_id), fields)
 
-@mcp.tool()
-def get_classes(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, studio_uuids: Optional[List[str]] = None, include_home_studio: Optional[bool] = None, filters_: Optional[Union[List[filters.ClassFilter], filters.ClassFilter]] = None) -> List[models.OtfClass]:
+@otf_tool()
+def get_booking_new_batch(booking_ids: List[str], fields: Optional[List[str]] = None) -> str:
+    """
+    Get several bookings by booking_id in one call, from a single fetch of the user's bookings.
+    Returns compact JSON with the bookings found as items and, per booking_id not found, an error.
+    Pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    wanted = unique_ids(booking_ids)
+    bookings = {b.booking_id: b for b in otf.get_bookings_new(None, None, False) if b.booking_id in wanted}
+    batch = Batch(
+        [bookings[i] for i in wanted if i in bookings],
+        {i: f"Booking with ID {i} not found" for i in wanted if i not in bookings},
+    )
+    return compactor.compact("get_booking_new_batch", batch, fields)
+
+@otf_tool()
+def get_classes(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, studio_uuids: Optional[List[str]] = None, include_home_studio: Optional[bool] = None, filters_: Optional[Union[List[filters.ClassFilter], filters.ClassFilter]] = None, fields: Optional[List[str]] = None) -> str:
     """
     Get classes for the given parameters.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_classes(start_date, end_date, studio_uuids, include_home_studio, filters_)
+    return compactor.compact("get_classes", otf.get_classes(start_date, end_date, studio_uuids, include_home_studio, filters_), fields)
 
-@mcp.tool()
-def get_booking(booking_uuid: str) -> models.Booking:
+@otf_tool()
+def get_booking(booking_uuid: str, fields: Optional[List[str]] = None) -> str:
     """
     Get a booking by its UUID.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_booking(booking_uuid)
+    return compactor.compact("get_booking", otf.get_booking(booking_uuid), fields)
 
-@mcp.tool()
+@otf_tool()
 def get_booking_from_class(otf_class: Union[str, models.OtfClass]) -> models.Booking:
     """
     Get a booking from a class object or class UUID.
     """
     return otf.get_booking_from_class(otf_class)
 
-@mcp.tool()
+@otf_tool()
 def get_booking_from_class_new(otf_class: Union[str, models.OtfClass, models.BookingV2Class]) -> models.BookingV2:
     """
     Get a new booking from a class object, class UUID, or BookingV2Class.
     """
     return otf.get_booking_from_class_new(otf_class)
 
-@mcp.tool()
+@otf_tool()
 def book_class(otf_class: Union[str, models.OtfClass]) -> models.Booking:
     """
     Book a class by class UUID or OtfClass object.
     """
     return otf.book_class(otf_class)
 
-@mcp.tool()
+@otf_tool()
 def book_class_new(class_id: str) -> models.BookingV2:
     """
     Book a class using the new booking system by class ID.
     """
     return otf.book_class_new(class_id)
 
-@mcp.tool()
+@otf_tool()
 def cancel_booking(booking: Union[str, models.Booking]) -> None:
     """
     Cancel a booking by booking UUID or Booking object.
     """
     return otf.cancel_booking(booking)
 
-@mcp.tool()
+@otf_tool()
 def cancel_booking_new(booking_id: str) -> None:
     """
     Cancel a booking using the new booking system by booking UUID.
     """
     return otf.cancel_booking_new(booking_id)
 
-@mcp.tool()
-def get_bookings(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, status: Optional[Union[models.BookingStatus, List[models.BookingStatus]]] = None, exclude_cancelled: bool = True, exclude_checkedin: bool = True) -> List[models.Booking]:
+@otf_tool()
+def get_bookings(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, status: Optional[Union[models.BookingStatus, List[models.BookingStatus]]] = None, exclude_cancelled: bool = True, exclude_checkedin: bool = True, fields: Optional[List[str]] = None) -> str:
     """
     Get bookings with optional filters for date, status, and exclusion flags.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_bookings(start_date, end_date, status, exclude_cancelled, exclude_checkedin)
+    return compactor.compact("get_bookings", otf.get_bookings(start_date, end_date, status, exclude_cancelled, exclude_checkedin), fields)
 
-@mcp.tool()
-def get_historical_bookings() -> List[models.Booking]:
+@otf_tool(max_concurrency=2, timeout=60)
+def get_historical_bookings(fields: Optional[List[str]] = None) -> str:
     """
     Get all historical bookings for the user.
+    For long histories prefer get_historical_bookings_page.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_historical_bookings()
+    return compactor.compact("get_historical_bookings", otf.get_historical_bookings(), fields)
+
+@otf_tool(max_concurrency=2, timeout=60)
+def get_historical_bookings_page(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+    """
+    Get one page of the user's past bookings, newest first, optionally between start_date and end_date.
+    Pass the returned next_cursor back as cursor for the next page.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    return compactor.compact("get_historical_bookings_page", paginate("get_historical_bookings", otf.get_historical_bookings(), start_date, end_date, limit, cursor), fields)
 
 # Studio Search & Management
-@mcp.tool()
-def get_studio_detail(studio_uuid: Optional[str] = None) -> models.StudioDetail:
+@otf_tool()
+def get_studio_detail(studio_uuid: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
     """
     Get details for a specific studio by UUID.
+    For several studios use get_studio_details.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_studio_detail(studio_uuid)
+    studio = otf.get_studio_detail(studio_uuid)
+    studio_directory.add(studio)
+    return compactor.compact("get_studio_detail", studio, fields)
 
-@mcp.tool()
-def get_studios_by_geo(latitude: Optional[float] = None, longitude: Optional[float] = None) -> List[models.StudioDetail]:
+@otf_tool(max_concurrency=2, timeout=60)
+def get_studio_details(studio_uuids: List[str], fields: Optional[List[str]] = None) -> str:
+    """
+    Get details for several studios by UUID in one call, e.g. every favorite studio.
+    Returns compact JSON with the studios as items and, per UUID that failed, an error.
+    Pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    batch = fan_out(batch_pool, otf.get_studio_detail, studio_uuids)
+    studio_directory.add(batch.items)
+    return compactor.compact("get_studio_details", batch, fields)
+
+@otf_tool()
+def get_studios_by_geo(latitude: Optional[float] = None, longitude: Optional[float] = None, fields: Optional[List[str]] = None) -> str:
     """
     Get studios by geographic coordinates.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_studios_by_geo(latitude, longitude)
+    studios = otf.get_studios_by_geo(latitude, longitude)
+    studio_directory.add(studios, (latitude, longitude, 50))
+    return compactor.compact("get_studios_by_geo", studios, fields)
 
-@mcp.tool()
-def search_studios_by_geo(latitude: Optional[float] = None, longitude: Optional[float] = None, distance: int = 50) -> List[models.StudioDetail]:
+@otf_tool()
+def search_studios_by_geo(latitude: Optional[float] = None, longitude: Optional[float] = None, distance: int = 50, fields: Optional[List[str]] = None) -> str:
     """
     Search for studios by geographic coordinates and distance.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.search_studios_by_geo(latitude, longitude, distance)
+    studios = otf.search_studios_by_geo(latitude, longitude, distance)
+    studio_directory.add(studios, (latitude, longitude, distance))
+    return compactor.compact("search_studios_by_geo", studios, fields)
 
 @mcp.tool()
-def get_favorite_studios() -> List[models.StudioDetail]:
+def find_studio(query: Optional[str] = None, latitude: Optional[float] = None, longitude: Optional[float] = None, radius_miles: Optional[float] = None, limit: int = 5) -> str:
+    """
+    Find studios in the local studio directory, without calling the OTF API.
+    Pass query to match a studio's name or address (e.g. "Manhattan-West Village"), latitude and longitude for the
+    nearest studios (optionally within radius_miles), or both for matches near a point.
+    Returns JSON with the studios (UUID, name, address, location, distance_miles, match score). If it finds nothing,
+    fall back to search_studios_by_geo.
+    """
+    studios = studio_directory.find(query, latitude, longitude, radius_miles, limit)
+    return orjson.dumps({"studios": studios, "directory_size": len(studio_directory)}).decode()
+
+@otf_tool()
+def get_favorite_studios(fields: Optional[List[str]] = None) -> str:
     """
     Get the user's favorite studios.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
     """
-    return otf.get_favorite_studios()
+    studios = otf.get_favorite_studios()
+    studio_directory.add(studios)
+    return compactor.compact("get_favorite_studios", studios, fields)
 
-@mcp.tool()
+@otf_tool()
 def add_favorite_studio(studio_uuids: Union[List[str], str]) -> List[models.StudioDetail]:
     """
     Add one or more studios to the user's favorites.
     """
     return otf.add_favorite_studio(studio_uuids)
 
-@mcp.tool()
+@otf_tool()
 def remove_favorite_studio(studio_uuids: Union[List[str], str]) -> None:
     """
     Remove one or more studios from the user's favorites.
     """
     return otf.remove_favorite_studio(studio_uuids)
 
-@mcp.tool()
+@otf_tool()
 def get_studio_services(studio_uuid: Optional[str] = None) -> List[models.StudioService]:
     """
     Get services offered by a specific studio.
@@ -171,99 +447,199 @@ def get_studio_services(studio_uuid: Optional[str] = None) -> List[models.Studio
     return otf.get_studio_services(studio_uuid)
 
 # Stats & Performance
-@mcp.tool()
+@otf_tool()
 def get_member_lifetime_stats_in_studio(select_time: models.StatsTime = models.StatsTime.AllTime) -> models.InStudioStatsData:
     """
     Get the user's in-studio lifetime stats for a selected time period.
     """
     return otf.get_member_lifetime_stats_in_studio(select_time)
 
-@mcp.tool()
+@otf_tool()
 def get_member_lifetime_stats_out_of_studio(select_time: models.StatsTime = models.StatsTime.AllTime) -> models.OutStudioStatsData:
     """
     Get the user's out-of-studio lifetime stats for a selected time period.
     """
     return otf.get_member_lifetime_stats_out_of_studio(select_time)
 
-@mcp.tool()
+@otf_tool()
 def get_performance_summary(performance_summary_id: str) -> models.PerformanceSummary:
     """
     Get a performance summary by its ID.
+    For several IDs use get_performance_summaries.
     """
     return otf.get_performance_summary(performance_summary_id)
 
-@mcp.tool()
+@otf_tool(max_concurrency=2, timeout=60)
+def get_performance_summaries(performance_summary_ids: List[str], fields: Optional[List[str]] = None) -> str:
+    """
+    Get several performance summaries by ID in one call, e.g. for the last ten workouts.
+    Returns JSON with the summaries as items and, per ID that failed, an error.
+    Pass fields (dotted paths) to pick fields.
+    """
+    return compactor.compact("get_performance_summaries", fan_out(batch_pool, otf.get_performance_summary, performance_summary_ids), fields)
+
+@otf_tool(max_concurrency=2, timeout=60)
 def get_hr_history() -> List[models.TelemetryHistoryItem]:
     """
     Get the user's heart rate history.
+    For long histories prefer get_hr_history_page.
     """
     return otf.get_hr_history()
 
-@mcp.tool()
+@otf_tool(max_concurrency=2, timeout=60)
+def get_hr_history_page(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+    """
+    Get one page of the user's heart rate history, newest first, optionally between start_date and end_date.
+    Pass the returned next_cursor back as cursor for the next page.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    return compactor.compact("get_hr_history_page", paginate("get_hr_history", otf.get_hr_history(), start_date, end_date, limit, cursor), fields)
+
+@otf_tool(max_concurrency=2, timeout=60)
 def get_telemetry(performance_summary_id: str, max_data_points: int = 150) -> models.Telemetry:
     """
     Get telemetry data for a performance summary.
+    For several IDs use get_telemetry_batch.
     """
     return otf.get_telemetry(performance_summary_id, max_data_points)
 
-@mcp.tool()
+@otf_tool(max_concurrency=2, timeout=60)
+def get_telemetry_batch(performance_summary_ids: List[str], max_data_points: int = 150, fields: Optional[List[str]] = None) -> str:
+    """
+    Get telemetry data for several performance summaries in one call.
+    Returns JSON with the telemetry as items and, per ID that failed, an error.
+    Pass fields (dotted paths) to pick fields.
+    """
+    batch = fan_out(batch_pool, lambda i: otf.get_telemetry(i, max_data_points), performance_summary_ids)
+    return compactor.compact("get_telemetry_batch", batch, fields)
+
+@otf_tool()
 def get_body_composition_list() -> List[models.BodyCompositionData]:
     """
     Get the user's body composition data.
+    For long histories prefer get_body_composition_list_page.
     """
     return otf.get_body_composition_list()
 
-@mcp.tool()
+@otf_tool()
+def get_body_composition_list_page(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+    """
+    Get one page of the user's body composition scans, newest first, optionally between start_date and end_date.
+    Pass the returned next_cursor back as cursor for the next page.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    return compactor.compact("get_body_composition_list_page", paginate("get_body_composition_list", otf.get_body_composition_list(), start_date, end_date, limit, cursor), fields)
+
+@otf_tool(max_concurrency=2, timeout=60)
 def get_out_of_studio_workout_history() -> List[models.OutOfStudioWorkoutHistory]:
     """
     Get the user's out-of-studio workout history.
+    For long histories prefer get_out_of_studio_workout_history_page.
     """
     return otf.get_out_of_studio_workout_history()
 
+@otf_tool(max_concurrency=2, timeout=60)
+def get_out_of_studio_workout_history_page(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+    """
+    Get one page of the user's out-of-studio workouts, newest first, optionally between start_date and end_date.
+    Pass the returned next_cursor back as cursor for the next page.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    return compactor.compact("get_out_of_studio_workout_history_page", paginate("get_out_of_studio_workout_history", otf.get_out_of_studio_workout_history(), start_date, end_date, limit, cursor), fields)
+
+# Workout Analytics
+# Computed here over all the workouts in the range so the model gets a small
+# summary instead of raw workouts to do arithmetic on.
+@otf_tool(max_concurrency=2, timeout=60)
+def get_workout_trend(metric: str = "splat_points", period: str = "week", window: int = 4, start_date: Optional[date] = None, end_date: Optional[date] = None) -> str:
+    """
+    Get how a workout metric trended per week or month (period) between start_date and end_date (default: the last 90 days).
+    Returns per-period workout count, total and mean, a rolling mean over window periods and the trend of the mean per period.
+    Metrics: calories, splat_points, steps, active_minutes, avg_hr, peak_hr, treadmill_distance, treadmill_avg_speed,
+    treadmill_elevation, rower_distance, rower_avg_speed, rower_avg_power.
+    """
+    analytics.check(metric, period)
+    start, end = analytics.date_range(start_date, end_date)
+    frame = analytics.WorkoutFrame(otf.get_workouts(start, end), [metric])
+    return orjson.dumps(analytics.trend(frame, metric, period, window)).decode()
+
+@otf_tool(max_concurrency=2, timeout=60)
+def get_workout_percentiles(metric: str = "splat_points", percentiles: Optional[List[float]] = None, start_date: Optional[date] = None, end_date: Optional[date] = None) -> str:
+    """
+    Get the min, max, mean, standard deviation and percentiles (default 10, 25, 50, 75, 90) of a workout metric
+    between start_date and end_date (default: the last 90 days). Metrics are those of get_workout_trend.
+    """
+    analytics.check(metric)
+    start, end = analytics.date_range(start_date, end_date)
+    frame = analytics.WorkoutFrame(otf.get_workouts(start, end), [metric])
+    return orjson.dumps(analytics.percentiles(frame, metric, percentiles or (10, 25, 50, 75, 90))).decode()
+
+@otf_tool(max_concurrency=2, timeout=60)
+def get_hr_zone_distribution(start_date: Optional[date] = None, end_date: Optional[date] = None, period: Optional[str] = None) -> str:
+    """
+    Get the time spent in each heart-rate zone (gray, blue, green, orange, red) between start_date and end_date
+    (default: the last 90 days): total minutes, share of zone time and average per workout.
+    Pass period ("week" or "month") to also get minutes per zone per period.
+    """
+    analytics.check(period=period)
+    start, end = analytics.date_range(start_date, end_date)
+    frame = analytics.WorkoutFrame(otf.get_workouts(start, end))
+    return orjson.dumps(analytics.zone_distribution(frame, period)).decode()
+
 # Challenge & Benchmarks
-@mcp.tool()
+@otf_tool()
 def get_challenge_tracker() -> models.ChallengeTracker:
     """
     Get the user's challenge tracker data.
     """
     return otf.get_challenge_tracker()
 
-@mcp.tool()
+@otf_tool()
 def get_benchmarks(challenge_category_id: int = 0, equipment_id: Union[models.EquipmentType, int] = 0, challenge_subcategory_id: int = 0) -> List[models.FitnessBenchmark]:
     """
     Get fitness benchmarks for the user.
     """
     return otf.get_benchmarks(challenge_category_id, equipment_id, challenge_subcategory_id)
 
-@mcp.tool()
+@otf_tool()
 def get_benchmarks_by_equipment(equipment_id: models.EquipmentType) -> List[models.FitnessBenchmark]:
     """
     Get fitness benchmarks by equipment type.
     """
     return otf.get_benchmarks_by_equipment(equipment_id)
 
-@mcp.tool()
+@otf_tool()
 def get_benchmarks_by_challenge_category(challenge_category_id: int) -> List[models.FitnessBenchmark]:
     """
     Get fitness benchmarks by challenge category.
     """
     return otf.get_benchmarks_by_challenge_category(challenge_category_id)
 
-@mcp.tool()
+@otf_tool()
 def get_challenge_tracker_detail(challenge_category_id: int) -> models.FitnessBenchmark:
     """
     Get challenge tracker detail for a specific challenge category.
     """
     return otf.get_challenge_tracker_detail(challenge_category_id)
 
-@mcp.tool()
+@otf_tool(max_concurrency=2, timeout=60)
 def get_member_purchases() -> List[models.MemberPurchase]:
     """
     Get the user's purchase history.
+    For long histories prefer get_member_purchases_page.
     """
     return otf.get_member_purchases()
 
-@mcp.tool()
+@otf_tool(max_concurrency=2, timeout=60)
+def get_member_purchases_page(start_date: Optional[Union[date, str]] = None, end_date: Optional[Union[date, str]] = None, limit: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> str:
+    """
+    Get one page of the user's purchases, newest first, optionally between start_date and end_date.
+    Pass the returned next_cursor back as cursor for the next page.
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    return compactor.compact("get_member_purchases_page", paginate("get_member_purchases", otf.get_member_purchases(), start_date, end_date, limit, cursor), fields)
+
+@otf_tool()
 def get_member_services(active_only: bool = True) -> Any:
     """
     Get the user's member services, optionally filtering for active only.
@@ -272,13 +648,54 @@ def get_member_services(active_only: bool = True) -> Any:
 
 
 
-@mcp.tool()
-def get_favroite_studios_info() -> List[models.StudioDetail]:
+@otf_tool()
+def get_favroite_studios_info(fields: Optional[List[str]] = None) -> str:
     """
     Get favorite studios (optionally near a location).
+    Returns compact JSON; pass fields (dotted paths) to pick other fields, or ["*"] for all.
+    """
+    return compactor.compact("get_favroite_studios_info", otf.get_favorite_studios(), fields)
+
+
+
+# Log in the default member and prefetch what nearly every conversation asks
+# for, without holding up startup. Spelled like the tools' calls above so the
+# results land in the otf cache.
+if sessions.has_member(DEFAULT_MEMBER) and os.environ.get("OTF_WARM_UP", "true").lower() == "true":
+    start_warm_up(readiness, [
+        lambda: otf.get_studio_detail(None),
+        lambda: otf.get_favorite_studios(),
+        lambda: otf.get_bookings_new(None, None, True),
+    ])
+
+# Keep the studio directory fresh by repeating the geo searches members ran,
+# as the default member. The method is looked up on every refresh: reading it
+# here would log in at import, and pin a client the pool may later close.
+if sessions.has_member(DEFAULT_MEMBER) and os.environ.get("OTF_STUDIO_DIRECTORY_REFRESH", "true").lower() == "true":
+    start_refresh(
+        studio_directory,
+        lambda latitude, longitude, distance: otf.search_studios_by_geo(latitude, longitude, distance),
+        float(os.environ.get("OTF_STUDIO_DIRECTORY_REFRESH_SECONDS", "86400")),
+    )
+
+
+class ReadinessServer(uvicorn.Server):
+    """
+    Marks the server as serving once the SSE port is bound, so the startup
+    figure covers everything up to the first request it could answer.
     """
-    return otf.get_favorite_studios()
 
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if self.started:
+            readiness.serving()
 
 
-mcp.run(transport="sse")
\ No newline at end of file
+# Same as mcp.run(transport="sse"), with the hook above.
+server = ReadinessServer(uvicorn.Config(
+    mcp.sse_app(),
+    host=mcp.settings.host,
+    port=mcp.settings.port,
+    log_level=mcp.settings.log_level.lower(),
+))
+asyncio.run(server.serve())
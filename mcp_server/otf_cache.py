@@ -0,0 +1,252 @@
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    How long an otf method's results stay fresh, and how much longer a stale
+    result may still be served while it is refreshed in the background.
+    Results of a shared method are the same for every member, as long as all
+    its arguments are given; a missing one falls back to the member's home
+    studio or location.
+    """
+
+    ttl: float
+    group: str
+    stale_ttl: float = 0.0
+    shared: bool = False
+
+
+# otf method -> policy. Methods not listed are never cached.
+POLICIES: Dict[str, CachePolicy] = {
+    # Studio data barely changes.
+    "get_studio_detail": CachePolicy(DAY, "studios", shared=True),
+    "get_studio_services": CachePolicy(DAY, "studios", shared=True),
+    "search_studios_by_geo": CachePolicy(DAY, "studios", shared=True),
+    "get_studios_by_geo": CachePolicy(DAY, "studios", shared=True),
+    # Schedules change slowly; a slightly old one beats waiting on the API.
+    "get_classes": CachePolicy(MINUTE, "classes", stale_ttl=10 * MINUTE),
+    "get_favorite_studios": CachePolicy(10 * MINUTE, "favorites"),
+    "get_bookings_new": CachePolicy(30, "bookings"),
+    # Paged history tools read these once per page.
+    "get_historical_bookings": CachePolicy(10 * MINUTE, "bookings"),
+    "get_out_of_studio_workout_history": CachePolicy(HOUR, "stats"),
+    "get_member_purchases": CachePolicy(HOUR, "account"),
+    "get_booking_new": CachePolicy(30, "bookings"),
+    "get_bookings": CachePolicy(30, "bookings"),
+    "get_booking": CachePolicy(30, "bookings"),
+    # Benchmarks and challenges only move after a workout.
+    "get_benchmarks": CachePolicy(HOUR, "challenges"),
+    "get_benchmarks_by_equipment": CachePolicy(HOUR, "challenges"),
+    "get_benchmarks_by_challenge_category": CachePolicy(HOUR, "challenges"),
+    "get_challenge_tracker": CachePolicy(HOUR, "challenges"),
+    "get_challenge_tracker_detail": CachePolicy(HOUR, "challenges"),
+    "get_member_lifetime_stats_in_studio": CachePolicy(10 * MINUTE, "stats"),
+    "get_member_lifetime_stats_out_of_studio": CachePolicy(10 * MINUTE, "stats"),
+    "get_hr_history": CachePolicy(HOUR, "stats"),
+    "get_body_composition_list": CachePolicy(HOUR, "stats"),
+    "get_member_services": CachePolicy(HOUR, "account"),
+    # A finished workout's summary and telemetry never change.
+    "get_performance_summary": CachePolicy(DAY, "workouts"),
+    "get_telemetry": CachePolicy(DAY, "workouts"),
+    # Workouts of a date range, with summaries and telemetry; the analytics
+    # tools read them once per question.
+    "get_workouts": CachePolicy(10 * MINUTE, "workouts"),
+}
+
+# Mutating otf method -> groups whose cached results it makes stale. Classes
+# carry booking counts, so booking changes drop schedules too.
+INVALIDATIONS: Dict[str, tuple] = {
+    "book_class": ("bookings", "classes"),
+    "book_class_new": ("bookings", "classes"),
+    "cancel_booking": ("bookings", "classes"),
+    "cancel_booking_new": ("bookings", "classes"),
+    "add_favorite_studio": ("favorites",),
+    "remove_favorite_studio": ("favorites",),
+}
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+    policy: CachePolicy
+
+
+@dataclass
+class _Fetch:
+    method: Callable
+    policy: CachePolicy
+    args: tuple
+    kwargs: dict
+    # Group generation when the fetch started.
+    generation: int
+    future: Future = field(default_factory=Future)
+
+
+class CachedOtf:
+    """
+    Read-through cache in front of an ``Otf`` client.
+
+    Methods listed in ``POLICIES`` are served from a bounded LRU until their
+    TTL runs out. Concurrent misses on the same call share one upstream
+    request. Within ``stale_ttl`` after expiry the old result is returned
+    at once and refreshed on a background thread. Mutating methods in
+    ``INVALIDATIONS`` drop the groups they affect, including results still
+    being fetched. Everything else passes straight through to the client.
+
+    ``member`` names whose account the client currently acts for; results
+    are cached per member unless their policy is shared.
+    """
+
+    def __init__(
+        self,
+        otf,
+        policies: Dict[str, CachePolicy] = POLICIES,
+        maxsize: int = 1024,
+        member: Callable[[], str] = lambda: "",
+    ):
+        self._otf = otf
+        self._policies = policies
+        self._member = member
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+        self._inflight: Dict[tuple, _Fetch] = {}
+        # group -> invalidation count, so a fetch that raced an invalidation
+        # isn't stored.
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="otf-cache")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.invalidations = 0
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._otf, name)
+        if not callable(attr):
+            return attr
+        if name in INVALIDATIONS:
+            return self._invalidating(name, attr)
+        policy = self._policies.get(name)
+        if policy is None:
+            return attr
+
+        def cached(*args, **kwargs):
+            return self._call(name, attr, policy, args, kwargs)
+
+        return cached
+
+    def invalidate(self, groups) -> None:
+        with self._lock:
+            for group in groups:
+                self._generations[group] = self._generations.get(group, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry.policy.group in groups]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "invalidations": self.invalidations,
+            "entries": entries,
+            "maxsize": self._entries.maxsize,
+        }
+
+    def _invalidating(self, name: str, method: Callable) -> Callable:
+        def call(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                # Even a failed call may have changed something upstream.
+                self.invalidate(INVALIDATIONS[name])
+
+        return call
+
+    def _call(self, name: str, method: Callable, policy: CachePolicy, args: tuple, kwargs: dict):
+        arguments = self._arguments(method, args, kwargs)
+        shared = policy.shared and None not in arguments.values()
+        key = (name, "" if shared else self._member(), repr(sorted(arguments.items())))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age < policy.ttl:
+                    self.hits += 1
+                    return entry.value
+                if age < policy.ttl + policy.stale_ttl:
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        fetch = self._start(key, method, policy, args, kwargs)
+                        self._refresher.submit(self._refresh, key, fetch)
+                    return entry.value
+            self.misses += 1
+            fetch = self._inflight.get(key)
+            owner = fetch is None
+            if owner:
+                fetch = self._start(key, method, policy, args, kwargs)
+        if owner:
+            self._run(key, fetch)
+        return fetch.future.result()
+
+    @staticmethod
+    def _arguments(method: Callable, args: tuple, kwargs: dict) -> Dict[str, Any]:
+        # Every spelling of a call (positional, keyword, defaults left out)
+        # maps to the same entry.
+        try:
+            bound = inspect.signature(method).bind(*args, **kwargs)
+        except (TypeError, ValueError):
+            return {"args": args, **kwargs}
+        bound.apply_defaults()
+        return dict(bound.arguments)
+
+    def _start(self, key, method, policy, args, kwargs) -> _Fetch:
+        fetch = _Fetch(method, policy, args, kwargs, self._generations.get(policy.group, 0))
+        self._inflight[key] = fetch
+        return fetch
+
+    def _refresh(self, key: tuple, fetch: _Fetch):
+        self.refreshes += 1
+        if not self._run(key, fetch):
+            self.refresh_errors += 1
+
+    def _run(self, key: tuple, fetch: _Fetch) -> bool:
+        try:
+            value = fetch.method(*fetch.args, **fetch.kwargs)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fetch.future.set_exception(e)
+            logger.warning(f"otf {key[0]} failed: {e}")
+            return False
+        with self._lock:
+            self._inflight.pop(key, None)
+            if self._generations.get(fetch.policy.group, 0) == fetch.generation:
+                self._entries[key] = _Entry(value, time.monotonic(), fetch.policy)
+        fetch.future.set_result(value)
+        return True
@@ -0,0 +1,181 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMBER = "default"
+
+# The member the request being served acts for. Set by the tool wrapper and
+# carried onto the worker thread that runs the otf call.
+current_member: ContextVar[str] = ContextVar("current_member", default=DEFAULT_MEMBER)
+
+
+class UnknownMemberError(LookupError):
+    pass
+
+
+class UnauthenticatedMemberError(PermissionError):
+    pass
+
+
+def member_signature(member: str, secret: str) -> str:
+    """
+    HMAC-SHA256 of the member id under the secret the agent shares with
+    this server (OTF_MEMBER_SECRET).
+    """
+    return hmac.new(secret.encode(), member.encode(), hashlib.sha256).hexdigest()
+
+
+def verify_member(member: str, signature: Optional[str], secret: Optional[str]) -> bool:
+    """
+    Whether ``signature`` proves the agent authenticated ``member``. Without
+    a shared secret no named member can be verified.
+    """
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(member_signature(member, secret), signature)
+
+
+def load_members(path: Optional[str], email: Optional[str] = None, password: Optional[str] = None) -> Dict[str, Tuple[str, str]]:
+    """
+    Reads member credentials from a JSON file of
+    {"<member>": {"email": ..., "password": ...}}. OTF_EMAIL and OTF_PASSWORD,
+    when set, become the default member used by requests that name none.
+    """
+    members: Dict[str, Tuple[str, str]] = {}
+    if email and password:
+        members[DEFAULT_MEMBER] = (email, password)
+    if path:
+        with open(path) as f:
+            for member, creds in json.load(f).items():
+                members[member] = (creds["email"], creds["password"])
+    return members
+
+
+class OtfSessionPool:
+    """
+    Authenticated ``Otf`` clients for many members in one process.
+
+    A member's client is created on their first request and reused after
+    that; its Cognito auth renews the tokens as they expire. Clients idle for
+    longer than ``idle_ttl`` and the least recently used ones beyond
+    ``maxsize`` are dropped. Concurrent requests for a member who isn't logged
+    in yet share one login, and at most ``max_logins`` logins run at once so a
+    burst of new members doesn't hammer Cognito.
+    """
+
+    def __init__(
+        self,
+        members: Dict[str, Tuple[str, str]],
+        factory: Callable[[str, str], Any],
+        maxsize: int = 64,
+        idle_ttl: float = 3600.0,
+        max_logins: int = 2,
+    ):
+        self._members = members
+        self._factory = factory
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        # member -> (client, last used)
+        self._clients: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._logins: Dict[str, Future] = {}
+        self._login_slots = threading.BoundedSemaphore(max_logins)
+        self._lock = threading.Lock()
+        self.logins = 0
+        self.login_errors = 0
+        self.evictions = 0
+
+    def get(self, member: str) -> Any:
+        if member not in self._members:
+            raise UnknownMemberError(f"No OTF credentials for member {member!r}")
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(member)
+            if entry is not None:
+                self._clients[member] = (entry[0], now)
+                self._clients.move_to_end(member)
+                return entry[0]
+            login = self._logins.get(member)
+            owner = login is None
+            if owner:
+                login = self._logins[member] = Future()
+        if owner:
+            self._login(member, login)
+        return login.result()
+
+    def has_member(self, member: str) -> bool:
+        return member in self._members
+
+    def client(self) -> "MemberOtf":
+        """
+        Returns a stand-in for ``Otf`` that acts for ``current_member``.
+        """
+        return MemberOtf(self)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = len(self._clients)
+            pending = len(self._logins)
+        return {
+            "members": len(self._members),
+            "active": active,
+            "pending_logins": pending,
+            "logins": self.logins,
+            "login_errors": self.login_errors,
+            "evictions": self.evictions,
+            "maxsize": self.maxsize,
+        }
+
+    def _login(self, member: str, login: Future):
+        email, password = self._members[member]
+        try:
+            with self._login_slots:
+                client = self._factory(email, password)
+        except Exception as e:
+            self.login_errors += 1
+            with self._lock:
+                self._logins.pop(member, None)
+            logger.warning(f"OTF login for member {member!r} failed: {e}")
+            login.set_exception(e)
+            return
+        self.logins += 1
+        with self._lock:
+            self._logins.pop(member, None)
+            self._clients[member] = (client, time.monotonic())
+            while len(self._clients) > self.maxsize:
+                _, (evicted, _) = self._clients.popitem(last=False)
+                self._close(evicted)
+        login.set_result(client)
+
+    def _evict_idle(self, now: float):
+        idle = [m for m, (_, used) in self._clients.items() if now - used > self.idle_ttl]
+        for member in idle:
+            client, _ = self._clients.pop(member)
+            self._close(client)
+
+    def _close(self, client: Any):
+        self.evictions += 1
+        session = getattr(client, "session", None)
+        if session is not None:
+            session.close()
+
+
+class MemberOtf:
+    """
+    Forwards otf calls to the pooled client of the member being served.
+    """
+
+    def __init__(self, pool: OtfSessionPool):
+        self._pool = pool
+
+    def __getattr__(self, name: str):
+        return getattr(self._pool.get(current_member.get()), name)
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import heapq
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import orjson
+from pydantic import BaseModel
+
+MAX_PAGE_SIZE = 100
+
+
+@dataclass(frozen=True)
+class HistorySpec:
+    """
+    Where a history record keeps its date and, if it has one, its unique id
+    (attribute paths on the otf_api model). Records without an id are told
+    apart by a hash of their contents.
+    """
+
+    date: str
+    id: Optional[str] = None
+
+
+# otf method -> how to order and filter what it returns.
+HISTORIES: Dict[str, HistorySpec] = {
+    "get_historical_bookings": HistorySpec("otf_class.starts_at", "booking_uuid"),
+    "get_hr_history": HistorySpec("assigned_at"),
+    "get_out_of_studio_workout_history": HistorySpec("workout_date", "workout_uuid"),
+    "get_member_purchases": HistorySpec("purchase_date_time", "purchase_uuid"),
+    "get_body_composition_list": HistorySpec("scan_datetime", "scan_result_uuid"),
+}
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str]
+    # Records in the date range, across all pages.
+    matched: int
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def _attr(item: Any, path: str) -> Any:
+    for name in path.split("."):
+        item = getattr(item, name, None)
+    return item
+
+
+def _naive(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return None
+
+
+def _day(value: Union[date, str, None]) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _fingerprint(item: Any) -> str:
+    data = item.model_dump(mode="json") if isinstance(item, BaseModel) else item
+    return hashlib.blake2b(orjson.dumps(data, default=str, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+
+def _encode(state: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(state)).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> Dict[str, Any]:
+    try:
+        state = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError as e:
+        raise InvalidCursorError("cursor is not one this server returned") from e
+    if not isinstance(state, dict) or "a" not in state:
+        raise InvalidCursorError("cursor is not one this server returned")
+    return state
+
+
+def paginate(
+    method: str,
+    items: List[Any],
+    start_date: Union[date, str, None] = None,
+    end_date: Union[date, str, None] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    Returns one page of a history, newest first.
+
+    The cursor holds the date range and the sort key of the last record
+    returned, so the next page starts right after it even if records were
+    added in the meantime. The key is (date, id, n): records without an id
+    use a hash of their contents instead, and n counts earlier records with
+    the same date and id, so records sharing a timestamp are neither
+    skipped nor repeated. Only the page's records (and those in the range
+    without an id) are serialized, however long the history is.
+    """
+    spec = HISTORIES[method]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after: Optional[Tuple[Any, ...]] = None
+    if cursor:
+        state = _decode(cursor)
+        if state.get("m") != method:
+            raise InvalidCursorError(f"cursor belongs to {state.get('m')}, not {method}")
+        start_date, end_date = state.get("s"), state.get("e")
+        after = tuple(state["a"])
+    start, end = _day(start_date), _day(end_date)
+
+    seen: Dict[Tuple[str, str], int] = {}
+    matched = 0
+    candidates = []
+    for item in items:
+        when = _naive(_attr(item, spec.date))
+        if start or end:
+            if when is None:
+                continue
+            day = when.date()
+            if (start and day < start) or (end and day > end):
+                continue
+        matched += 1
+        record_id = _attr(item, spec.id) if spec.id else None
+        # Undated records sort oldest.
+        base = (when.isoformat() if when else "", str(record_id) if record_id else _fingerprint(item))
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        item_key = (*base, n)
+        if after is None or item_key < after:
+            candidates.append((item_key, item))
+
+    page = heapq.nlargest(limit + 1, candidates, key=lambda candidate: candidate[0])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = _encode({
+            "m": method,
+            "s": start.isoformat() if start else None,
+            "e": end.isoformat() if end else None,
+            "a": list(page[-1][0]),
+        })
+    return Page([item for _, item in page], next_cursor, matched)
@@ -0,0 +1,238 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import orjson
+from pydantic import BaseModel
+
+from batch import Batch
+from pagination import Page
+
+logger = logging.getLogger(__name__)
+
+# Rough bytes per LLM token for JSON, to estimate what compaction saves.
+BYTES_PER_TOKEN = 4
+
+ALL_FIELDS = "*"
+
+_BOOKING_V2 = (
+    "id",
+    "checked_in",
+    "canceled",
+    "class.id",
+    "class.name",
+    "class.type",
+    "class.starts_at_local",
+    "class.coach",
+    "class.studio.id",
+    "class.studio.name",
+    "workout.calories_burned",
+    "workout.splat_points",
+)
+_BOOKING = (
+    "classBookingUUId",
+    "status",
+    "bookedDate",
+    "checkedInDate",
+    "cancelledDate",
+    "waitlistPosition",
+    "class.classUUId",
+    "class.name",
+    "class.startDateTime",
+    "class.coach.firstName",
+    "class.studio.studioUUId",
+    "class.studio.studioName",
+)
+_STUDIO = (
+    "studioUUId",
+    "studioName",
+    "distance",
+    "studioStatus",
+    "timeZone",
+    "studioLocation.address_line1",
+    "studioLocation.city",
+    "studioLocation.state",
+    "studioLocation.phone_number",
+    "studioLocation.latitude",
+    "studioLocation.longitude",
+)
+_CLASS = (
+    "id",
+    "name",
+    "type",
+    "coach",
+    "starts_at_local",
+    "ends_at_local",
+    "studio.studioUUId",
+    "studio.studioName",
+    "booking_capacity",
+    "max_capacity",
+    "full",
+    "waitlist_available",
+    "waitlist_size",
+    "is_booked",
+)
+
+# Tool -> dotted paths (by alias, as FastMCP dumps otf_api models) that are
+# returned when the caller doesn't ask for specific fields.
+FIELDS: Dict[str, Sequence[str]] = {
+    "get_bookings_new": _BOOKING_V2,
+    "get_booking_new": _BOOKING_V2,
+    "get_booking_new_batch": _BOOKING_V2,
+    "get_bookings": _BOOKING,
+    "get_booking": _BOOKING,
+    "get_historical_bookings": _BOOKING,
+    "get_historical_bookings_page": _BOOKING,
+    "get_classes": _CLASS,
+    "get_studio_detail": _STUDIO,
+    "get_studio_details": _STUDIO,
+    "get_studios_by_geo": _STUDIO,
+    "search_studios_by_geo": _STUDIO,
+    "get_favorite_studios": _STUDIO,
+    "get_favroite_studios_info": _STUDIO,
+}
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, (list, tuple)):
+        return [_dump(item) for item in value]
+    return value
+
+
+def _get(data: Any, path: List[str]) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _project(item: Any, paths: List[List[str]]) -> Any:
+    if not isinstance(item, dict):
+        return item
+    projected: Dict[str, Any] = {}
+    for path in paths:
+        value = _get(item, path)
+        if value is None:
+            continue
+        node = projected
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return projected
+
+
+def _table(rows: List[dict], columns: Iterable[str]) -> Dict[str, Any]:
+    # One header instead of repeating every key in every row; columns no row
+    # has a value for are left out.
+    paths = [column.split(".") for column in columns]
+    values = [[_get(row, path) for path in paths] for row in rows]
+    keep = [i for i in range(len(paths)) if any(row[i] is not None for row in values)]
+    return {
+        "columns": [".".join(paths[i]) for i in keep],
+        "rows": [[row[i] for i in keep] for row in values],
+    }
+
+
+class Compactor:
+    """
+    Turns otf_api results into compact JSON for the model.
+
+    Only the tool's default ``FIELDS`` (or the caller's ``fields``) are kept;
+    fields that are None or missing are left out of objects, and table
+    columns no row has a value for are dropped. Lists of objects become a
+    table of ``columns`` and ``rows``; a ``Page`` becomes its compacted
+    items plus ``next_cursor``, a ``Batch`` its compacted items plus per-id
+    ``errors``. ``["*"]`` returns the full result.
+
+    Records per tool how many bytes, and roughly how many tokens, this
+    saved. Measuring that means encoding the full result too, so only one
+    call in ``stats_sample`` per tool is measured (none with 0) and the
+    totals are extrapolated from those.
+    """
+
+    def __init__(self, fields: Dict[str, Sequence[str]] = FIELDS, tables: bool = True, stats_sample: int = 20):
+        self._fields = fields
+        self.tables = tables
+        self.stats_sample = stats_sample
+        self._lock = threading.Lock()
+        # tool -> [calls, sampled calls, full bytes, compact bytes], sizes
+        # summed over the sampled calls only.
+        self._sizes: Dict[str, List[int]] = {}
+
+    def compact(self, tool: str, value: Any, fields: Optional[List[str]] = None) -> str:
+        if isinstance(value, Page):
+            full = _dump(value.items)
+            result = {
+                "items": self._select(tool, full, fields),
+                "next_cursor": value.next_cursor,
+                "matched": value.matched,
+            }
+        elif isinstance(value, Batch):
+            full = _dump(value.items)
+            result = {"items": self._select(tool, full, fields), "errors": value.errors}
+        else:
+            full = _dump(value)
+            result = self._select(tool, full, fields)
+        encoded = orjson.dumps(result, default=str)
+        if self._count(tool):
+            self._record(tool, len(orjson.dumps(full, default=str)), len(encoded))
+        return encoded.decode()
+
+    def _select(self, tool: str, full: Any, fields: Optional[List[str]]) -> Any:
+        selected = fields or self._fields.get(tool)
+        if not selected or ALL_FIELDS in selected:
+            return full
+        paths = [field.split(".") for field in selected]
+        if isinstance(full, list):
+            if self.tables and full and all(isinstance(item, dict) for item in full):
+                return _table(full, selected)
+            return [_project(item, paths) for item in full]
+        return _project(full, paths)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sizes = {tool: list(size) for tool, size in self._sizes.items()}
+        tools = {}
+        for tool, (calls, sampled, full, compact) in sizes.items():
+            if not sampled:
+                tools[tool] = {"calls": calls, "sampled_calls": 0}
+                continue
+            full, compact = full * calls // sampled, compact * calls // sampled
+            saved = full - compact
+            tools[tool] = {
+                "calls": calls,
+                "sampled_calls": sampled,
+                "full_bytes": full,
+                "compact_bytes": compact,
+                "saved_bytes": saved,
+                "saved_tokens_estimate": saved // BYTES_PER_TOKEN,
+                "saved_tokens_per_call": saved // BYTES_PER_TOKEN // calls,
+            }
+        saved = sum(tool.get("saved_bytes", 0) for tool in tools.values())
+        return {
+            "saved_bytes": saved,
+            "saved_tokens_estimate": saved // BYTES_PER_TOKEN,
+            "tools": tools,
+        }
+
+    def _count(self, tool: str) -> bool:
+        """
+        Counts a call of ``tool`` and returns whether to measure it.
+        """
+        with self._lock:
+            size = self._sizes.setdefault(tool, [0, 0, 0, 0])
+            size[0] += 1
+            return bool(self.stats_sample) and (size[0] - 1) % self.stats_sample == 0
+
+    def _record(self, tool: str, full: int, compact: int):
+        with self._lock:
+            size = self._sizes[tool]
+            size[1] += 1
+            size[2] += full
+            size[3] += compact
+        logger.debug(
+            f"{tool}: {full} -> {compact} bytes (~{(full - compact) // BYTES_PER_TOKEN} tokens saved)"
+        )
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+DEGRADED = "degraded"
+
+
+class Readiness:
+    """
+    Startup state of the MCP server and how long each step took.
+
+    The server serves as soon as its port is bound (``serving`` is called
+    from the server's startup): OTF logins happen lazily on the first call
+    that needs one. Until then it is "starting"; while the
+    optional warm-up runs it is "warming", then "ready". A warm-up that can't
+    log in leaves it "degraded" and keeps retrying in the background.
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self.state = STARTING
+        self.startup_seconds: Optional[float] = None
+        self.warm_up_seconds: Optional[float] = None
+        self.warm_up_attempts = 0
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in (WARMING, READY)
+
+    def serving(self):
+        self.startup_seconds = time.monotonic() - self.started_at
+        if self.state == STARTING:
+            self.state = READY
+        logger.info(f"Serving {self.startup_seconds * 1000:.0f} ms after start")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "uptime_seconds": time.monotonic() - self.started_at,
+            "startup_seconds": self.startup_seconds,
+            "warm_up_seconds": self.warm_up_seconds,
+            "warm_up_attempts": self.warm_up_attempts,
+            "error": self.error,
+        }
+
+
+def start_warm_up(
+    readiness: Readiness,
+    calls: List[Callable[[], Any]],
+    backoff: float = 2.0,
+    max_backoff: float = 60.0,
+) -> threading.Thread:
+    """
+    Runs ``calls`` on a background thread to log in and fill the otf cache
+    before the first member asks. Failures are retried with exponential
+    backoff until every call succeeds once.
+    """
+    readiness.state = WARMING
+
+    def run():
+        started = time.monotonic()
+        delay = backoff
+        while True:
+            readiness.warm_up_attempts += 1
+            try:
+                for call in calls:
+                    call()
+            except Exception as e:
+                readiness.state = DEGRADED
+                readiness.error = str(e)
+                logger.warning(f"Warm-up failed, retrying in {delay:g}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, max_backoff)
+                continue
+            readiness.state = READY
+            readiness.error = None
+            readiness.warm_up_seconds = time.monotonic() - started
+            logger.info(f"Warm-up finished in {readiness.warm_up_seconds:.2f}s")
+            return
+
+    thread = threading.Thread(target=run, name="otf-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,328 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+
+_NOT_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+@dataclass(frozen=True)
+class StudioEntry:
+    studio_uuid: str
+    name: Optional[str] = None
+    address: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    postal_code: Optional[str] = None
+    country: Optional[str] = None
+    phone: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    time_zone: Optional[str] = None
+
+    @classmethod
+    def from_studio(cls, studio: Any) -> "StudioEntry":
+        location = studio.location
+        return cls(
+            studio_uuid=studio.studio_uuid,
+            name=studio.name,
+            address=location.address_line1,
+            city=location.city,
+            state=location.state,
+            postal_code=location.postal_code,
+            country=location.country,
+            phone=location.phone_number,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            time_zone=studio.time_zone,
+        )
+
+    @property
+    def text(self) -> str:
+        return " ".join(part for part in (self.name, self.address, self.city, self.state, self.postal_code) if part)
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _normalize(text: str) -> str:
+    return _NOT_ALPHANUMERIC.sub(" ", text.lower()).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    grams = set()
+    for word in _normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _unit_vector(latitude: float, longitude: float) -> np.ndarray:
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class _Index:
+    """
+    Immutable lookup arrays over one snapshot of the directory: each
+    located studio as a unit vector on the sphere for spatial queries, and
+    per trigram of a studio's name and address the studios that contain it
+    for fuzzy ones.
+
+    The whole directory is a couple of thousand studios, so a query is one
+    vectorized pass over these arrays; in CPython that is faster than
+    walking a k-d tree or a geohash grid node by node.
+    """
+
+    def __init__(self, entries: Dict[str, StudioEntry]):
+        self.entries = entries
+        self.studios = list(entries.values())
+        located = [
+            (i, e.latitude, e.longitude)
+            for i, e in enumerate(self.studios)
+            if e.latitude is not None and e.longitude is not None
+        ]
+        self.located = np.array([i for i, _, _ in located], dtype=np.intp)
+        self.vectors = np.array([_unit_vector(lat, lon) for _, lat, lon in located]).reshape(-1, 3)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, entry in enumerate(self.studios):
+            for gram in _trigrams(entry.text):
+                postings[gram].append(i)
+        self.grams = {gram: np.array(studios, dtype=np.intp) for gram, studios in postings.items()}
+        self.name_grams = [_trigrams(entry.name or "") for entry in self.studios]
+
+    def near(self, latitude: float, longitude: float, limit: int, radius: Optional[float]) -> List[Tuple[float, StudioEntry]]:
+        """
+        Studios nearest the point, closest first, within ``radius`` miles
+        if given.
+        """
+        if not len(self.located):
+            return []
+        # Great-circle distance from the chord between unit vectors, which
+        # stays precise for studios a few blocks apart.
+        chord = np.sqrt(np.maximum(2 - 2 * (self.vectors @ _unit_vector(latitude, longitude)), 0.0))
+        distances = 2 * EARTH_RADIUS_MILES * np.arcsin(np.minimum(chord / 2, 1.0))
+        candidates = np.arange(len(distances)) if radius is None else np.flatnonzero(distances <= radius)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(distances[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+        return [(d, self.studios[i]) for d, i in zip(distances[candidates].tolist(), self.located[candidates].tolist())]
+
+    def match(self, query: str, limit: int, min_score: float) -> List[Tuple[float, StudioEntry]]:
+        """
+        Studios whose name or address best match ``query``, by the share of
+        the query's trigrams they contain, ties broken by name similarity.
+        """
+        if query in self.entries:
+            return [(1.0, self.entries[query])]
+        grams = _trigrams(query)
+        postings = [self.grams[gram] for gram in grams if gram in self.grams]
+        if not postings:
+            return []
+        scores = np.bincount(np.concatenate(postings), minlength=len(self.studios)) / len(grams)
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > limit:
+            # Keep everything tied with the last one that makes the cut, so
+            # name similarity can order the ties.
+            cutoff = np.partition(scores[candidates], len(candidates) - limit)[len(candidates) - limit]
+            candidates = candidates[scores[candidates] >= cutoff]
+        scored = []
+        for c, score in zip(candidates.tolist(), scores[candidates].tolist()):
+            name = self.name_grams[c]
+            similarity = 2 * len(grams & name) / (len(grams) + len(name)) if name else 0.0
+            scored.append((score, similarity, self.studios[c]))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [(round(score, 3), entry) for score, _, entry in scored[:limit]]
+
+
+class StudioDirectory:
+    """
+    A local copy of the OTF studio directory for lookups that don't go
+    upstream.
+
+    Every studio the otf tools return is added to it, and ``refresh``
+    re-runs the geo searches it has seen (and one around the home studio)
+    to pick up new and changed studios. Lookups run against an immutable
+    snapshot of the index that is swapped in whole, so they never wait on
+    an update. With ``path`` set the directory survives restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_score: float = 0.35):
+        self.path = path
+        self.min_score = min_score
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.lookups = 0
+        # Geo searches (latitude, longitude, distance) to repeat on refresh.
+        self.searches: Set[Tuple[Optional[float], Optional[float], int]] = {(None, None, 250)}
+        self._lock = threading.Lock()
+        self._index = _Index({})
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._index.entries)
+
+    def add(self, studios: Any, search: Optional[Tuple[Optional[float], Optional[float], int]] = None):
+        """
+        Adds otf_api ``StudioDetail`` results (one or a list) and, for a geo
+        search, remembers it for refreshes.
+        """
+        if not isinstance(studios, (list, tuple)):
+            studios = [studios]
+        entries = [StudioEntry.from_studio(s) for s in studios if getattr(s, "studio_uuid", None)]
+        with self._lock:
+            if search is not None and search[0] is not None and search[1] is not None:
+                self.searches.add((round(search[0], 2), round(search[1], 2), search[2]))
+            if not entries or all(self._index.entries.get(e.studio_uuid) == e for e in entries):
+                return
+            merged = dict(self._index.entries)
+            merged.update((e.studio_uuid, e) for e in entries)
+            self._index = _Index(merged)
+
+    def find(
+        self,
+        query: Optional[str] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius: Optional[float] = None,
+        limit: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Studios matching ``query`` by name or address, nearest to the point,
+        or both: the query's matches within ``radius`` of the point, best
+        match first and nearest among equal matches.
+        """
+        index = self._index
+        self.lookups += 1
+        limit = max(1, limit)
+        point = latitude is not None and longitude is not None
+        if query:
+            matches = index.match(query, len(index.entries) if point else limit, self.min_score)
+            results = []
+            for score, entry in matches:
+                distance = None
+                if point and entry.latitude is not None and entry.longitude is not None:
+                    distance = haversine_miles(latitude, longitude, entry.latitude, entry.longitude)
+                if point and radius is not None and (distance is None or distance > radius):
+                    continue
+                results.append((score, distance, entry))
+            results.sort(key=lambda item: (-item[0], item[1] if item[1] is not None else math.inf))
+            return [_result(entry, distance, score) for score, distance, entry in results[:limit]]
+        if point:
+            return [_result(entry, distance) for distance, entry in index.near(latitude, longitude, limit, radius)]
+        raise ValueError("Pass a query, a latitude and longitude, or both")
+
+    def refresh(self, search: Callable[[Optional[float], Optional[float], int], Iterable[Any]]) -> bool:
+        """
+        Repeats every remembered geo search through ``search`` and saves the
+        directory. A search that fails keeps the studios it found before;
+        returns False if they all failed.
+        """
+        with self._lock:
+            searches = sorted(self.searches, key=lambda s: (s[0] is not None, s))
+        succeeded = 0
+        for latitude, longitude, distance in searches:
+            try:
+                self.add(search(latitude, longitude, distance))
+                succeeded += 1
+            except Exception as e:
+                logger.warning(f"Studio search around {latitude}, {longitude} failed: {e}")
+        if not succeeded:
+            return False
+        self.refreshed_at = time.time()
+        self.refreshes += 1
+        if self.path:
+            self._save(self.path)
+        logger.info(f"Studio directory refreshed: {len(self)} studios from {len(searches)} searches")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "studios": len(index.entries),
+            "located": len(index.located),
+            "trigrams": len(index.grams),
+            "searches": len(self.searches),
+            "refreshes": self.refreshes,
+            "refreshed_at": self.refreshed_at,
+            "lookups": self.lookups,
+        }
+
+    def _save(self, path: str):
+        with self._lock:
+            data = {
+                "refreshed_at": self.refreshed_at,
+                "searches": sorted(self.searches, key=lambda s: (s[0] is not None, s)),
+                "studios": [asdict(e) for e in self._index.entries.values()],
+            }
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp, path)
+
+    def _load(self, path: str):
+        try:
+            with open(path, "rb") as f:
+                data = orjson.loads(f.read())
+            entries = {s["studio_uuid"]: StudioEntry(**s) for s in data["studios"]}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable studio directory {path}: {e}")
+            return
+        self.refreshed_at = data.get("refreshed_at")
+        self.searches.update(tuple(s) for s in data.get("searches", ()))
+        self._index = _Index(entries)
+        logger.info(f"Loaded {len(entries)} studios from {path}")
+
+
+def _result(entry: StudioEntry, distance: Optional[float] = None, score: Optional[float] = None) -> Dict[str, Any]:
+    result = {key: value for key, value in asdict(entry).items() if value is not None}
+    if distance is not None:
+        result["distance_miles"] = round(distance, 2)
+    if score is not None:
+        result["score"] = score
+    return result
+
+
+def start_refresh(
+    directory: StudioDirectory,
+    search: Callable[[Optional[float], Optional[float], int], Iterable[Any]],
+    interval: float,
+    backoff: float = 30.0,
+) -> threading.Thread:
+    """
+    Refreshes ``directory`` on a background thread every ``interval``
+    seconds, straight away if it has never been refreshed or is overdue.
+    A refresh that fails is retried with exponential backoff.
+    """
+
+    def run():
+        delay = backoff
+        while True:
+            due = (directory.refreshed_at or 0) + interval - time.time()
+            if due > 0:
+                time.sleep(due)
+            if directory.refresh(search):
+                delay = backoff
+                continue
+            time.sleep(delay)
+            delay = min(delay * 2, interval)
+
+    thread = threading.Thread(target=run, name="otf-studio-directory", daemon=True)
+    thread.start()
+    return thread
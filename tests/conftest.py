@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The agent and the MCP server are run from their own folders and import
+# their modules flat; their module names don't collide.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('agent', 'mcp_server'):
+    sys.path.insert(0, os.path.join(ROOT, folder))
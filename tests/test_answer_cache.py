@@ -0,0 +1,79 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from answer_cache import AnswerCache
+from tool_selection import REQUEST_MORE_TOOLS
+
+
+def turn(*calls, question='Where is the Flatiron studio?'):
+    tool_calls = [
+        {'name': name, 'args': args, 'id': f'call-{i}', 'type': 'tool_call'}
+        for i, (name, args) in enumerate(calls)
+    ]
+    messages = [HumanMessage(content=question), AIMessage(content='', tool_calls=tool_calls)]
+    messages += [ToolMessage(content='{}', tool_call_id=call['id']) for call in tool_calls]
+    return messages + [AIMessage(content='It is on 5th Avenue.')]
+
+
+def test_shared_tool_call_is_shareable():
+    assert AnswerCache.shareable(turn(('get_studio_detail', {'studio_uuid': 'abc'})))
+
+
+def test_turn_without_tool_calls_is_not_shareable():
+    assert not AnswerCache.shareable(turn())
+
+
+def test_request_more_tools_alone_is_not_shareable():
+    assert not AnswerCache.shareable(turn((REQUEST_MORE_TOOLS, {'categories': ['studio']})))
+    assert AnswerCache.shareable(
+        turn((REQUEST_MORE_TOOLS, {'categories': ['studio']}), ('find_studio', {'query': 'flatiron'}))
+    )
+
+
+def test_personal_tool_call_is_not_shareable():
+    assert not AnswerCache.shareable(
+        turn(('get_studio_detail', {'studio_uuid': 'abc'}), ('get_bookings', {}))
+    )
+
+
+def test_missing_identifying_argument_is_not_shareable():
+    # Left out, otf_api answers for the member's home studio.
+    assert not AnswerCache.shareable(turn(('get_studio_detail', {})))
+    assert not AnswerCache.shareable(turn(('get_studio_detail', {'studio_uuid': ''})))
+
+
+def test_later_turns_are_not_shareable():
+    first = turn(('get_studio_detail', {'studio_uuid': 'abc'}))
+    assert not AnswerCache.shareable(first + turn(('get_studio_detail', {'studio_uuid': 'def'})))
+    assert not AnswerCache.shareable([SystemMessage(content='Summary')] + first)
+
+
+def test_identifying_entries_only_match_exactly():
+    async def embed(text):
+        return [1.0, 0.0]
+
+    async def run():
+        cache = AnswerCache(embed=embed)
+        await cache.store(
+            'Where is the Flatiron studio?',
+            'On 5th Avenue.',
+            turn(('find_studio', {'query': 'flatiron'})),
+        )
+        exact = await cache.lookup('where is the flatiron studio')
+        similar = await cache.lookup('Where is the Tribeca studio?')
+        return exact, similar
+
+    assert asyncio.run(run()) == ('On 5th Avenue.', None)
+
+
+def test_entries_without_identifying_args_match_semantically():
+    async def embed(text):
+        return [1.0, 0.0]
+
+    async def run():
+        cache = AnswerCache(embed=embed)
+        await cache.store('Which studios are there?', 'Many.', turn(('find_studio', {'limit': 5})))
+        return await cache.lookup('What studios exist?')
+
+    assert asyncio.run(run()) == 'Many.'
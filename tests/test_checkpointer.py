@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+import pytest
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from checkpointer import BoundedMemorySaver
+from shared_backend import SharedBackend, SqliteBackend, VersionConflictError
+
+
+def config(thread_id='member:session'):
+    return {'configurable': {'thread_id': thread_id, 'checkpoint_ns': ''}}
+
+
+def put_turn(saver, text, thread_id='member:session', version=None):
+    """Puts a checkpoint whose messages channel holds ``text``, like one graph step."""
+    previous = saver.get_tuple(config(thread_id))
+    checkpoint = empty_checkpoint()
+    version = version or (len(saver.storage[thread_id]['']) + 1)
+    checkpoint['channel_values'] = {'messages': [text]}
+    checkpoint['channel_versions'] = {'messages': version}
+    parent = config(thread_id) if previous is None else previous.config
+    return saver.put(parent, checkpoint, {'source': 'loop', 'step': version}, {'messages': version})
+
+
+def messages(saver, thread_id='member:session'):
+    saved = saver.get_tuple(config(thread_id))
+    return None if saved is None else saved.checkpoint['channel_values']['messages']
+
+
+@pytest.fixture
+def workers(tmp_path):
+    # Two worker processes: each opens its own connection to the shared file.
+    path = str(tmp_path / 'shared.db')
+    backends = [SqliteBackend(path), SqliteBackend(path)]
+    yield [BoundedMemorySaver(backend=backend, shared=True) for backend in backends]
+    for backend in backends:
+        backend.close()
+
+
+def test_backend_must_implement_every_method():
+    class Partial(SharedBackend):
+        def get(self, namespace, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_worker_sees_the_other_workers_turn(workers):
+    first, second = workers
+    put_turn(first, 'hello')
+    assert messages(second) == ['hello']
+    put_turn(second, 'hello again')
+    # The first worker's resident copy is stale now and gets reloaded.
+    assert messages(first) == ['hello again']
+
+
+def test_stale_write_fails_instead_of_overwriting(workers, monkeypatch):
+    first, second = workers
+    put_turn(first, 'hello')
+    assert messages(second) == ['hello']
+    put_turn(first, 'from first', version=2)
+    # The second worker checked the thread just before the first one wrote,
+    # so its turn runs on top of version 1.
+    monkeypatch.setattr(second._backend, 'version', lambda namespace, key: 1)
+    with pytest.raises(VersionConflictError):
+        put_turn(second, 'from second', version=2)
+    monkeypatch.undo()
+    assert messages(second) == ['from first']
+    assert messages(first) == ['from first']
+
+
+def test_writes_only_send_what_changed(workers):
+    first, second = workers
+    saver = BoundedMemorySaver(backend=first._backend, shared=True, max_checkpoints_per_thread=2)
+    for step in range(1, 5):
+        put_turn(saver, f'step {step}', version=step)
+    rows, version = saver._backend.get_rows('checkpoints', 'member:session')
+    assert version == 4
+    # Two checkpoints and the blobs they point at; pruned ones are deleted.
+    assert sorted(row.split(',')[0] for row in rows) == ['["b"', '["b"', '["c"', '["c"']
+    assert messages(second) == ['step 4']
+
+
+def test_async_methods_run_off_the_event_loop(workers):
+    first, _ = workers
+    put_turn(first, 'hello')
+
+    async def run():
+        return await first.aget_tuple(config())
+
+    assert asyncio.run(run()).checkpoint['channel_values']['messages'] == ['hello']
+
+
+def test_running_thread_is_not_evicted():
+    saver = BoundedMemorySaver(max_threads=1)
+    with saver.running('member:busy'):
+        put_turn(saver, 'hello', thread_id='member:busy')
+        put_turn(saver, 'hi', thread_id='member:other')
+        # The idle thread went instead, and the busy one keeps its history.
+        assert messages(saver, 'member:busy') == ['hello']
+        assert messages(saver, 'member:other') is None
+    assert saver.stats()['active_threads'] == 0
+
+
+def test_eviction_without_backend_is_counted(caplog):
+    saver = BoundedMemorySaver(max_threads=1)
+    put_turn(saver, 'hello', thread_id='member:first')
+    put_turn(saver, 'hi', thread_id='member:second')
+    assert saver.stats()['dropped'] == 1
+    assert 'history is lost' in caplog.text
+
+
+def test_evicted_thread_is_reloaded_from_backend(tmp_path):
+    backend = SqliteBackend(str(tmp_path / 'spill.db'))
+    saver = BoundedMemorySaver(max_threads=1, backend=backend)
+    put_turn(saver, 'hello', thread_id='member:first')
+    put_turn(saver, 'hi', thread_id='member:second')
+    assert messages(saver, 'member:first') == ['hello']
+    assert saver.stats()['dropped'] == 0
+    backend.close()
+
+
+def test_prune_drops_threads_not_written_since(tmp_path):
+    backend = SqliteBackend(str(tmp_path / 'pruned.db'))
+    saver = BoundedMemorySaver(backend=backend, shared=True)
+    put_turn(saver, 'hello')
+    assert backend.prune('checkpoints', time.time() - 60) == 0
+    assert backend.prune('checkpoints', time.time() + 60) == 1
+    assert backend.get_rows('checkpoints', 'member:session') is None
+    assert backend._db.execute('SELECT COUNT(*) FROM checkpoints_rows').fetchone() == (0,)
+    backend.close()
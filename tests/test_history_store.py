@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from history_store import PERFORMANCE_SUMMARIES, TELEMETRY, HistoryOtf, HistoryStore
+
+
+class FakeOtf:
+    def __init__(self):
+        self.calls = 0
+        self.summary = SimpleNamespace(calories_burned=None, splat_points=None)
+        self.telemetry = SimpleNamespace(telemetry=[])
+
+    def get_performance_summary(self, performance_summary_id):
+        self.calls += 1
+        return self.summary
+
+    def get_telemetry(self, performance_summary_id, max_data_points=150):
+        self.calls += 1
+        return self.telemetry
+
+
+def test_incomplete_records_are_fetched_until_complete(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    upstream = FakeOtf()
+    otf = HistoryOtf(upstream, store, member=lambda: "alice")
+
+    # Right after class upstream has no numbers yet.
+    otf.get_performance_summary("ps-1")
+    otf.get_telemetry("ps-1")
+    otf.get_performance_summary("ps-1")
+    otf.get_telemetry("ps-1")
+    assert upstream.calls == 4
+    assert store.stats()["incomplete"] == 4
+
+    upstream.summary = SimpleNamespace(calories_burned=512, splat_points=14)
+    upstream.telemetry = SimpleNamespace(telemetry=[{"hr": 120}])
+    otf.get_performance_summary("ps-1")
+    otf.get_telemetry("ps-1")
+    assert otf.get_performance_summary("ps-1").calories_burned == 512
+    assert otf.get_telemetry("ps-1").telemetry == [{"hr": 120}]
+    assert upstream.calls == 6
+    assert store.stats()["kinds"] == {
+        PERFORMANCE_SUMMARIES: {"records": 1, "members": 1},
+        TELEMETRY: {"records": 1, "members": 1},
+    }
+    store.close()
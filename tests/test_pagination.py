@@ -0,0 +1,98 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from pagination import InvalidCursorError, _decode, _encode, paginate
+
+
+class Scan(BaseModel):
+    scan_result_uuid: Optional[str] = None
+    scan_datetime: Optional[datetime] = None
+
+
+class Reading(BaseModel):
+    # HR history entries have no id.
+    assigned_at: Optional[datetime] = None
+    max_hr: int
+
+
+def all_pages(method, items, limit, **kwargs):
+    pages, cursor = [], None
+    while True:
+        page = paginate(method, items, limit=limit, cursor=cursor, **kwargs)
+        pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+def scans(days):
+    start = datetime(2024, 1, 1, 7, 0)
+    return [Scan(scan_result_uuid=f"scan-{i}", scan_datetime=start + timedelta(days=i)) for i in range(days)]
+
+
+def test_cursor_walks_every_record_once_newest_first():
+    items = scans(7)
+    pages = all_pages("get_body_composition_list", items, limit=3)
+    assert [len(page.items) for page in pages] == [3, 3, 1]
+    walked = [scan for page in pages for scan in page.items]
+    assert walked == sorted(items, key=lambda scan: scan.scan_datetime, reverse=True)
+    assert all(page.matched == 7 for page in pages)
+
+
+def test_cursor_survives_new_records():
+    items = scans(5)
+    first = paginate("get_body_composition_list", items, limit=2)
+    newer = Scan(scan_result_uuid="scan-new", scan_datetime=datetime(2024, 2, 1))
+    second = paginate("get_body_composition_list", items + [newer], limit=2, cursor=first.next_cursor)
+    assert [scan.scan_result_uuid for scan in first.items + second.items] == [
+        "scan-4", "scan-3", "scan-2", "scan-1"
+    ]
+
+
+def test_records_sharing_a_timestamp_are_not_skipped():
+    when = datetime(2024, 3, 1, 6, 30)
+    items = [Reading(assigned_at=when, max_hr=180 + i) for i in range(5)]
+    # Exact duplicates too.
+    items += [Reading(assigned_at=when, max_hr=180), Reading(assigned_at=when - timedelta(days=1), max_hr=170)]
+    for limit in (1, 2, 3):
+        walked = [r for page in all_pages("get_hr_history", items, limit=limit) for r in page.items]
+        assert len(walked) == len(items)
+        assert sorted(r.max_hr for r in walked) == sorted(r.max_hr for r in items)
+        assert walked[-1].max_hr == 170
+
+
+def test_records_without_their_id_are_not_skipped():
+    when = datetime(2024, 3, 1)
+    items = [Scan(scan_datetime=when), Scan(scan_datetime=when), Scan(scan_result_uuid="a", scan_datetime=when)]
+    walked = [s for page in all_pages("get_body_composition_list", items, limit=1) for s in page.items]
+    assert len(walked) == 3
+
+
+def test_date_range_filters_and_is_kept_in_the_cursor():
+    items = scans(10) + [Scan(scan_result_uuid="undated")]
+    pages = all_pages("get_body_composition_list", items, limit=2, start_date="2024-01-03", end_date=date(2024, 1, 6))
+    walked = [scan.scan_result_uuid for page in pages for scan in page.items]
+    assert walked == ["scan-5", "scan-4", "scan-3", "scan-2"]
+    assert pages[0].matched == 4
+
+
+def test_undated_records_sort_oldest():
+    items = [Scan(scan_result_uuid="undated")] + scans(2)
+    page = paginate("get_body_composition_list", items, limit=5)
+    assert [scan.scan_result_uuid for scan in page.items] == ["scan-1", "scan-0", "undated"]
+
+
+def test_cursor_round_trip():
+    state = {"m": "get_hr_history", "s": "2024-01-01", "e": None, "a": ["2024-01-02T00:00:00", "abc", 1]}
+    assert _decode(_encode(state)) == state
+
+
+def test_foreign_or_garbled_cursor_is_rejected():
+    cursor = paginate("get_body_composition_list", scans(3), limit=1).next_cursor
+    with pytest.raises(InvalidCursorError):
+        paginate("get_member_purchases", [], cursor=cursor)
+    with pytest.raises(InvalidCursorError):
+        paginate("get_body_composition_list", scans(3), cursor="not-a-cursor")